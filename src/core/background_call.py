@@ -0,0 +1,86 @@
+import contextvars
+import threading
+from typing import Any, Callable, Optional
+
+# 現在のスレッドの呼び出しを打ち切る際に設定されるイベント (入れ子の呼び出しではすべての階層のイベント)
+_abandoned: contextvars.ContextVar = contextvars.ContextVar('background_call_abandoned', default=())
+
+
+def is_abandoned() -> bool:
+    """現在のスレッドで実行中の呼び出しが、呼び出し元によって打ち切られたかを返します。"""
+    return any(event.is_set() for event in _abandoned.get())
+
+
+def print_status(message: str) -> None:
+    """
+    進捗メッセージを標準出力します。打ち切られた呼び出しからは出力しません。
+    呼び出し元が標準出力の切り替え (JSONL出力時など) を終えた後に、遅れて応答した呼び出しが出力するのを防ぎます。
+    """
+    if not is_abandoned():
+        print(message)
+
+
+class BackgroundCall:
+    """
+    関数をデーモンスレッドで実行し、呼び出し元が結果を待たずに打ち切れるようにするクラス。
+    呼び出し元のコンテキスト (Settings.override() による上書きなど) を引き継いで実行します。
+    打ち切られた呼び出しはプロセスの終了を妨げず、以降の print_status() による出力も行いません。
+    """
+
+    def __init__(self, fn: Callable[..., Any], *args, name: Optional[str] = None,
+                 on_done: Optional[Callable[["BackgroundCall"], None]] = None, **kwargs):
+        """
+        Args:
+            fn (Callable): 実行する関数。
+            name (Optional[str]): スレッド名。
+            on_done (Optional[Callable]): 実行が終了した (打ち切られた場合も含む) ときに、実行したスレッドで呼び出される関数。
+        """
+        self._fn = fn
+        self._args = args
+        self._kwargs = kwargs
+        self._on_done = on_done
+        self._context = contextvars.copy_context()
+        self._abandon_event = threading.Event()
+        self._done = threading.Event()
+        self._result: Any = None
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._context.run, args=(self._run,), name=name, daemon=True)
+
+    def start(self) -> "BackgroundCall":
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        _abandoned.set(_abandoned.get() + (self._abandon_event,))
+        try:
+            self._result = self._fn(*self._args, **self._kwargs)
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._done.set()
+            if self._on_done:
+                self._on_done(self)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """実行が終了するまで待ちます。timeout 秒以内に終了した場合はTrue。"""
+        return self._done.wait(timeout)
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def abandon(self) -> None:
+        """結果を待たずに打ち切ります。実行中の関数は止まりませんが、結果は破棄されます。"""
+        self._abandon_event.set()
+
+    def result(self) -> Any:
+        """
+        実行結果を返します。終了していない場合は終了まで待ちます。
+
+        Raises:
+            Exception: 関数が送出した例外。
+        """
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._result
@@ -1,16 +1,19 @@
 import requests
-from typing import Dict, Any
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from core.traffic_cassette import CassetteError, TrafficCassette
 
 class BacklogApiClient:
     """Backlog APIへのリクエストを管理するクライアントクラス。"""
 
-    def __init__(self, api_key: str, backlog_domain: str):
+    def __init__(self, api_key: str, backlog_domain: str, cassette: Optional[TrafficCassette] = None):
         """
         クライアントを初期化します。
 
         Args:
             api_key (str): Backlog APIキー。
             backlog_domain (str): Backlogのドメイン (例: your-space.backlog.jp)。
+            cassette (Optional[TrafficCassette]): 指定した場合、リクエストをカセットに記録、またはカセットから再生します。
         """
         if not all([api_key, backlog_domain]):
             raise ValueError("APIキーとドメインは必須です。")
@@ -18,6 +21,7 @@ class BacklogApiClient:
         self.api_key = api_key
         self.backlog_domain = backlog_domain
         self.base_url = f"https://{self.backlog_domain}/api/v2"
+        self.cassette = cassette
 
         # requests.Sessionを使用し、APIキーを一度だけ設定する
         self.session = requests.Session()
@@ -26,6 +30,22 @@ class BacklogApiClient:
 
     def _send_request(self, method: str, endpoint: str, params: Dict[str, Any] = None, data: Dict[str, Any] = None) -> Any:
         """汎用的なBacklog APIリクエストメソッド。"""
+        return self._exchange(method, endpoint, params, data,
+                              send=lambda: self._send_http_request(method, endpoint, params, data))
+
+    def _exchange(self, method: str, endpoint: str, params: Optional[Dict[str, Any]], data: Optional[Dict[str, Any]],
+                  send: Callable[[], Any]) -> Any:
+        """カセットが指定されていればカセットを経由して、なければそのままリクエストを送信します。"""
+        if self.cassette is None:
+            return send()
+        try:
+            return self.cassette.backlog_exchange(method, endpoint, params, data, send=send)
+        except CassetteError as e:
+            # 再生時の記録なし・注入エラーも、通信エラーとして呼び出し元に伝える
+            raise ConnectionError(f"APIリクエストに失敗しました: {e}") from e
+
+    def _send_http_request(self, method: str, endpoint: str, params: Dict[str, Any] = None, data: Dict[str, Any] = None) -> Any:
+        """Backlog APIにHTTPリクエストを送信し、応答のJSONを返します。"""
         url = f"{self.base_url}/{endpoint}"
 
         try:
@@ -72,4 +92,35 @@ class BacklogApiClient:
         """
         endpoint = f"issues/{issue_key}/comments"
         data = {'content': content}
-        return self._send_request('POST', endpoint, data=data)
\ No newline at end of file
+        return self._send_request('POST', endpoint, data=data)
+
+    def get_issue(self, issue_key: str, etag: Optional[str] = None) -> Tuple[Optional[dict], Optional[str]]:
+        """
+        課題の情報を取得します。etag を指定した場合は条件付きリクエスト (If-None-Match) を送信します。
+
+        Args:
+            issue_key (str): 課題キー (例: PROJECT-123)。
+            etag (Optional[str]): 前回取得時の ETag。
+
+        Returns:
+            Tuple[Optional[dict], Optional[str]]: (課題情報, ETag)。前回から変更がない (304 Not Modified) 場合、課題情報はNone。
+        """
+        endpoint = f"issues/{issue_key}"
+        # ETag は実行ごとに異なりうるため、カセットの照合には含めない
+        result = self._exchange('GET', endpoint, None, None, send=lambda: self._send_conditional_get(endpoint, etag))
+        return result['body'], result['etag']
+
+    def _send_conditional_get(self, endpoint: str, etag: Optional[str]) -> Dict[str, Any]:
+        """If-None-Match 付きのGETを送信し、{'status', 'etag', 'body'} を返します。"""
+        url = f"{self.base_url}/{endpoint}"
+        headers = {'If-None-Match': etag} if etag else None
+        try:
+            response = self.session.get(url, headers=headers, timeout=10)
+            if response.status_code == 304:
+                return {'status': 304, 'etag': etag, 'body': None}
+            response.raise_for_status()
+            return {'status': response.status_code, 'etag': response.headers.get('ETag'), 'body': response.json()}
+        except requests.exceptions.RequestException as e:
+            raise ConnectionError(f"APIリクエストに失敗しました: {e}") from e
+        except requests.exceptions.JSONDecodeError:
+            raise ValueError("APIレスポンスのJSON解析に失敗しました。")
@@ -0,0 +1,80 @@
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+@dataclass
+class CommitReview:
+    """1コミット分のレビュー結果。"""
+    commit: str
+    subject: str
+    review: Optional[str] = None
+    duplicate_of: Optional[str] = None  # 同一パッチを既にレビュー済みのコミット
+    error: Optional[str] = None
+
+    @property
+    def short_sha(self) -> str:
+        return self.commit[:8]
+
+    @property
+    def skipped(self) -> bool:
+        """同一パッチのレビュー済み、またはレビュー結果が空のため、個別に投稿する内容がない場合はTrue。"""
+        if self.error:
+            return False
+        return bool(self.duplicate_of) or not (self.review and self.review.strip())
+
+    def to_markdown(self) -> str:
+        """Backlogコメントや標準出力向けのMarkdownに整形します。"""
+        lines = [f"### コミット `{self.short_sha}`: {self.subject}", ""]
+        if self.error:
+            lines.append(f":warning: レビューに失敗しました: {self.error}")
+        elif self.duplicate_of:
+            lines.append(f"同一内容のパッチ (`{self.duplicate_of[:8]}`) はレビュー済みのためスキップしました。")
+        elif self.review:
+            lines.append(self.review)
+        else:
+            lines.append("レビュー対象の差分がありませんでした。")
+        return "\n".join(lines)
+
+
+def format_commit_report(reviews: List[CommitReview]) -> str:
+    """コミットごとのレビュー結果を1つのレポートにまとめます。"""
+    header = f"## コミット別レビュー ({len(reviews)} 件)"
+    return "\n\n".join([header] + [review.to_markdown() for review in reviews])
+
+
+class PatchIdCache:
+    """
+    レビュー済みのパッチを `git patch-id` をキーとして記録するキャッシュ。
+    リベースやチェリーピックで内容が変わらないコミットを再レビューしないために使用します。
+    """
+
+    def __init__(self, cache_path: Path):
+        self.cache_path = Path(cache_path)
+        self._lock = threading.Lock()
+        try:
+            self._entries: Dict[str, Dict[str, object]] = json.loads(self.cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def get(self, patch_id: str) -> Optional[str]:
+        """パッチがレビュー済みであれば、レビューしたコミットのハッシュを返します。"""
+        with self._lock:
+            entry = self._entries.get(patch_id)
+        return entry.get("commit") if entry else None
+
+    def put(self, patch_id: str, commit: str) -> None:
+        """パッチをレビュー済みとして記録します。"""
+        with self._lock:
+            self._entries[patch_id] = {"commit": commit, "reviewed_at": time.time()}
+            try:
+                self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.cache_path.with_suffix(".tmp")
+                tmp_path.write_text(json.dumps(self._entries, indent=2), encoding="utf-8")
+                tmp_path.replace(self.cache_path)
+            except OSError as e:
+                logging.warning(f"Patch-id cache could not be written ({self.cache_path}): {e}")
@@ -0,0 +1,378 @@
+import logging
+import queue
+import re
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.background_call import BackgroundCall, print_status
+from core.diff_sanitizer import SanitizeReport
+from core.gemini_reviewer import GeminiReviewer, GeminiReviewerError
+from core.review_findings import SEVERITIES, Finding, StructuredReview
+
+# 各モデルの呼び出し結果
+OUTCOME_OK = 'ok'
+OUTCOME_ERROR = 'error'
+OUTCOME_ABANDONED = 'abandoned'
+
+_FILE_HEADING_REGEX = re.compile(r'^#{3,4}\s')
+_ITEM_REGEX = re.compile(r'^[-*]\s')
+_CODE_BLOCK_REGEX = re.compile(r'```.*?```', re.DOTALL)
+_LINE_NUMBER_REGEX = re.compile(r'(\d+)\s*行目|行番号\s*[:：]?\s*(\d+)|\bL(\d+)\b')
+_OK_MARKERS = ('問題は見つかりませんでした',)
+
+
+@dataclass
+class ModelOutcome:
+    """合議レビューにおける1つのモデルの呼び出し結果。"""
+    model_name: str
+    status: str
+    latency: float = 0.0
+    usage: Optional[Dict[str, int]] = None
+    error: Optional[str] = None
+
+    def format(self) -> str:
+        if self.status == OUTCOME_OK:
+            return f"{self.model_name} {self.latency:.1f}s"
+        if self.status == OUTCOME_ABANDONED:
+            return f"{self.model_name} 打ち切り ({self.latency:.1f}s)"
+        return f"{self.model_name} 失敗 ({self.latency:.1f}s)"
+
+
+@dataclass
+class _ReviewItem:
+    """Markdown形式のレビュー結果に含まれる1件の指摘 (リスト項目)。"""
+    text: str
+    lines: List[int]
+    normalized: str
+    models: List[str] = field(default_factory=list)
+
+    @property
+    def is_ok(self) -> bool:
+        return any(marker in self.text for marker in _OK_MARKERS)
+
+
+def _normalize(text: str) -> str:
+    """指摘の比較用に、コードブロックと空白・記号の差異を取り除きます。"""
+    text = _CODE_BLOCK_REGEX.sub(" ", text)
+    return re.sub(r'[\s*`_]+', ' ', text).strip().lower()
+
+
+def _line_numbers(text: str) -> List[int]:
+    return [int(next(group for group in match.groups() if group)) for match in _LINE_NUMBER_REGEX.finditer(text)]
+
+
+def _is_similar(a_text: str, a_lines: List[int], b_text: str, b_lines: List[int],
+                line_tolerance: int, threshold: float) -> bool:
+    """同じ問題を指摘しているとみなせるか (行番号が近く、内容が類似している) を判定します。"""
+    if a_lines and b_lines and not any(abs(a - b) <= line_tolerance for a in a_lines for b in b_lines):
+        return False
+    return SequenceMatcher(None, a_text, b_text).ratio() >= threshold
+
+
+def _split_markdown_review(text: str) -> Tuple[str, List[Tuple[str, str, List[str]]]]:
+    """
+    Markdown形式のレビュー結果を (総評, [(ファイルのキー, 見出し行, [指摘事項])]) に分割します。
+    見出しの前の部分を総評とし、見出しの後のトップレベルのリスト項目を1件の指摘事項とします。
+    """
+    summary_lines: List[str] = []
+    sections: List[Tuple[str, str, List[str]]] = []
+    current: Optional[List[str]] = None
+    for line in text.splitlines():
+        if _FILE_HEADING_REGEX.match(line):
+            heading = line.strip()
+            key = heading.lstrip('#').split(':', 1)[-1].split('：', 1)[-1].strip().strip('`').lower()
+            sections.append((key, heading, []))
+            current = None
+        elif not sections:
+            summary_lines.append(line)
+        elif _ITEM_REGEX.match(line):
+            current = [line]
+            sections[-1][2].append(current)
+        elif current is not None:
+            current.append(line)
+    return "\n".join(summary_lines).strip(), [
+        (key, heading, ["\n".join(item).rstrip() for item in items]) for key, heading, items in sections
+    ]
+
+
+def merge_markdown_reviews(reviews: List[Tuple[str, str]], line_tolerance: int = 2,
+                           similarity_threshold: float = 0.6) -> Tuple[str, int]:
+    """
+    複数モデルのMarkdown形式のレビュー結果を1つにまとめます。
+    ファイルごとに、行番号が近く内容が類似する指摘を1件にまとめ、複数のモデルが指摘したものにはその数を付記します。
+
+    Args:
+        reviews (List[Tuple[str, str]]): (モデル名, レビュー結果) のリスト。先頭のモデルの総評を使用します。
+        line_tolerance (int): 同じ指摘とみなす行番号の差の最大値。
+        similarity_threshold (float): 同じ指摘とみなす内容の類似度 (0〜1)。
+
+    Returns:
+        Tuple[str, int]: (統合したレビュー結果, まとめた重複の件数)。
+    """
+    reviews = [(name, text) for name, text in reviews if text and text.strip()]
+    if not reviews:
+        return "", 0
+    if len(reviews) == 1:
+        return reviews[0][1], 0
+
+    summary = ""
+    headings: Dict[str, str] = {}
+    merged: Dict[str, List[_ReviewItem]] = {}
+    duplicates = 0
+    for name, text in reviews:
+        review_summary, sections = _split_markdown_review(text)
+        summary = summary or review_summary
+        for key, heading, items in sections:
+            headings.setdefault(key, heading)
+            bucket = merged.setdefault(key, [])
+            for item_text in items:
+                candidate = _ReviewItem(item_text, _line_numbers(item_text), _normalize(item_text))
+                match = next((existing for existing in bucket if existing.is_ok == candidate.is_ok and _is_similar(
+                    existing.normalized, existing.lines, candidate.normalized, candidate.lines,
+                    line_tolerance, similarity_threshold)), None)
+                if match is None:
+                    candidate.models.append(name)
+                    bucket.append(candidate)
+                elif name not in match.models:
+                    match.models.append(name)
+                    duplicates += 1
+
+    lines = [summary] if summary else []
+    for key, items in merged.items():
+        findings = [item for item in items if not item.is_ok]
+        # 他のモデルが指摘しているファイルでは「問題なし」を表示しない
+        shown = findings or items[:1]
+        lines.append("")
+        lines.append(headings[key])
+        for item in shown:
+            text = item.text
+            if len(item.models) > 1:
+                first_line, newline, rest = text.partition("\n")
+                text = f"{first_line} _({len(item.models)}/{len(reviews)} モデルが指摘)_{newline}{rest}"
+            lines.append(text)
+    return "\n".join(lines).strip(), duplicates
+
+
+def merge_structured_reviews(reviews: List[Tuple[str, StructuredReview]], line_tolerance: int = 2,
+                             similarity_threshold: float = 0.6) -> Tuple[Optional[StructuredReview], int]:
+    """
+    複数モデルの構造化レビュー結果を1つにまとめます。
+    同じファイルで行番号が近く、内容が類似する指摘は1件にまとめ、最も高い重要度を採用します。
+
+    Returns:
+        Tuple[Optional[StructuredReview], int]: (統合したレビュー結果, まとめた重複の件数)。
+    """
+    reviews = [(name, review) for name, review in reviews if review is not None]
+    if not reviews:
+        return None, 0
+
+    clusters: List[Tuple[Finding, str, List[str]]] = []
+    duplicates = 0
+    for name, review in reviews:
+        for finding in review.findings:
+            normalized = _normalize(finding.message)
+            for index, (existing, existing_normalized, models) in enumerate(clusters):
+                if existing.file == finding.file and _is_similar(
+                        existing_normalized, [existing.line], normalized, [finding.line],
+                        line_tolerance, similarity_threshold):
+                    if name not in models:
+                        models.append(name)
+                        duplicates += 1
+                    if SEVERITIES.index(finding.severity) < SEVERITIES.index(existing.severity):
+                        clusters[index] = (replace(finding, suggestion=finding.suggestion or existing.suggestion),
+                                           normalized, models)
+                    break
+            else:
+                clusters.append((finding, normalized, [name]))
+
+    return StructuredReview(summary=reviews[0][1].summary, findings=[finding for finding, _, _ in clusters]), duplicates
+
+
+class ConsensusReviewer:
+    """
+    同じ差分を複数のモデル (または temperature) で並列にレビューし、結果を1つにまとめるクラス。
+    定足数 (quorum) のモデルが応答した時点、または期限を過ぎた時点で、残りの呼び出しの結果を待たずに打ち切ります。
+    APIの呼び出し自体は中断できないため、打ち切った呼び出しは応答を破棄し、呼び出しごとのタイムアウトで終了します。
+    GeminiReviewer と同じ review_code インターフェースを持ち、そのまま置き換えて使用できます。
+    """
+
+    def __init__(self, reviewers: List[GeminiReviewer], quorum: Optional[int] = None,
+                 deadline_seconds: Optional[float] = None, line_tolerance: int = 2,
+                 similarity_threshold: float = 0.6, call_timeout_seconds: float = 600.0):
+        """
+        Args:
+            reviewers (List[GeminiReviewer]): 並列に呼び出すレビュアー。先頭のレビュアーの総評とプロンプトを基準にします。
+            quorum (Optional[int]): 結果をまとめるのに必要な応答数。省略時はすべてのレビュアー。
+            deadline_seconds (Optional[float]): 応答を待つ最大秒数。1件も応答がない場合はエラーになります。
+            line_tolerance (int): 同じ指摘とみなす行番号の差の最大値。
+            similarity_threshold (float): 同じ指摘とみなす内容の類似度 (0〜1)。
+            call_timeout_seconds (float): 各モデルのAPI呼び出しのタイムアウト秒数。期限がある場合は期限までの残り時間を上限とします。
+                打ち切った呼び出しのスレッドも、この秒数以内に終了します。
+
+        Raises:
+            ValueError: レビュアーが指定されていない場合、quorum が範囲外の場合、またはタイムアウトが正の数でない場合。
+        """
+        if not reviewers:
+            raise ValueError("合議レビューには1つ以上のモデルが必要です。")
+        quorum = quorum or len(reviewers)
+        if not 1 <= quorum <= len(reviewers):
+            raise ValueError(f"quorum は 1 から {len(reviewers)} の範囲で指定してください: {quorum}")
+        if call_timeout_seconds <= 0:
+            raise ValueError(f"API呼び出しのタイムアウトは正の秒数で指定してください: {call_timeout_seconds}")
+        self.reviewers = reviewers
+        self.quorum = quorum
+        self.deadline_seconds = deadline_seconds
+        self.line_tolerance = line_tolerance
+        self.similarity_threshold = similarity_threshold
+        self.call_timeout_seconds = call_timeout_seconds
+        self.model_name = "+".join(reviewer.label for reviewer in reviewers)
+        self._local = threading.local()
+
+    @property
+    def primary(self) -> GeminiReviewer:
+        return self.reviewers[0]
+
+    @property
+    def last_usage(self) -> Optional[Dict[str, int]]:
+        """このスレッドで直近に実行したレビューの、応答したモデルのトークン使用量の合計。"""
+        return getattr(self._local, "usage", None)
+
+    @property
+    def last_outcomes(self) -> List[ModelOutcome]:
+        """このスレッドで直近に実行したレビューの、モデルごとの結果と所要時間。"""
+        return getattr(self._local, "outcomes", [])
+
+    @property
+    def last_sanitize_report(self) -> Optional[SanitizeReport]:
+        return self.primary.last_sanitize_report
+
+    def render_prompt(self, code_diff: str, issue_key: Optional[str] = None, extra_context: Optional[str] = None,
+                      structured: bool = False, prepared: bool = False) -> Optional[str]:
+        """先頭のレビュアーが送信するプロンプトを組み立てます (すべてのモデルに同じプロンプトが送信されます)。"""
+        return self.primary.render_prompt(code_diff, issue_key, extra_context, structured, prepared=prepared)
+
+    def prepare_diff(self, code_diff: str) -> str:
+        """すべてのモデルに同じ差分を送信するため、フィルタリングとサニタイズは先頭のレビュアーで一度だけ行います。"""
+        return self.primary.prepare_diff(code_diff)
+
+    def review_code(self, code_diff: str, issue_key: Optional[str] = None, extra_context: Optional[str] = None,
+                    prepared: bool = False) -> str:
+        """
+        すべてのモデルで並列にレビューし、統合したMarkdown形式の結果を返します。
+
+        Args:
+            code_diff (str): レビュー対象のコード差分。
+            issue_key (Optional[str]): 関連する課題キー。
+            extra_context (Optional[str]): 差分に付随する参考情報。
+            prepared (bool): 差分が prepare_diff() でフィルタリング・サニタイズ済みの場合はTrue。
+
+        Returns:
+            str: 統合したレビュー結果のテキスト。
+
+        Raises:
+            GeminiReviewerError: 期限までにどのモデルからも結果が得られなかった場合。
+        """
+        prepared_diff = code_diff if prepared else self.prepare_diff(code_diff)
+        if not prepared_diff.strip():
+            return ""
+        results = self._fan_out(prepared_diff, issue_key, extra_context, structured=False)
+        merged, duplicates = merge_markdown_reviews(results, self.line_tolerance, self.similarity_threshold)
+        if merged and len(results) > 1:
+            merged += f"\n\n> 🤝 {len(results)} モデル ({', '.join(name for name, _ in results)}) のレビューを統合しました (重複した指摘 {duplicates} 件をまとめました)。"
+        return merged
+
+    def review_code_structured(self, code_diff: str, issue_key: Optional[str] = None,
+                               extra_context: Optional[str] = None, prepared: bool = False) -> Optional[StructuredReview]:
+        """すべてのモデルで並列に構造化レビューし、重複する指摘をまとめた結果を返します。"""
+        prepared_diff = code_diff if prepared else self.prepare_diff(code_diff)
+        if not prepared_diff.strip():
+            return None
+        results = self._fan_out(prepared_diff, issue_key, extra_context, structured=True)
+        merged, _ = merge_structured_reviews(results, self.line_tolerance, self.similarity_threshold)
+        return merged
+
+    def _call(self, reviewer: GeminiReviewer, structured: bool, code_diff: str, issue_key: Optional[str],
+              extra_context: Optional[str], deadline: Optional[float]) -> Tuple[Any, float, Optional[Dict[str, int]]]:
+        started = time.monotonic()
+        review = reviewer.review_code_structured if structured else reviewer.review_code
+        # 打ち切った呼び出しがスレッドに残り続けないよう、常にタイムアウトを渡す (期限がある場合は残り時間まで)
+        timeout = self.call_timeout_seconds
+        if deadline is not None:
+            timeout = max(0.001, min(timeout, deadline - started))
+        result = review(code_diff, issue_key=issue_key, extra_context=extra_context, prepared=True, timeout=timeout)
+        # 使用量はスレッドローカルのため、呼び出したスレッドで取り出して返す
+        return result, time.monotonic() - started, reviewer.last_usage
+
+    def _fan_out(self, code_diff: str, issue_key: Optional[str], extra_context: Optional[str],
+                 structured: bool) -> List[Tuple[str, Any]]:
+        """
+        すべてのレビュアーを並列に呼び出し、定足数または期限に達するまでに得られた (モデル名, 結果) を返します。
+        呼び出しはデーモンスレッドで実行するため、打ち切った呼び出しの応答を待たずに戻り、プロセスの終了も妨げません。
+        打ち切った呼び出しはAPIの応答またはタイムアウトまで実行を続けますが、結果と進捗の出力は破棄されます。
+        """
+        started = time.monotonic()
+        deadline = started + self.deadline_seconds if self.deadline_seconds is not None else None
+        outcomes: Dict[int, ModelOutcome] = {}
+        results: Dict[int, Any] = {}
+        completed: "queue.Queue[int]" = queue.Queue()
+        calls = [
+            BackgroundCall(self._call, reviewer, structured, code_diff, issue_key, extra_context, deadline,
+                           name=f"consensus-{index}", on_done=lambda _, index=index: completed.put(index)).start()
+            for index, reviewer in enumerate(self.reviewers)
+        ]
+        pending = set(range(len(calls)))
+        try:
+            while pending and len(results) < self.quorum:
+                timeout = None
+                if deadline is not None:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                try:
+                    index = completed.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                pending.discard(index)
+                label = self.reviewers[index].label
+                try:
+                    result, latency, usage = calls[index].result()
+                except Exception as e:
+                    outcomes[index] = ModelOutcome(label, OUTCOME_ERROR, time.monotonic() - started, error=str(e))
+                    continue
+                results[index] = result
+                outcomes[index] = ModelOutcome(label, OUTCOME_OK, latency, usage)
+        finally:
+            # 定足数・期限に達した時点で、未完了の呼び出しは結果を待たずに破棄し、遅れて届いた応答の出力も行わない
+            for index in pending:
+                calls[index].abandon()
+                outcomes[index] = ModelOutcome(self.reviewers[index].label, OUTCOME_ABANDONED, time.monotonic() - started)
+
+        ordered_outcomes = [outcomes[index] for index in sorted(outcomes)]
+        self._record(ordered_outcomes)
+
+        if not results:
+            errors = "; ".join(f"{o.model_name}: {o.error or '期限切れ'}" for o in ordered_outcomes)
+            raise GeminiReviewerError(f"合議レビューで結果を返したモデルがありませんでした ({errors})")
+        if len(results) < self.quorum:
+            print_status(f"--- ⚠️ 注意: 定足数 ({self.quorum}) に満たない {len(results)} モデルの結果をまとめます ---")
+        return [(self.reviewers[index].label, results[index]) for index in sorted(results)]
+
+    def _record(self, outcomes: List[ModelOutcome]) -> None:
+        """モデルごとの所要時間とトークン使用量を記録し、ログに出力します。"""
+        usage: Optional[Dict[str, int]] = None
+        for outcome in outcomes:
+            logging.info(
+                f"[consensus] model={outcome.model_name} status={outcome.status} latency={outcome.latency:.2f}s "
+                f"output_tokens={(outcome.usage or {}).get('output_tokens', '-')}"
+                + (f" error={outcome.error}" if outcome.error else "")
+            )
+            if outcome.usage:
+                usage = usage or {}
+                for key, value in outcome.usage.items():
+                    usage[key] = usage.get(key, 0) + value
+        self._local.outcomes = outcomes
+        self._local.usage = usage
+        print_status(f"--- 🤝 合議レビュー: {', '.join(outcome.format() for outcome in outcomes)} ---")
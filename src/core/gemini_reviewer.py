@@ -1,7 +1,15 @@
 import textwrap
+import threading
 import google.generativeai as genai
 from pathlib import Path
-from typing import Optional, List
+from typing import Callable, Optional, List, Tuple, Dict
+
+from core.background_call import print_status
+from core.diff_sanitizer import DiffSanitizer, SanitizeReport
+from core.prompt_cache import PromptCacheRegistry
+from core.prompt_templates import ISSUE_CONTEXT_PLACEHOLDER, PromptTemplate, PromptTemplateCache, default_template_cache
+from core.review_findings import FINDINGS_SCHEMA, DiffPositionMap, StructuredReview, parse_review_json
+from core.traffic_cassette import TrafficCassette
 
 # --- Custom Exceptions for clear error signaling ---
 class GeminiReviewerError(Exception):
@@ -14,18 +22,91 @@ class APIKeyNotFoundError(GeminiReviewerError):
 
 class GeminiReviewer:
 
-    def __init__(self, api_key: str, model_name: str,
+    def __init__(self, api_key: Optional[str], model_name: str,
                  prompt_generic_path: Path, prompt_backlog_path: Path,
-                 allowed_extensions: Optional[List[str]] = None):
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(model_name)
+                 allowed_extensions: Optional[List[str]] = None,
+                 repository_context: Optional[str] = None,
+                 prompt_cache: Optional[PromptCacheRegistry] = None,
+                 prompt_structured_path: Optional[Path] = None,
+                 template_cache: Optional[PromptTemplateCache] = None,
+                 diff_sanitizer: Optional[DiffSanitizer] = None,
+                 cassette: Optional[TrafficCassette] = None,
+                 temperature: Optional[float] = None,
+                 issue_context_provider: Optional[Callable[[str], Optional[str]]] = None):
+        # ドライランではAPIキーなしでプロンプトの組み立てのみを行うため、キーがある場合のみ設定する
+        if api_key:
+            genai.configure(api_key=api_key)
+        self.model_name = model_name
+        # Noneの場合はモデルのデフォルトの temperature を使用する
+        self.temperature = temperature
+        # API を直接呼び出すモデル。カセット指定時は self.model が記録・再生用のラッパーになる
+        self._api_model = genai.GenerativeModel(model_name)
+        self.cassette = cassette
+        self.model = cassette.wrap_model(self._api_model, model_name) if cassette else self._api_model
+        self.repository_context = repository_context.strip() if repository_context else None
+        self.prompt_cache = prompt_cache
+        # 直近の呼び出しのトークン使用量。並列レビューに備えてスレッドごとに保持する
+        self._local = threading.local()
         self.allowed_extensions = [ext.lower() for ext in allowed_extensions] if allowed_extensions else None
+        # 送信前に差分からバイナリ・自動生成ファイルや秘密情報を除去する (Noneの場合は行わない)
+        self.diff_sanitizer = diff_sanitizer
+        # テンプレートはファイルの更新日時をキーにキャッシュされ、変更時のみ読み込み直される
+        self.template_cache = template_cache or default_template_cache
+        self.prompt_generic_path = prompt_generic_path
+        self.prompt_backlog_path = prompt_backlog_path
+        # 課題キーから課題の内容を返す関数。プロンプトの組み立て時に初めて呼び出されるため、取得を先に開始しておける
+        self.issue_context_provider = issue_context_provider
+        # 構造化出力用のテンプレートは任意 (review_code_structured 使用時のみ必要)
+        self.prompt_structured_path = prompt_structured_path
+        self._load_template(prompt_generic_path)
+        self._load_template(prompt_backlog_path)
+
+    def _load_template(self, path: Path) -> PromptTemplate:
         try:
-            self.prompt_generic_template = prompt_generic_path.read_text(encoding="utf-8")
-            self.prompt_backlog_template = prompt_backlog_path.read_text(encoding="utf-8")
+            return self.template_cache.load(path)
         except FileNotFoundError as e:
             raise GeminiReviewerError(f"プロンプトファイルが見つかりません: {e.filename}") from e
 
+    @property
+    def prompt_generic_template(self) -> str:
+        return self._load_template(self.prompt_generic_path).text
+
+    @property
+    def prompt_backlog_template(self) -> str:
+        return self._load_template(self.prompt_backlog_path).text
+
+    @property
+    def prompt_structured_template(self) -> Optional[str]:
+        template = self.template_cache.load_optional(self.prompt_structured_path)
+        return template.text if template else None
+
+    @property
+    def label(self) -> str:
+        """ログや合議レビューの結果に表示する名前 (temperature 指定時は 'モデル名@temperature')。"""
+        return self.model_name if self.temperature is None else f"{self.model_name}@{self.temperature:g}"
+
+    @property
+    def last_usage(self) -> Optional[Dict[str, int]]:
+        """このスレッドで直近に実行したレビューのトークン使用量。"""
+        return getattr(self._local, "usage", None)
+
+    @property
+    def last_sanitize_report(self) -> Optional[SanitizeReport]:
+        """このスレッドで直近にサニタイズした差分の除去内容。"""
+        return getattr(self._local, "sanitize_report", None)
+
+    @staticmethod
+    def _extract_usage(response) -> Optional[Dict[str, int]]:
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return None
+        return {
+            "prompt_tokens": getattr(usage, "prompt_token_count", 0) or 0,
+            "cached_tokens": getattr(usage, "cached_content_token_count", 0) or 0,
+            "output_tokens": getattr(usage, "candidates_token_count", 0) or 0,
+            "total_tokens": getattr(usage, "total_token_count", 0) or 0,
+        }
+
     def _filter_diff_by_extensions(self, code_diff: str) -> str:
         # 以前のリファクタリングで定義されたフィルタリングロジック
         if not self.allowed_extensions:
@@ -48,27 +129,135 @@ class GeminiReviewer:
 
         return "\n".join(filtered_diff)
 
-    def _build_review_prompt(self, code_diff: str, issue_key: Optional[str]) -> str:
+    def _prepare_diff(self, code_diff: str) -> str:
+        """拡張子によるフィルタリングとサニタイズを行い、送信する差分を返します。"""
+        filtered_diff = self._filter_diff_by_extensions(code_diff)
+        self._local.sanitize_report = None
+        if self.diff_sanitizer and filtered_diff.strip():
+            filtered_diff, self._local.sanitize_report = self.diff_sanitizer.sanitize(filtered_diff)
+        return filtered_diff
+
+    def _build_prompt_parts(self, code_diff: str, issue_key: Optional[str],
+                            extra_context: Optional[str] = None, structured: bool = False) -> Tuple[str, str]:
         """
-        issue_keyの有無に応じて適切なプロンプトテンプレートを選択し、変数を埋め込む。
+        プロンプトを、レビューごとに変わらない静的プレフィックスと、差分を含む可変部分に分割して組み立てる。
+        静的プレフィックスはコンテキストキャッシュの対象になります。
         """
+        if structured:
+            template = self.template_cache.load_optional(self.prompt_structured_path)
+            if not template:
+                raise GeminiReviewerError("構造化出力用のプロンプトファイル (structured.md) が見つかりません。")
+            if issue_key:
+                template = template.with_preamble(f"関連するBacklogの課題: {issue_key}\n\n")
+        else:
+            template = self._load_template(self.prompt_backlog_path if issue_key else self.prompt_generic_path)
+
+        issue_context = self._issue_context_for(issue_key)
+        # テンプレートに {issue_context} がない場合は、課題の内容を可変部分の末尾に追加する
+        appended_context = ""
+        if issue_context and ISSUE_CONTEXT_PLACEHOLDER not in template.text:
+            appended_context = f"\n\n{issue_context}"
+
+        if not template.has_placeholder:
+            # プレースホルダーがないテンプレートは分割できないため、全体を可変部分として扱う
+            return "", (self._format_template(template.text, code_diff, issue_key, issue_context)
+                        + appended_context + self._format_extra_context(extra_context))
+
+        prefix = self._format_template(template.head, "", issue_key, issue_context)
+        if self.repository_context:
+            prefix = (
+                "以下はレビュー対象リポジトリ全体に関する前提情報です。レビューの際に考慮してください。\n"
+                f"{self.repository_context}\n\n{prefix}"
+            )
+        return prefix, (code_diff + self._format_template(template.tail, "", issue_key, issue_context)
+                        + appended_context + self._format_extra_context(extra_context))
+
+    def _issue_context_for(self, issue_key: Optional[str]) -> str:
+        """課題の内容を取得します。取得できない場合は空文字列を返し、レビューは課題キーのみで続行します。"""
+        if not issue_key or not self.issue_context_provider:
+            return ""
+        return self.issue_context_provider(issue_key) or ""
+
+    @staticmethod
+    def _format_extra_context(extra_context: Optional[str]) -> str:
+        """差分に付随する参考情報（変更されたシンボルの呼び出し箇所など）をプロンプト末尾用に整形する。"""
+        if not extra_context:
+            return ""
+        return (
+            "\n\n以下は変更された関数・クラスのリポジトリ内での呼び出し箇所です。影響範囲の確認に利用してください。\n"
+            f"--- related context start ---\n{extra_context}\n--- related context end ---"
+        )
+
+    @staticmethod
+    def _format_template(template: str, code_diff: str, issue_key: Optional[str], issue_context: str = "") -> str:
         if issue_key:
             # Backlog用テンプレートに変数を埋め込んで返す
-            return self.prompt_backlog_template.format(
-                issue_key=issue_key,
-                code_diff=code_diff
-            )
-        else:
-            # 汎用テンプレートに変数を埋め込んで返す
-            return self.prompt_generic_template.format(code_diff=code_diff)
+            return template.format(issue_key=issue_key, code_diff=code_diff, issue_context=issue_context)
+        # 汎用テンプレートに変数を埋め込んで返す
+        return template.format(code_diff=code_diff)
+
+    def _build_review_prompt(self, code_diff: str, issue_key: Optional[str], extra_context: Optional[str] = None,
+                             structured: bool = False) -> str:
+        """
+        issue_keyの有無に応じて適切なプロンプトテンプレートを選択し、変数を埋め込む。
+        """
+        prefix, dynamic_part = self._build_prompt_parts(code_diff, issue_key, extra_context, structured)
+        return prefix + dynamic_part
 
-    def review_code(self, code_diff: str, issue_key: Optional[str] = None) -> str:
+    def _generate(self, code_diff: str, issue_key: Optional[str], extra_context: Optional[str] = None,
+                  structured: bool = False, timeout: Optional[float] = None):
+        """
+        プロンプトを組み立ててAPIを呼び出す。静的プレフィックスがキャッシュ済みであれば差分部分のみを送信します。
+        structured が True の場合は、JSONスキーマに従った応答を要求します。
+        timeout を指定した場合は、その秒数で応答を待つのをやめるようAPIクライアントに指示します。
+        """
+        prefix, dynamic_part = self._build_prompt_parts(code_diff, issue_key, extra_context, structured)
+        kwargs = {}
+        if timeout is not None:
+            kwargs["request_options"] = {"timeout": timeout}
+        generation_config = {}
+        if structured:
+            generation_config.update(response_mime_type="application/json", response_schema=FINDINGS_SCHEMA)
+        if self.temperature is not None:
+            generation_config["temperature"] = self.temperature
+        if generation_config:
+            kwargs["generation_config"] = genai.GenerationConfig(**generation_config)
+
+        if self.prompt_cache and prefix:
+            # 同じプレフィックスでも temperature などが異なるレビュアーには、別のモデルを生成させる
+            model_config = {"temperature": self.temperature} if self.temperature is not None else None
+            cached_model = self.prompt_cache.get_model(self.model_name, prefix, self._api_model, model_config)
+            if cached_model is not None:
+                if self.cassette:
+                    # キャッシュの有無で照合キーが変わらないよう、プレフィックスを含めたプロンプト全体で記録する
+                    cached_model = self.cassette.wrap_model(cached_model, self.model_name, prefix=prefix)
+                return cached_model.generate_content(dynamic_part, **kwargs)
+
+        return self.model.generate_content(prefix + dynamic_part, **kwargs)
+
+    def render_prompt(self, code_diff: str, issue_key: Optional[str] = None, extra_context: Optional[str] = None,
+                      structured: bool = False, prepared: bool = False) -> Optional[str]:
+        """
+        APIを呼び出さずに、フィルタリング後の差分から実際に送信されるプロンプトを組み立てます。
+        フィルタリングによりレビュー対象の差分がなくなった場合はNoneを返します。
+        prepared が True の場合は、差分を prepare_diff() の結果としてそのまま使用します。
+        """
+        filtered_diff = code_diff if prepared else self._prepare_diff(code_diff)
+        if not filtered_diff.strip():
+            return None
+        return self._build_review_prompt(filtered_diff, issue_key, extra_context, structured)
+
+    def review_code(self, code_diff: str, issue_key: Optional[str] = None, extra_context: Optional[str] = None,
+                    prepared: bool = False, timeout: Optional[float] = None) -> str:
         """
         Gemini APIを使用してコード差分をレビューします。
 
         Args:
             code_diff (str): レビュー対象のコード差分。
             issue_key (Optional[str]): 関連する課題キー。Noneの場合はプロンプトに含めません。
+            extra_context (Optional[str]): 差分に付随する参考情報（呼び出し箇所など）。
+            prepared (bool): 差分が prepare_diff() でフィルタリング・サニタイズ済みの場合はTrue。
+            timeout (Optional[float]): API呼び出しのタイムアウト秒数。
 
         Returns:
             str: レビュー結果のテキスト。
@@ -76,19 +265,67 @@ class GeminiReviewer:
         Raises:
             GeminiReviewerError: API呼び出しや結果の取得に失敗した場合。
         """
-        # 1. フィルタリング処理を実行
-        filtered_diff = self._filter_diff_by_extensions(code_diff)
+        _, review_text = self._request_review(code_diff, issue_key, extra_context, structured=False,
+                                              prepared=prepared, timeout=timeout)
+        return review_text
 
-        if not filtered_diff.strip():
-            if code_diff.strip():
-                print(f"--- ⚠️ 注意: フィルタリングによりレビュー対象の差分がなくなりました。許可された拡張子: {self.allowed_extensions} ---")
-            return ""
+    def review_code_structured(self, code_diff: str, issue_key: Optional[str] = None,
+                               extra_context: Optional[str] = None, prepared: bool = False,
+                               timeout: Optional[float] = None) -> Optional[StructuredReview]:
+        """
+        Gemini APIのJSONスキーマ出力を使用してコード差分をレビューし、行に紐づいた指摘事項を返します。
+        各指摘事項には、差分上の位置（ハンク）が設定されます。
 
-        # 2. プロンプト生成ロジックを利用してプロンプトを組み立てる
-        prompt = self._build_review_prompt(code_diff=filtered_diff, issue_key=issue_key)
+        Args:
+            code_diff (str): レビュー対象のコード差分。
+            issue_key (Optional[str]): 関連する課題キー。
+            extra_context (Optional[str]): 差分に付随する参考情報（呼び出し箇所など）。
+            prepared (bool): 差分が prepare_diff() でフィルタリング・サニタイズ済みの場合はTrue。
+            timeout (Optional[float]): API呼び出しのタイムアウト秒数。
+
+        Returns:
+            Optional[StructuredReview]: 検証済みのレビュー結果。フィルタリングにより差分がなくなった場合はNone。
+
+        Raises:
+            GeminiReviewerError: API呼び出しの失敗、または結果がスキーマに適合しない場合。
+        """
+        filtered_diff, review_text = self._request_review(code_diff, issue_key, extra_context, structured=True,
+                                                          prepared=prepared, timeout=timeout)
+        if not review_text:
+            return None
+        try:
+            review = parse_review_json(review_text)
+        except ValueError as e:
+            raise GeminiReviewerError(f"構造化レビュー結果の検証に失敗しました: {e}") from e
+        return DiffPositionMap.from_diff(filtered_diff).anchor(review)
+
+    def prepare_diff(self, code_diff: str) -> str:
+        """
+        拡張子によるフィルタリングとサニタイズを行い、送信する差分を返します。除去した内容は last_sanitize_report で参照できます。
+        同じ差分を複数のレビュアーに送信する場合は、一度だけ実行して prepared=True でレビューしてください。
+        """
+        filtered_diff = self._prepare_diff(code_diff)
+        if self.last_sanitize_report and self.last_sanitize_report.changed:
+            print_status(f"--- 🧹 差分をサニタイズしました: {self.last_sanitize_report.format_summary()} ---")
+        if not filtered_diff.strip() and code_diff.strip():
+            print_status(f"--- ⚠️ 注意: フィルタリングによりレビュー対象の差分がなくなりました。許可された拡張子: {self.allowed_extensions} ---")
+        return filtered_diff
+
+    def _request_review(self, code_diff: str, issue_key: Optional[str], extra_context: Optional[str],
+                        structured: bool, prepared: bool = False, timeout: Optional[float] = None) -> Tuple[str, str]:
+        """差分をフィルタリングしてAPIを呼び出し、(フィルタリング後の差分, 応答テキスト) を返します。"""
+        self._local.usage = None
+
+        # 1. フィルタリングとサニタイズを実行 (呼び出し元で実行済みの場合は省略し、除去内容は prepare_diff() の結果のまま残す)
+        filtered_diff = code_diff if prepared else self.prepare_diff(code_diff)
+        if not filtered_diff.strip():
+            return filtered_diff, ""
 
         try:
-            response = self.model.generate_content(prompt)
+            # 2. プロンプトを組み立ててAPIを呼び出す（静的プレフィックスはキャッシュを利用）
+            response = self._generate(code_diff=filtered_diff, issue_key=issue_key,
+                                      extra_context=extra_context, structured=structured, timeout=timeout)
+            self._local.usage = self._extract_usage(response)
 
             if not response.text:
                 if response.prompt_feedback.block_reason:
@@ -97,9 +334,9 @@ class GeminiReviewer:
                 raise GeminiReviewerError("AIからのレビュー結果が空でした。")
 
             review_text = response.text.strip()
-            print("--- ✅ レビューコメントの生成が完了しました ---")
+            print_status("--- ✅ レビューコメントの生成が完了しました ---")
 
-            return review_text
+            return filtered_diff, review_text
 
         except Exception as e:
-            raise GeminiReviewerError(f"Gemini APIの処理中に予期せぬエラーが発生しました: {e}") from e
\ No newline at end of file
+            raise GeminiReviewerError(f"Gemini APIの処理中に予期せぬエラーが発生しました: {e}") from e
@@ -1,8 +1,13 @@
 import subprocess
 import os
+import re
+import json
 import shutil
+import signal
+import threading
+import time
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional, Tuple, Union
 import logging
 
 # ロギング設定 (Go版のログ出力に近づける)
@@ -23,13 +28,45 @@ class BranchNotFoundError(GitClientError):
     """Raised when a branch is not found in the remote repository."""
     pass
 
+class GitTimeoutError(GitCommandError):
+    """Raised when a git command exceeds its timeout and is killed."""
+    pass
+
+class GitCancelledError(GitCommandError):
+    """Raised when a git command is cancelled via GitClient.cancel()."""
+    pass
+
+# 操作の種類ごとのデフォルトのタイムアウト (秒)
+DEFAULT_GIT_TIMEOUTS: Dict[str, float] = {
+    'clone': 1800,
+    'fetch': 600,
+    'diff': 300,
+    'default': 120,
+}
+# 差分系のコマンドは 'diff' のタイムアウトを使用する
+_DIFF_OPERATIONS = {'diff', 'show', 'log', 'patch-id', 'cat-file', 'ls-tree'}
+# --progress を付与して進捗を報告するネットワーク系のコマンド
+_PROGRESS_OPERATIONS = {'clone', 'fetch'}
+# タイムアウト・キャンセル後に、出力の読み取りスレッドの終了を待つ最大秒数
+_READER_JOIN_TIMEOUT = 5
+_PROGRESS_REGEX = re.compile(
+    r'^(?:remote:\s*)?(?P<stage>[A-Za-z][A-Za-z ]+):\s+(?P<percent>\d+)%(?:\s+\((?P<current>\d+)/(?P<total>\d+)\))?'
+)
+
+ProgressCallback = Callable[[str, str, int, Optional[int], Optional[int]], None]
+
 class GitClient:
     """
     Gitリポジトリを操作するためのクライアントクラス。
     Go版と同様に、リポジトリの存在チェック、URL不一致時の自動再クローン機能を提供します。
     """
 
-    def __init__(self, repo_url: str, repo_path: str, ssh_key_path: Optional[str] = None):
+    FETCH_STAMP_FILE = 'gemini-reviewer-fetch.json'
+
+    def __init__(self, repo_url: str, repo_path: str, ssh_key_path: Optional[str] = None,
+                 fetch_max_age: float = 0, timeouts: Optional[Dict[str, float]] = None,
+                 git_config: Optional[Dict[str, str]] = None,
+                 progress_callback: Optional[ProgressCallback] = None):
         """
         GitClientを初期化し、リポジトリをクローンまたは開きます。
         このコンストラクタ内で clone_or_open の処理を実行します。
@@ -38,10 +75,20 @@ class GitClient:
             repo_url (str): クローンするGitリポジトリのURL。
             local_path (str): ローカルリポジトリへのパス。
             ssh_key_path (Optional[str]): SSH秘密鍵へのパス。
+            fetch_max_age (float): 前回のフェッチからこの秒数以内であれば、別プロセスの実行でもフェッチを省略します。
+            timeouts (Optional[Dict[str, float]]): 操作の種類 ('clone', 'fetch', 'diff', 'default') ごとのタイムアウト秒数。
+            git_config (Optional[Dict[str, str]]): すべてのgitコマンドに `-c key=value` として渡す設定
+                (例: {'pack.threads': '4', 'diff.renameLimit': '2000'})。
+            progress_callback (Optional[ProgressCallback]): clone/fetch の進捗を受け取るコールバック
+                (操作名, 段階, 進捗率, 現在値, 総数)。省略時はログに出力します。
         """
         self.repo_url = repo_url
         self.repo_path = Path(repo_path).resolve()
         self.ssh_key_path = ssh_key_path
+        self.fetch_max_age = fetch_max_age
+        # このインスタンスでフェッチ済み (またはクローン直後) のリモート
+        self._fetched_remotes = set()
+        self._init_runtime(timeouts, git_config, progress_callback)
 
         # SSHキーパスを環境変数 GIT_SSH_COMMAND に設定
         if self.ssh_key_path:
@@ -56,37 +103,198 @@ class GitClient:
         self.clone_or_open()
 
 
-    def _run_git_command(self, command: List[str], check: bool = True, cwd: Path = None) -> subprocess.CompletedProcess:
+    def _init_runtime(self, timeouts: Optional[Dict[str, float]], git_config: Optional[Dict[str, str]],
+                      progress_callback: Optional[ProgressCallback]) -> None:
+        """コマンド実行に関する状態 (タイムアウト・設定・キャンセル) を初期化します。"""
+        self.apply_options(timeouts, git_config)
+        self.progress_callback = progress_callback or self._log_progress
+        self._cancel_event = threading.Event()
+        self._active_processes = set()
+        self._process_lock = threading.Lock()
+        self._last_progress: Dict[Tuple[str, str], int] = {}
+
+    def apply_options(self, timeouts: Optional[Dict[str, float]] = None,
+                      git_config: Optional[Dict[str, str]] = None) -> None:
+        """既存のクライアントのタイムアウトと `-c` 設定を置き換えます。次に実行するgitコマンドから反映されます。"""
+        self.timeouts = {**DEFAULT_GIT_TIMEOUTS, **(timeouts or {})}
+        self.git_config = dict(git_config or {})
+
+    def _timeout_for(self, operation: str) -> Optional[float]:
+        if operation in ('clone', 'fetch'):
+            key = operation
+        elif operation in _DIFF_OPERATIONS:
+            key = 'diff'
+        else:
+            key = 'default'
+        timeout = self.timeouts.get(key)
+        return timeout if timeout and timeout > 0 else None
+
+    def _log_progress(self, operation: str, stage: str, percent: int,
+                      current: Optional[int], total: Optional[int]) -> None:
+        """デフォルトの進捗コールバック。段階ごとに25%刻みでログに出力します。"""
+        step = percent // 25
+        if self._last_progress.get((operation, stage)) == step:
+            return
+        self._last_progress[(operation, stage)] = step
+        counts = f" ({current}/{total})" if total else ""
+        logging.info(f"git {operation}: {stage} {percent}%{counts}")
+
+    def cancel(self) -> None:
+        """実行中のすべてのgitコマンドをプロセスグループごと終了させ、以降のコマンド実行も中止します。"""
+        self._cancel_event.set()
+        with self._process_lock:
+            processes = list(self._active_processes)
+        for process in processes:
+            self._kill_process_group(process)
+
+    def reset_cancellation(self) -> None:
+        """cancel() の状態を解除し、再びコマンドを実行できるようにします。"""
+        self._cancel_event.clear()
+
+    @staticmethod
+    def _kill_process_group(process: subprocess.Popen) -> None:
+        """gitが起動した子プロセス (ssh, index-pack など) も含めて終了させます。"""
+        if process.poll() is not None:
+            return
+        try:
+            if os.name == 'posix':
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def _communicate_with_progress(self, process: subprocess.Popen, operation: str,
+                                   timeout: Optional[float]) -> Tuple[bytes, bytes]:
+        """stderr の --progress 出力を逐次解析しながら、プロセスの終了を待ちます。"""
+        stdout_chunks: List[bytes] = []
+        stderr_chunks: List[bytes] = []
+        pending = ['']
+
+        def on_stderr(chunk: bytes):
+            # 進捗行は \r で上書きされるため、\r と \n の両方で区切って解析する
+            text = pending[0] + chunk.decode('utf-8', errors='replace')
+            *lines, pending[0] = re.split(r'[\r\n]', text)
+            for line in lines:
+                match = _PROGRESS_REGEX.match(line.strip())
+                if match:
+                    current, total = match.group('current'), match.group('total')
+                    self.progress_callback(
+                        operation, match.group('stage').strip(), int(match.group('percent')),
+                        int(current) if current else None, int(total) if total else None
+                    )
+
+        def pump(stream, sink: List[bytes], on_chunk=None):
+            for chunk in iter(lambda: stream.read1(4096), b''):
+                sink.append(chunk)
+                if on_chunk:
+                    on_chunk(chunk)
+
+        readers = [
+            threading.Thread(target=pump, args=(process.stdout, stdout_chunks), daemon=True),
+            threading.Thread(target=pump, args=(process.stderr, stderr_chunks, on_stderr), daemon=True),
+        ]
+        for reader in readers:
+            reader.start()
+        try:
+            process.wait(timeout=timeout)
+        except BaseException:
+            # パイプは読み取りスレッドが読んでいるため communicate() は使わず、終了させてから読み取りの完了を待つ
+            self._kill_process_group(process)
+            process.wait()
+            raise
+        finally:
+            for reader in readers:
+                reader.join(_READER_JOIN_TIMEOUT)
+        return b''.join(stdout_chunks), b''.join(stderr_chunks)
+
+    def _run_git_command(self, command: List[str], check: bool = True, cwd: Path = None,
+                         input: Optional[Union[str, bytes]] = None, binary: bool = False,
+                         timeout: Optional[float] = None) -> subprocess.CompletedProcess:
         """
         指定されたGitコマンドを実行する内部ヘルパーメソッド。
+        操作の種類に応じたタイムアウトを適用し、タイムアウトやキャンセル時はプロセスグループごと終了させます。
 
         Args:
             command (List[str]): 実行するコマンドのリスト。
-            check (bool): Trueの場合、コマンドが失敗したらCalledProcessErrorを送出する。
+            check (bool): Trueの場合、コマンドが失敗したらGitCommandErrorを送出する。
             cwd (Path): コマンドを実行するディレクトリ。指定がなければ self.repo_path。
+            input (Optional[Union[str, bytes]]): 標準入力に渡すデータ。
+            binary (bool): Trueの場合、入出力をデコードせずにバイト列のまま扱う。
+            timeout (Optional[float]): タイムアウト秒数。指定がなければ操作の種類ごとの設定値。
 
         Returns:
             subprocess.CompletedProcess: 実行結果。
 
         Raises:
             GitCommandError: 'git'コマンドが見つからない、またはコマンド実行に失敗した場合。
+            GitTimeoutError: タイムアウトした場合。
+            GitCancelledError: cancel() によって中止された場合。
         """
         if cwd is None:
             cwd = self.repo_path
 
+        operation = command[0] if command else ''
+        if timeout is None:
+            timeout = self._timeout_for(operation)
+        track_progress = operation in _PROGRESS_OPERATIONS
+        if track_progress:
+            command = [operation, '--progress'] + command[1:]
+
+        config_args = [arg for key, value in self.git_config.items() for arg in ('-c', f'{key}={value}')]
+        args = ['git'] + config_args + command
+        display_command = ' '.join(['git'] + command)
+
+        raw_output = binary or track_progress
+        if isinstance(input, str) and raw_output:
+            input = input.encode('utf-8')
+        # cancel() はイベントを設定してからロックを取得するため、確認と登録を同じロック内で行えば取りこぼしがない
+        with self._process_lock:
+            if self._cancel_event.is_set():
+                raise GitCancelledError(f"Gitコマンド '{display_command}' はキャンセルされました。")
+            try:
+                process = subprocess.Popen(
+                    args,
+                    cwd=cwd,
+                    stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    # 子プロセスをまとめて終了できるよう、新しいプロセスグループで起動する
+                    start_new_session=(os.name == 'posix'),
+                    **({} if raw_output else {'text': True, 'encoding': 'utf-8', 'errors': 'replace'})
+                )
+            except FileNotFoundError:
+                raise GitCommandError("'git' コマンドが見つかりません。Gitがインストールされ、PATHが通っているか確認してください。")
+            self._active_processes.add(process)
         try:
-            return subprocess.run(
-                ['git'] + command,
-                cwd=cwd,
-                capture_output=True,
-                text=True,
-                check=check,
-                encoding='utf-8'
-            )
-        except FileNotFoundError:
-            raise GitCommandError("'git' コマンドが見つかりません。Gitがインストールされ、PATHが通っているか確認してください。")
-        except subprocess.CalledProcessError as e:
-            raise GitCommandError(f"Gitコマンド '{' '.join(e.cmd)}' の実行に失敗しました。", stderr=e.stderr) from e
+            if track_progress:
+                stdout, stderr = self._communicate_with_progress(process, operation, timeout)
+            else:
+                stdout, stderr = process.communicate(input=input, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            if not track_progress:
+                self._kill_process_group(process)
+                process.communicate()
+            raise GitTimeoutError(f"Gitコマンド '{display_command}' が {timeout:.0f} 秒でタイムアウトしたため中止しました。")
+        except BaseException:
+            # KeyboardInterrupt などで中断された場合も、別セッションの git を残さない
+            self._kill_process_group(process)
+            raise
+        finally:
+            with self._process_lock:
+                self._active_processes.discard(process)
+
+        if track_progress and not binary:
+            stdout = stdout.decode('utf-8', errors='replace')
+            stderr = stderr.decode('utf-8', errors='replace')
+
+        if self._cancel_event.is_set() and process.returncode != 0:
+            raise GitCancelledError(f"Gitコマンド '{display_command}' はキャンセルされました。")
+        if check and process.returncode != 0:
+            stderr_text = stderr.decode('utf-8', errors='replace') if isinstance(stderr, bytes) else stderr
+            raise GitCommandError(f"Gitコマンド '{display_command}' の実行に失敗しました。", stderr=stderr_text)
+
+        return subprocess.CompletedProcess(args, process.returncode, stdout, stderr)
 
 
     def _get_remote_url(self, remote: str = "origin") -> Optional[str]:
@@ -123,6 +331,9 @@ class GitClient:
         except GitCommandError as e:
             raise GitClientError(f"Failed to clone repository {url}: {e.stderr}")
 
+        # クローン直後のリモート情報は最新のため、続くフェッチは不要
+        self._mark_fetched("origin")
+
 
     def clone_or_open(self):
         """
@@ -165,11 +376,57 @@ class GitClient:
             logging.info("Repository URL matches. Using existing local repository.")
             print(f"--- ✅ 既存リポジトリを利用します: {self.repo_path} ---")
 
-    def fetch_updates(self, remote: str = "origin") -> None:
-        """リモートリポジトリの最新情報を取得します。"""
+    def _fetch_stamp_path(self) -> Path:
+        return self.repo_path / '.git' / self.FETCH_STAMP_FILE
+
+    def _last_fetch_time(self, remote: str) -> Optional[float]:
+        """前回このツールがフェッチした時刻 (エポック秒) を返します。記録がなければNone。"""
+        try:
+            stamps = json.loads(self._fetch_stamp_path().read_text(encoding='utf-8'))
+            return float(stamps[remote])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _mark_fetched(self, remote: str) -> None:
+        """フェッチ済みであることをインスタンスとリポジトリ内のスタンプファイルに記録します。"""
+        self._fetched_remotes.add(remote)
+        stamp_path = self._fetch_stamp_path()
+        try:
+            stamps = json.loads(stamp_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            stamps = {}
+        stamps[remote] = time.time()
+        try:
+            stamp_path.write_text(json.dumps(stamps), encoding='utf-8')
+        except OSError as e:
+            logging.warning(f"Fetch stamp could not be written ({stamp_path}): {e}")
+
+    def fetch_updates(self, remote: str = "origin", force: bool = False) -> bool:
+        """
+        リモートリポジトリの最新情報を取得します。
+        同じインスタンスでは一度だけ実行し、前回のフェッチから fetch_max_age 秒以内の場合も省略します。
+
+        Args:
+            remote (str): リモート名（デフォルトは 'origin'）。
+            force (bool): Trueの場合、フェッチ済みかどうかに関わらず実行します。
+
+        Returns:
+            bool: 実際にフェッチを実行した場合はTrue。
+        """
+        if not force:
+            if remote in self._fetched_remotes:
+                return False
+            last_fetch = self._last_fetch_time(remote)
+            if last_fetch is not None and time.time() - last_fetch < self.fetch_max_age:
+                print(f"'{self.repo_path.name}' のリモート情報は {time.time() - last_fetch:.0f} 秒前に取得済みのため、git fetch を省略します。")
+                self._fetched_remotes.add(remote)
+                return False
+
         print(f"'{self.repo_path.name}' のリモート情報を更新中 (git fetch)...")
         # 既に repo_path が設定されているので self.repo_path を cwd に使う
         self._run_git_command(['fetch', remote, '--prune'])
+        self._mark_fetched(remote)
+        return True
 
 
     def _remote_branch_exists(self, branch_name: str, remote: str = "origin") -> bool:
@@ -182,6 +439,18 @@ class GitClient:
         return result.returncode == 0
 
 
+    def _ensure_remote_branches(self, base_branch: str, feature_branch: str, remote: str = "origin") -> None:
+        """両方のブランチがリモートに存在することを確認します。存在しない場合は BranchNotFoundError を送出します。"""
+        missing_branches = []
+        if not self._remote_branch_exists(base_branch, remote):
+            missing_branches.append(f"{remote}/{base_branch}")
+        if not self._remote_branch_exists(feature_branch, remote):
+            missing_branches.append(f"{remote}/{feature_branch}")
+
+        if missing_branches:
+            raise BranchNotFoundError(f"ブランチが存在しません: {', '.join(missing_branches)}")
+
+
     def get_diff(self, base_branch: str, feature_branch: str, remote: str = "origin") -> str:
         """
         指定された2つのブランチ間の差分を取得します。
@@ -202,14 +471,7 @@ class GitClient:
         self.fetch_updates(remote)
 
         # 2. 両方のブランチの存在をまとめてチェック
-        missing_branches = []
-        if not self._remote_branch_exists(base_branch, remote):
-            missing_branches.append(f"{remote}/{base_branch}")
-        if not self._remote_branch_exists(feature_branch, remote):
-            missing_branches.append(f"{remote}/{feature_branch}")
-
-        if missing_branches:
-            raise BranchNotFoundError(f"ブランチが存在しません: {', '.join(missing_branches)}")
+        self._ensure_remote_branches(base_branch, feature_branch, remote)
 
         # 3. diff を実行
         print(f"差分を取得中: {remote}/{base_branch}...{remote}/{feature_branch}")
@@ -222,4 +484,221 @@ class GitClient:
         # 差分取得が完了したことを示すメッセージを追加
         print(f"--- ✅ 差分の取得が完了しました ---")
 
-        return result.stdout
\ No newline at end of file
+        return result.stdout
+
+
+    def list_commits(self, base_branch: str, feature_branch: str, remote: str = "origin") -> List[Tuple[str, str]]:
+        """
+        base_branch から feature_branch に追加されたコミットを古い順に取得します。マージコミットは除外します。
+
+        Args:
+            base_branch (str): 比較の基準となるブランチ名。
+            feature_branch (str): 比較対象のブランチ名。
+            remote (str): リモート名（デフォルトは 'origin'）。
+
+        Returns:
+            List[Tuple[str, str]]: (コミットハッシュ, 件名) のリスト。
+
+        Raises:
+            BranchNotFoundError: 指定されたブランチがリモートに存在しない場合。
+        """
+        self.fetch_updates(remote)
+        self._ensure_remote_branches(base_branch, feature_branch, remote)
+        return self._log_commits(f'{remote}/{base_branch}..{remote}/{feature_branch}')
+
+
+    @staticmethod
+    def _validate_rev_range(rev_range: str) -> None:
+        """
+        リビジョン範囲がgitのオプションとして解釈されないことを確認します。
+
+        Raises:
+            GitClientError: リビジョン範囲が空、または '-' で始まる場合。
+        """
+        if not rev_range or rev_range.startswith('-'):
+            raise GitClientError(f"不正なリビジョン範囲です: '{rev_range}'")
+
+
+    def _log_commits(self, rev_range: str) -> List[Tuple[str, str]]:
+        """リビジョン範囲のマージコミット以外のコミットを、古い順に (ハッシュ, 件名) のリストで返します。"""
+        self._validate_rev_range(rev_range)
+        result = self._run_git_command(['log', '--reverse', '--no-merges', '--format=%H%x00%s', rev_range, '--'])
+        commits = []
+        for line in result.stdout.splitlines():
+            sha, _, subject = line.partition('\0')
+            if sha:
+                commits.append((sha, subject))
+        return commits
+
+
+    def get_commit_diff(self, commit: str) -> str:
+        """指定されたコミット単体の差分を取得します。"""
+        result = self._run_git_command(['show', '--format=', '--patch', '--no-color', '--unified=10', commit])
+        return result.stdout
+
+
+    def get_patch_id(self, diff: str) -> Optional[str]:
+        """
+        差分から `git patch-id --stable` を算出します。リベースやチェリーピックされた同一内容のコミットは同じIDになります。
+        """
+        result = self._run_git_command(['patch-id', '--stable'], input=diff)
+        fields = result.stdout.split()
+        return fields[0] if fields else None
+
+
+    def get_staged_diff(self) -> str:
+        """ステージ済み (git add 済み) の変更の差分を取得します。"""
+        print("差分を取得中: ステージ済みの変更")
+        return self._run_git_command(['diff', '--cached', '--unified=10']).stdout
+
+
+    def get_working_tree_diff(self) -> str:
+        """
+        HEAD からの未コミットの変更 (ステージ済みを含む) の差分を取得します。
+        .gitignore で除外されていない未追跡のファイルも、新規ファイルとして差分に含めます。
+        """
+        print("差分を取得中: HEAD と作業ツリーの差分 (未コミットの変更と未追跡のファイル)")
+        diffs = [self._run_git_command(['diff', 'HEAD', '--unified=10']).stdout]
+        diffs.extend(self._get_untracked_file_diff(path) for path in self.list_untracked_files())
+        return ''.join(diffs)
+
+
+    def _get_untracked_file_diff(self, path: str) -> str:
+        """未追跡のファイルを新規ファイルとして表す差分を取得します。"""
+        command = ['diff', '--no-index', '--unified=10', '--', '/dev/null', path]
+        # --no-index は差分がある場合に終了コード1を返すため、2以上のみを失敗として扱う
+        result = self._run_git_command(command, check=False)
+        if result.returncode > 1:
+            raise GitCommandError(f"Gitコマンド 'git {' '.join(command)}' の実行に失敗しました。", stderr=result.stderr)
+        return result.stdout
+
+
+    def list_untracked_files(self) -> List[str]:
+        """.gitignore で除外されていない未追跡のファイルのパスを返します。"""
+        result = self._run_git_command(['ls-files', '--others', '--exclude-standard', '-z'])
+        # 入れ子のリポジトリはディレクトリ ('path/') として列挙されるため除外する
+        return [path for path in result.stdout.split('\0') if path and not path.endswith('/')]
+
+
+    def list_uncommitted_files(self, staged: bool = False) -> List[str]:
+        """
+        HEAD から変更されたファイルのパスを返します。
+        staged=True の場合はステージ済みの変更のみ、それ以外は未追跡のファイルも含みます。
+        """
+        command = ['diff', '--name-only', '--no-renames', '-z'] + (['--cached'] if staged else []) + ['HEAD']
+        paths = [path for path in self._run_git_command(command).stdout.split('\0') if path]
+        return paths if staged else paths + self.list_untracked_files()
+
+
+    def read_working_tree_files(self, paths: List[str]) -> Dict[str, Optional[bytes]]:
+        """作業ツリー上のファイル内容を読み込みます。存在しないファイル (削除済み) はNoneになります。"""
+        contents: Dict[str, Optional[bytes]] = {}
+        for path in paths:
+            try:
+                contents[path] = (self.repo_path / path).read_bytes()
+            except OSError:
+                contents[path] = None
+        return contents
+
+
+    def get_range_diff(self, rev_range: str) -> str:
+        """
+        `rev1..rev2` または `rev1...rev2` 形式で指定されたリビジョン範囲の差分を取得します。
+
+        Raises:
+            GitClientError: リビジョン範囲が '-' で始まる場合。
+        """
+        self._validate_rev_range(rev_range)
+        print(f"差分を取得中: {rev_range}")
+        return self._run_git_command(['diff', '--unified=10', rev_range, '--']).stdout
+
+
+    @property
+    def git_dir(self) -> Path:
+        """リポジトリの .git ディレクトリの絶対パス (worktree の場合も正しく解決されます)。"""
+        return Path(self._run_git_command(['rev-parse', '--absolute-git-dir']).stdout.strip())
+
+
+    def rev_parse(self, rev: str) -> str:
+        """指定されたリビジョンのコミットハッシュを返します。"""
+        return self._run_git_command(['rev-parse', '--verify', f'{rev}^{{commit}}']).stdout.strip()
+
+
+    def list_files(self, rev: str) -> List[str]:
+        """指定されたリビジョンに含まれる全ファイルのパスを返します。"""
+        result = self._run_git_command(['ls-tree', '-r', '--name-only', '-z', rev])
+        return [path for path in result.stdout.split('\0') if path]
+
+
+    def get_changed_files(self, old_rev: str, new_rev: str) -> List[Tuple[str, str]]:
+        """
+        2つのリビジョン間で変更されたファイルを (ステータス, パス) のリストで返します。
+        リネームは削除と追加として扱います。
+        """
+        result = self._run_git_command(['diff', '--name-status', '--no-renames', '-z', old_rev, new_rev])
+        fields = [field for field in result.stdout.split('\0') if field]
+        return list(zip(fields[0::2], fields[1::2]))
+
+
+    def read_files(self, rev: str, paths: List[str]) -> Dict[str, bytes]:
+        """
+        指定されたリビジョンのファイル内容を `git cat-file --batch` でまとめて読み込みます。
+        存在しないパスは結果に含まれません。
+        """
+        if not paths:
+            return {}
+
+        request = ''.join(f'{rev}:{path}\n' for path in paths).encode('utf-8')
+        output = self._run_git_command(['cat-file', '--batch'], input=request, binary=True).stdout
+
+        contents: Dict[str, bytes] = {}
+        offset = 0
+        for path in paths:
+            header_end = output.index(b'\n', offset)
+            header = output[offset:header_end]
+            offset = header_end + 1
+            # 存在しない場合は "<rev>:<path> missing" となり、パスに空白を含むことがあるため右側から解析する
+            if header.endswith((b' missing', b' ambiguous')):
+                continue
+            _, object_type, size_field = header.rsplit(b' ', 2)
+            size = int(size_field)
+            if object_type == b'blob':
+                contents[path] = output[offset:offset + size]
+            offset += size + 1
+        return contents
+
+
+class LocalGitClient(GitClient):
+    """
+    開発者の手元にある既存の作業ツリーを直接操作するクライアント。
+    クローンやフェッチなどのネットワーク処理、クローン先ディレクトリの管理は一切行いません。
+    """
+
+    def __init__(self, repo_path: str, timeouts: Optional[Dict[str, float]] = None,
+                 git_config: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            repo_path (str): 作業ツリー内の任意のパス。リポジトリのルートに解決されます。
+            timeouts (Optional[Dict[str, float]]): 操作の種類ごとのタイムアウト秒数。
+            git_config (Optional[Dict[str, str]]): すべてのgitコマンドに `-c key=value` として渡す設定。
+        """
+        self.repo_url = None
+        self.ssh_key_path = None
+        self.fetch_max_age = 0
+        self._fetched_remotes = set()
+        self._init_runtime(timeouts, git_config, None)
+        path = Path(repo_path).resolve()
+        try:
+            toplevel = self._run_git_command(['rev-parse', '--show-toplevel'], cwd=path).stdout.strip()
+        except GitCommandError as e:
+            raise GitClientError(f"Gitリポジトリではありません: {path}") from e
+        self.repo_path = Path(toplevel)
+        print(f"--- ✅ ローカルリポジトリを利用します: {self.repo_path} ---")
+
+    def fetch_updates(self, remote: str = "origin", force: bool = False) -> bool:
+        """ローカルモードではリモートとの通信を行いません。"""
+        return False
+
+    def list_commits(self, base_branch: str, feature_branch: str, remote: Optional[str] = None) -> List[Tuple[str, str]]:
+        """ローカルのリビジョン base_branch..feature_branch のコミットを古い順に取得します。マージコミットは除外します。"""
+        return self._log_commits(f'{base_branch}..{feature_branch}')
@@ -0,0 +1,154 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from core.backlog_api_client import BacklogApiClient
+
+
+@dataclass
+class IssueContext:
+    """プロンプトに含める Backlog 課題の内容。"""
+    issue_key: str
+    summary: str
+    description: str
+    status: str = ""
+    updated: str = ""
+    etag: Optional[str] = None
+    fetched_at: float = 0.0
+
+    @classmethod
+    def from_issue(cls, issue_key: str, issue: Dict[str, Any], etag: Optional[str]) -> "IssueContext":
+        """課題情報のAPI応答から生成します。"""
+        status = issue.get('status') or {}
+        return cls(
+            issue_key=issue.get('issueKey') or issue_key,
+            summary=(issue.get('summary') or "").strip(),
+            description=(issue.get('description') or "").strip(),
+            status=status.get('name', "") if isinstance(status, dict) else str(status),
+            updated=issue.get('updated') or "",
+            etag=etag,
+            fetched_at=time.time(),
+        )
+
+    def format(self, max_chars: int) -> str:
+        """
+        プロンプト用に整形します。件名・状態・説明文の合計が max_chars 文字に収まるように、説明文の末尾を省略します。
+        """
+        header = f"件名: {self.summary}" + (f"\n状態: {self.status}" if self.status else "")
+        description = self.description
+        room = max(0, max_chars - len(header) - 1)
+        if len(description) > room:
+            description = description[:max(0, room - 1)].rstrip() + "…"
+        body = f"{header}\n{description}" if description else header
+        return (
+            f"以下はBacklogの課題 {self.issue_key} の内容です。変更が課題の目的に沿っているかも確認してください。\n"
+            f"--- issue start ---\n{body}\n--- issue end ---"
+        )
+
+
+_ENTRY_FIELDS = frozenset(field.name for field in fields(IssueContext))
+
+
+def _entry_to_context(entry: Any) -> Optional[IssueContext]:
+    """キャッシュの1件を IssueContext に変換します。形式が異なる (古いバージョンのキャッシュなど) 場合はNone。"""
+    if not isinstance(entry, dict) or set(entry) != _ENTRY_FIELDS:
+        return None
+    if not isinstance(entry['fetched_at'], (int, float)) or not isinstance(entry['issue_key'], str):
+        return None
+    return IssueContext(**entry)
+
+
+class IssueContextCache:
+    """
+    Backlog 課題の内容をローカルのJSONファイルにキャッシュするクラス。
+    TTL 以内であれば Backlog に問い合わせずに再利用し、期限切れの場合は ETag・更新日時で変更の有無を確認します。
+    """
+
+    def __init__(self, cache_path: Path, backlog_domain: str, client: Optional[BacklogApiClient] = None,
+                 ttl_seconds: float = 600):
+        """
+        Args:
+            cache_path (Path): キャッシュを保存するJSONファイルのパス。
+            backlog_domain (str): Backlogのドメイン。キャッシュのキーに含めます。
+            client (Optional[BacklogApiClient]): 課題を取得するクライアント。Noneの場合は Backlog に問い合わせず、キャッシュのみを参照します。
+            ttl_seconds (float): 取得した内容を確認なしで再利用する秒数。
+        """
+        self.cache_path = Path(cache_path)
+        self.backlog_domain = backlog_domain
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = self._read_entries()
+
+    def _read_entries(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            entries = json.loads(self.cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def _cache_key(self, issue_key: str) -> str:
+        return f"{self.backlog_domain}/{issue_key}"
+
+    def get(self, issue_key: str) -> Optional[IssueContext]:
+        """
+        課題の内容を返します。TTL 以内のキャッシュがあればそのまま返し、なければ Backlog から取得します。
+        取得に失敗した場合は、期限切れのキャッシュがあればそれを返し、なければNoneを返します。
+        クライアントが指定されていない場合は、期限切れでもキャッシュの内容を返します。
+        """
+        with self._lock:
+            entry = self._entries.get(self._cache_key(issue_key))
+        cached = _entry_to_context(entry) if entry is not None else None
+        if cached and time.time() - cached.fetched_at < self.ttl_seconds:
+            return cached
+        if self.client is None:
+            return cached
+
+        try:
+            issue, etag = self.client.get_issue(issue_key, etag=cached.etag if cached else None)
+        except (ConnectionError, ValueError) as e:
+            if cached:
+                logging.warning(f"Issue {issue_key} could not be refreshed, using cached content: {e}")
+            else:
+                logging.warning(f"Issue {issue_key} could not be fetched: {e}")
+            return cached
+
+        if cached and (issue is None or (cached.updated and issue.get('updated') == cached.updated)):
+            # 304 Not Modified、または更新日時が変わっていない場合はキャッシュの有効期限のみを延長する
+            cached.fetched_at = time.time()
+            cached.etag = etag or cached.etag
+            context = cached
+        elif issue is None:
+            return None
+        else:
+            context = IssueContext.from_issue(issue_key, issue, etag)
+        self._put(issue_key, context)
+        return context
+
+    def _put(self, issue_key: str, context: IssueContext) -> None:
+        """
+        キャッシュに1件を保存します。他のプロセスが保存した課題を消さないよう、ファイルを読み直してから書き込みます。
+        書き込みはプロセスごとに一意な一時ファイルを経由し、置き換えはアトミックに行います。
+        """
+        with self._lock:
+            self._entries = {**self._read_entries(), self._cache_key(issue_key): asdict(context)}
+            tmp_path = None
+            try:
+                self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=self.cache_path.parent, prefix=f".{self.cache_path.name}.", suffix=".tmp")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(self._entries, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.cache_path)
+            except OSError as e:
+                logging.warning(f"Issue context cache could not be written ({self.cache_path}): {e}")
+                if tmp_path:
+                    try:
+                        os.unlink(tmp_path)
+                    except OSError:
+                        pass
@@ -0,0 +1,176 @@
+import fnmatch
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+
+from core.gemini_reviewer import GeminiReviewer
+from core.diff_sanitizer import SanitizeReport
+from core.review_findings import StructuredReview, iter_diff_lines
+
+# ドキュメント・テスト・設定ファイルは低リスクとして高速モデルに回す
+DEFAULT_LOW_RISK_PATTERNS = [
+    '*.md', '*.rst', '*.txt', 'docs/*', '*/docs/*',
+    'tests/*', '*/tests/*', 'test/*', '*/test/*', 'test_*.py', '*/test_*.py', '*_test.py', '*_test.go', '*.spec.*', '*.test.*',
+    '*.yml', '*.yaml', '*.toml', '*.ini', '*.cfg', '*.json', '.gitignore',
+]
+# 認証・暗号・DBマイグレーションなどは規模に関わらず高精度モデルに回す
+DEFAULT_HIGH_RISK_PATTERNS = [
+    '*auth*', '*security*', '*crypto*', '*password*', '*secret*', '*permission*', '*migration*', '*payment*',
+]
+
+_FINDING_OK_MARKERS = ('問題は見つかりませんでした',)
+_FILE_HEADING_REGEX = re.compile(r'^#{3,4}\s')
+
+
+@dataclass
+class RouteDecision:
+    """差分の振り分け結果。"""
+    tier: str  # 'fast' または 'slow'
+    reason: str
+    changed_lines: int
+    files: List[str] = field(default_factory=list)
+
+
+class ModelRouter:
+    """
+    差分の規模とリスクに応じて、高速・低コストなモデルと高精度なモデルにレビューを振り分けるクラス。
+    GeminiReviewer と同じ review_code インターフェースを持ち、そのまま置き換えて使用できます。
+    """
+
+    def __init__(self, fast_reviewer: GeminiReviewer, slow_reviewer: GeminiReviewer,
+                 max_fast_lines: int = 200, escalate: bool = False,
+                 low_risk_patterns: Optional[List[str]] = None,
+                 high_risk_patterns: Optional[List[str]] = None):
+        """
+        Args:
+            fast_reviewer (GeminiReviewer): 小規模・低リスクな差分用のレビュアー。
+            slow_reviewer (GeminiReviewer): 大規模・高リスクな差分用のレビュアー。
+            max_fast_lines (int): 高速モデルに回す差分の最大変更行数。
+            escalate (bool): 高速モデルが指摘事項を検出した場合に、高精度モデルで再レビューするか。
+            low_risk_patterns (Optional[List[str]]): 低リスクとみなすファイルパスのglobパターン。
+            high_risk_patterns (Optional[List[str]]): 高リスクとみなすファイルパスのglobパターン。
+        """
+        self.fast_reviewer = fast_reviewer
+        self.slow_reviewer = slow_reviewer
+        self.max_fast_lines = max_fast_lines
+        self.escalate = escalate
+        self.low_risk_patterns = low_risk_patterns or DEFAULT_LOW_RISK_PATTERNS
+        self.high_risk_patterns = high_risk_patterns or DEFAULT_HIGH_RISK_PATTERNS
+
+    @staticmethod
+    def _matches(path: str, patterns: List[str]) -> bool:
+        lowered = path.lower()
+        return any(fnmatch.fnmatch(lowered, pattern) for pattern in patterns)
+
+    def classify(self, code_diff: str) -> RouteDecision:
+        """差分の変更行数と対象ファイルから、使用するモデルの区分を判定します。"""
+        files: List[str] = []
+        changed_lines = 0
+        for kind, line in iter_diff_lines(code_diff):
+            if kind == 'header':
+                path = line[4:].strip()
+                if path != '/dev/null':
+                    path = path[2:] if path[:2] in ('a/', 'b/') else path
+                    if path not in files:
+                        files.append(path)
+            elif kind == 'line' and line[:1] in ('+', '-'):
+                changed_lines += 1
+
+        high_risk = [path for path in files if self._matches(path, self.high_risk_patterns)]
+        if high_risk:
+            return RouteDecision('slow', f"高リスクなファイルを含みます: {', '.join(high_risk[:3])}", changed_lines, files)
+        if files and all(self._matches(path, self.low_risk_patterns) for path in files):
+            return RouteDecision('fast', "ドキュメント・テスト・設定ファイルのみの変更です", changed_lines, files)
+        if changed_lines <= self.max_fast_lines:
+            return RouteDecision('fast', f"変更行数が閾値以下です ({changed_lines} <= {self.max_fast_lines})", changed_lines, files)
+        return RouteDecision('slow', f"変更行数が閾値を超えています ({changed_lines} > {self.max_fast_lines})", changed_lines, files)
+
+    @staticmethod
+    def has_findings(review_text: Optional[str]) -> bool:
+        """
+        Markdown形式のレビュー結果のファイルごとの指摘事項に、問題なし以外の項目が含まれているかを判定します。
+        テキスト形式のレビューでエスカレーションを判定する際に使用します。
+        """
+        if not review_text:
+            return False
+        in_file_section = False
+        for line in review_text.splitlines():
+            stripped = line.strip()
+            if _FILE_HEADING_REGEX.match(stripped):
+                in_file_section = True
+            elif in_file_section and stripped.startswith(('- ', '* ')):
+                if not any(marker in stripped for marker in _FINDING_OK_MARKERS):
+                    return True
+        return False
+
+    @property
+    def last_sanitize_report(self) -> Optional[SanitizeReport]:
+        return self.slow_reviewer.last_sanitize_report
+
+    def prepare_diff(self, code_diff: str) -> str:
+        """
+        拡張子によるフィルタリングとサニタイズを行い、送信する差分を返します。
+        両方のレビュアーは同じフィルタリング・サニタイズの設定を使用するため、高精度モデル側のレビュアーで実行します。
+        """
+        return self.slow_reviewer.prepare_diff(code_diff)
+
+    def reviewer_for(self, code_diff: str) -> GeminiReviewer:
+        """差分の判定結果に応じて使用されるレビュアーを返します（エスカレーションは考慮しません）。"""
+        return self.slow_reviewer if self.classify(code_diff).tier == 'slow' else self.fast_reviewer
+
+    def _review_with(self, tier: str, reviewer: GeminiReviewer, code_diff: str, issue_key: Optional[str],
+                     extra_context: Optional[str], structured: bool = False, prepared: bool = False) -> Any:
+        started = time.monotonic()
+        review = reviewer.review_code_structured if structured else reviewer.review_code
+        result = review(code_diff, issue_key=issue_key, extra_context=extra_context, prepared=prepared)
+        latency = time.monotonic() - started
+        usage = reviewer.last_usage or {}
+        logging.info(
+            f"[router] tier={tier} model={reviewer.model_name} latency={latency:.2f}s "
+            f"prompt_tokens={usage.get('prompt_tokens', '-')} cached_tokens={usage.get('cached_tokens', '-')} "
+            f"output_tokens={usage.get('output_tokens', '-')}"
+        )
+        return result
+
+    def review_code(self, code_diff: str, issue_key: Optional[str] = None, extra_context: Optional[str] = None,
+                    prepared: bool = False) -> str:
+        """
+        差分を判定結果に応じたモデルでレビューします。
+
+        Args:
+            code_diff (str): レビュー対象のコード差分。
+            issue_key (Optional[str]): 関連する課題キー。
+            extra_context (Optional[str]): 差分に付随する参考情報。
+            prepared (bool): 差分が prepare_diff() でフィルタリング・サニタイズ済みの場合はTrue。
+
+        Returns:
+            str: レビュー結果のテキスト。
+        """
+        return self._route(code_diff, issue_key, extra_context, structured=False, prepared=prepared)
+
+    def review_code_structured(self, code_diff: str, issue_key: Optional[str] = None,
+                               extra_context: Optional[str] = None, prepared: bool = False) -> Optional[StructuredReview]:
+        """差分を判定結果に応じたモデルで構造化レビューします。"""
+        return self._route(code_diff, issue_key, extra_context, structured=True, prepared=prepared)
+
+    def _route(self, code_diff: str, issue_key: Optional[str], extra_context: Optional[str], structured: bool,
+               prepared: bool) -> Any:
+        decision = self.classify(code_diff)
+        logging.info(f"[router] {decision.tier} tier selected: {decision.reason}")
+
+        if decision.tier == 'slow':
+            return self._review_with('slow', self.slow_reviewer, code_diff, issue_key, extra_context, structured, prepared)
+
+        # テキスト形式では設定されたプロンプトと出力形式のまま高速モデルでレビューし、その結果からエスカレーションを判定する
+        result = self._review_with('fast', self.fast_reviewer, code_diff, issue_key, extra_context, structured, prepared)
+        has_findings = bool(result and result.findings) if structured else self.has_findings(result)
+        if self.escalate and has_findings:
+            return self._escalate(code_diff, issue_key, extra_context, structured, prepared)
+        return result
+
+    def _escalate(self, code_diff: str, issue_key: Optional[str], extra_context: Optional[str], structured: bool,
+                  prepared: bool) -> Any:
+        print("--- ⚠️ 高速モデルが指摘事項を検出したため、高精度モデルで再レビューします ---")
+        return self._review_with('slow', self.slow_reviewer, code_diff, issue_key, extra_context, structured, prepared)
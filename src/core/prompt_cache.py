@@ -0,0 +1,286 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# --- Custom Exceptions ---
+class PromptCacheError(Exception):
+    """PromptCache related errors base class."""
+    pass
+
+
+class GeminiCacheBackend:
+    """
+    Gemini の Context Caching (CachedContent) API を利用するバックエンド。
+    """
+
+    # キャッシュはサーバー側に残るため、ハンドルをレジストリファイルに記録して別プロセスでも再利用する
+    persistent = True
+
+    def create(self, model_name: str, content: str, ttl_seconds: int) -> str:
+        """静的プレフィックスをキャッシュとして登録し、キャッシュ名を返します。"""
+        from google.generativeai import caching
+
+        cached = caching.CachedContent.create(
+            model=model_name,
+            display_name="git-gemini-reviewer",
+            contents=[content],
+            ttl=timedelta(seconds=ttl_seconds),
+        )
+        return cached.name
+
+    def refresh(self, name: str, ttl_seconds: int) -> bool:
+        """既存キャッシュのTTLを延長します。キャッシュが失効していた場合はFalseを返します。"""
+        from google.generativeai import caching
+
+        try:
+            cached = caching.CachedContent.get(name)
+            cached.update(ttl=timedelta(seconds=ttl_seconds))
+            return True
+        except Exception as e:
+            logging.info(f"Cached content {name} could not be refreshed: {e}")
+            return False
+
+    def build_model(self, name: str, base_model: Any, generation_config: Optional[Dict[str, Any]] = None) -> Any:
+        """キャッシュを参照する GenerativeModel を生成します。"""
+        import google.generativeai as genai
+        from google.generativeai import caching
+
+        return genai.GenerativeModel.from_cached_content(
+            cached_content=caching.CachedContent.get(name),
+            generation_config=genai.GenerationConfig(**generation_config) if generation_config else None,
+        )
+
+
+class _StubCachedModel:
+    """LocalStubCacheBackend が返すモデル。キャッシュ済みプレフィックスを前置して元のモデルを呼び出します。"""
+
+    def __init__(self, base_model: Any, prefix: str, generation_config: Optional[Dict[str, Any]] = None):
+        self._base_model = base_model
+        self._prefix = prefix
+        self.generation_config = generation_config
+
+    def generate_content(self, contents: str, **kwargs) -> Any:
+        return self._base_model.generate_content(self._prefix + contents, **kwargs)
+
+
+class LocalStubCacheBackend:
+    """
+    ネットワークを使わずにキャッシュの動作を再現するスタブ。
+    テストやオフライン実行で GeminiCacheBackend の代わりに使用します。
+    """
+
+    # キャッシュはこのインスタンスのメモリ上にしか存在しないため、ハンドルをレジストリファイルに記録しない
+    persistent = False
+
+    def __init__(self):
+        self.contents: Dict[str, str] = {}
+        self.create_count = 0
+        self.refresh_count = 0
+
+    def create(self, model_name: str, content: str, ttl_seconds: int) -> str:
+        self.create_count += 1
+        name = f"cachedContents/stub-{self.create_count}"
+        self.contents[name] = content
+        return name
+
+    def refresh(self, name: str, ttl_seconds: int) -> bool:
+        self.refresh_count += 1
+        return name in self.contents
+
+    def build_model(self, name: str, base_model: Any, generation_config: Optional[Dict[str, Any]] = None) -> Any:
+        if name not in self.contents:
+            raise PromptCacheError(f"スタブキャッシュが見つかりません: {name}")
+        return _StubCachedModel(base_model, self.contents[name], generation_config)
+
+
+class PromptCacheRegistry:
+    """
+    静的プレフィックス（プロンプト指示文やリポジトリ全体のコンテキスト）のキャッシュハンドルを管理するクラス。
+    内容のハッシュをキーとしてローカルのJSONファイルに記録し、期限が近いものはTTLを延長して再利用します。
+    レジストリファイルは複数のプロセスから更新されるため、ファイルロックの下で読み直して変更したキーのみを反映します。
+    """
+
+    def __init__(self, registry_path: Path, backend: Any = None,
+                 ttl_seconds: int = 3600, min_chars: int = 16000,
+                 refresh_margin_seconds: int = 300):
+        """
+        Args:
+            registry_path (Path): キャッシュハンドルを記録するJSONファイルのパス。
+            backend (Any): キャッシュの作成・延長を行うバックエンド。省略時は GeminiCacheBackend。
+            ttl_seconds (int): キャッシュ作成・延長時に設定するTTL（秒）。
+            min_chars (int): キャッシュ対象とするプレフィックスの最小文字数。これより短い場合はキャッシュしません。
+            refresh_margin_seconds (int): 残り有効期間がこの秒数を下回ったらTTLを延長します。
+        """
+        self.registry_path = Path(registry_path)
+        self.backend = backend if backend is not None else GeminiCacheBackend()
+        self.ttl_seconds = ttl_seconds
+        self.min_chars = min_chars
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        # (モデル名, キャッシュキー, 生成設定) ごとに、キャッシュ名とそれを参照するモデルを保持する
+        self._models: Dict[Tuple[str, str, str], Tuple[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def content_key(model_name: str, content: str) -> str:
+        """モデル名とプレフィックス内容からキャッシュキー（SHA-256）を算出します。"""
+        digest = hashlib.sha256()
+        digest.update(model_name.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(content.encode("utf-8"))
+        return digest.hexdigest()
+
+    @property
+    def persistent(self) -> bool:
+        """バックエンドのキャッシュが別プロセスからも参照できる場合のみ、レジストリファイルを読み書きします。"""
+        return getattr(self.backend, "persistent", True)
+
+    def _read_registry(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            entries = json.loads(self.registry_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.warning(f"Prompt cache registry could not be read ({self.registry_path}): {e}")
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def _load(self, reload: bool = False) -> Dict[str, Dict[str, Any]]:
+        if self._entries is not None and not reload:
+            return self._entries
+        self._entries = self._read_registry() if self.persistent else {}
+        return self._entries
+
+    @contextlib.contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """レジストリファイルを更新する間、他のプロセスによる更新を待たせます。"""
+        self.registry_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.registry_path.with_name(self.registry_path.name + ".lock"), "a+b") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _save(self, key: str, entry: Optional[Dict[str, Any]]) -> None:
+        """
+        1件のキャッシュハンドルを記録します (entry がNoneの場合は削除します)。
+        他のプロセスが記録したハンドルを消さないよう、ロックを取ってファイルを読み直し、このキーのみを反映して書き込みます。
+        """
+        def apply(entries: Dict[str, Dict[str, Any]]) -> None:
+            if entry is None:
+                entries.pop(key, None)
+            else:
+                entries[key] = entry
+
+        apply(self._load())
+        if not self.persistent:
+            return
+        tmp_path = None
+        try:
+            with self._file_lock():
+                entries = self._load(reload=True)
+                apply(entries)
+                fd, tmp_path = tempfile.mkstemp(dir=self.registry_path.parent, prefix=f".{self.registry_path.name}.", suffix=".tmp")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(entries, f, indent=2)
+                os.replace(tmp_path, self.registry_path)
+        except OSError as e:
+            logging.warning(f"Prompt cache registry could not be written ({self.registry_path}): {e}")
+            if tmp_path:
+                with contextlib.suppress(OSError):
+                    os.unlink(tmp_path)
+
+    def get_model(self, model_name: str, prefix: str, base_model: Any,
+                  generation_config: Optional[Dict[str, Any]] = None) -> Optional[Any]:
+        """
+        プレフィックスをキャッシュしたモデルを返します。
+
+        Args:
+            model_name (str): 使用するGeminiモデル名。
+            prefix (str): キャッシュ対象の静的プレフィックス。
+            base_model (Any): キャッシュを使用しない通常のモデル（スタブで使用）。
+            generation_config (Optional[Dict[str, Any]]): モデルに設定する生成設定 (temperature など)。
+                同じプレフィックスでも生成設定が異なる場合は、別のモデルを生成します。
+
+        Returns:
+            Optional[Any]: キャッシュを参照するモデル。キャッシュ対象外、または作成に失敗した場合はNone。
+        """
+        if len(prefix) < self.min_chars:
+            return None
+
+        # 並列レビュー時に同じプレフィックスのキャッシュが重複作成されないよう排他制御する
+        with self._lock:
+            return self._get_model_locked(model_name, prefix, base_model, generation_config)
+
+    def _get_model_locked(self, model_name: str, prefix: str, base_model: Any,
+                          generation_config: Optional[Dict[str, Any]]) -> Optional[Any]:
+        key = self.content_key(model_name, prefix)
+        model_key = (model_name, key, json.dumps(generation_config or {}, sort_keys=True, default=str))
+        now = time.time()
+        entry = self._load().get(key)
+        if self.persistent and (entry is None or entry.get("expires_at", 0) <= now):
+            # 他のプロセスが作成・延長したキャッシュがあれば、重複して作成せずに再利用する
+            entry = self._load(reload=True).get(key)
+
+        try:
+            if entry and entry.get("expires_at", 0) > now:
+                if entry["expires_at"] - now < self.refresh_margin_seconds:
+                    if self.backend.refresh(entry["name"], self.ttl_seconds):
+                        entry["expires_at"] = now + self.ttl_seconds
+                        self._save(key, entry)
+                        logging.info(f"Refreshed cached prompt prefix {entry['name']}.")
+                    else:
+                        entry = None
+            else:
+                entry = None
+
+            if entry is None:
+                name = self.backend.create(model_name, prefix, self.ttl_seconds)
+                entry = {"name": name, "model": model_name, "expires_at": now + self.ttl_seconds}
+                self._drop_models(key)
+                self._save(key, entry)
+                logging.info(f"Created cached prompt prefix {name} ({len(prefix)} chars).")
+
+            cached_name, model = self._models.get(model_key, (None, None))
+            if cached_name != entry["name"]:
+                # 他のプロセスがキャッシュを作り直した場合も、新しいハンドルでモデルを生成し直す
+                model = self.backend.build_model(entry["name"], base_model, generation_config)
+                self._models[model_key] = (entry["name"], model)
+            return model
+
+        except Exception as e:
+            # キャッシュが利用できなくてもレビュー自体は継続できるため、警告に留める
+            logging.warning(f"Context cache is unavailable, falling back to the full prompt: {e}")
+            if self._load().get(key) is not None:
+                # 失効したハンドルが次回以降のプロセスで再利用されないよう、レジストリからも削除する
+                self._save(key, None)
+            self._drop_models(key)
+            return None
+
+    def _drop_models(self, key: str) -> None:
+        """キャッシュキーに対応するモデルを、生成設定によらずすべて破棄します。"""
+        for model_key in [model_key for model_key in self._models if model_key[1] == key]:
+            del self._models[model_key]
@@ -0,0 +1,75 @@
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+CODE_DIFF_PLACEHOLDER = "{code_diff}"
+# Backlog用テンプレートで課題の内容を埋め込む位置 (任意)
+ISSUE_CONTEXT_PLACEHOLDER = "{issue_context}"
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """読み込み済みのプロンプトテンプレート。差分のプレースホルダーの前後で分割済みの状態で保持します。"""
+    text: str
+    head: str
+    tail: str
+    has_placeholder: bool
+
+    @classmethod
+    def compile(cls, text: str) -> "PromptTemplate":
+        head, placeholder, tail = text.partition(CODE_DIFF_PLACEHOLDER)
+        return cls(text=text, head=head, tail=tail, has_placeholder=bool(placeholder))
+
+    def with_preamble(self, preamble: str) -> "PromptTemplate":
+        """テンプレートの先頭に文章を追加した新しいテンプレートを返します。"""
+        return PromptTemplate(
+            text=preamble + self.text, head=preamble + self.head, tail=self.tail, has_placeholder=self.has_placeholder
+        )
+
+
+class PromptTemplateCache:
+    """
+    プロンプトファイルを更新日時とサイズをキーにキャッシュするクラス。
+    ファイルが変更されていなければ再読み込みせず、変更されていれば次回の参照時に自動で読み込み直します。
+    """
+
+    def __init__(self):
+        self._entries: Dict[Path, Tuple[Tuple[int, int], PromptTemplate]] = {}
+        self._lock = threading.Lock()
+
+    def load(self, path: Path) -> PromptTemplate:
+        """
+        プロンプトファイルを読み込みます。
+
+        Raises:
+            FileNotFoundError: ファイルが存在しない場合。
+        """
+        path = Path(path).resolve()
+        stat = path.stat()
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._entries.get(path)
+            if cached and cached[0] == key:
+                return cached[1]
+        template = PromptTemplate.compile(path.read_text(encoding="utf-8"))
+        with self._lock:
+            self._entries[path] = (key, template)
+        return template
+
+    def load_optional(self, path: Optional[Path]) -> Optional[PromptTemplate]:
+        """ファイルが指定されていない、または存在しない場合はNoneを返す load()。"""
+        if not path:
+            return None
+        try:
+            return self.load(path)
+        except FileNotFoundError:
+            return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# プロセス内で共有するキャッシュ
+default_template_cache = PromptTemplateCache()
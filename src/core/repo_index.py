@@ -0,0 +1,282 @@
+import ast
+import bisect
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from core.git_client import GitClient, GitCommandError
+from core.review_findings import hunk_new_start, iter_diff_lines
+
+# インデックス対象とする拡張子と、1ファイルあたりの最大サイズ
+_INDEXED_EXTENSIONS = {
+    '.py', '.js', '.jsx', '.ts', '.tsx', '.go', '.java', '.kt', '.rb', '.php', '.rs', '.c', '.cc', '.cpp', '.h', '.hpp', '.cs', '.swift',
+}
+_MAX_FILE_BYTES = 512 * 1024
+_MAX_LINE_CHARS = 200
+_INDEX_VERSION = 1
+
+# Python以外の言語向けの ctags 風の定義パターン
+_DEFINITION_REGEX = re.compile(
+    r'^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?'
+    r'(?:function\s*\*?\s*(?P<js>\w+)'
+    r'|func\s+(?:\([^)]*\)\s*)?(?P<go>\w+)'
+    r'|(?:pub(?:\([^)]*\))?\s+)?fn\s+(?P<rs>\w+)'
+    r'|def\s+(?:self\.)?(?P<rb>\w+[?!]?)'
+    r'|(?:abstract\s+|final\s+)?(?:class|interface|struct|trait|enum)\s+(?P<cls>\w+)'
+    r'|(?:const|let|var)\s+(?P<arrow>\w+)\s*=\s*(?:async\s*)?(?:\([^)]*\)|\w+)\s*=>'
+    r'|(?:(?:public|private|protected|internal|static|final|virtual|override|synchronized)\s+)+[\w<>\[\],.?\s]*?\b(?P<method>\w+)\s*\()'
+)
+_CALL_REGEX = re.compile(r'\b([A-Za-z_]\w*)\s*\(')
+_KEYWORDS = {
+    'if', 'for', 'while', 'switch', 'catch', 'return', 'function', 'func', 'fn', 'def', 'class', 'new', 'sizeof',
+    'typeof', 'elif', 'print', 'super', 'this', 'self', 'await', 'async', 'yield', 'match', 'with', 'assert', 'not',
+    'and', 'or', 'in', 'lambda', 'delete', 'throw', 'import', 'require', 'defined', 'using', 'foreach', 'isset',
+}
+
+
+class RepositoryIndex:
+    """
+    ローカルクローンから構築するシンボルの定義・参照インデックス。
+    前回インデックスしたコミットからの変更ファイルのみを再解析し、差分に関連する呼び出し箇所をプロンプト用に抽出します。
+    """
+
+    def __init__(self, git_client: GitClient, index_path: Optional[Path] = None):
+        """
+        Args:
+            git_client (GitClient): インデックス対象リポジトリのGitクライアント。
+            index_path (Optional[Path]): インデックスの保存先。省略時はクローンの .git ディレクトリ内に保存します。
+        """
+        self.git_client = git_client
+        self.index_path = Path(index_path) if index_path else git_client.git_dir / 'gemini-reviewer-index.json'
+        self.commit: Optional[str] = None
+        self.files: Dict[str, Dict[str, list]] = {}
+        self._load()
+
+    def _load(self):
+        try:
+            data = json.loads(self.index_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return
+        if data.get('version') == _INDEX_VERSION:
+            self.commit = data.get('commit')
+            self.files = data.get('files', {})
+
+    def _save(self):
+        data = {'version': _INDEX_VERSION, 'commit': self.commit, 'files': self.files}
+        try:
+            tmp_path = self.index_path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(data), encoding='utf-8')
+            tmp_path.replace(self.index_path)
+        except OSError as e:
+            logging.warning(f"Repository index could not be written ({self.index_path}): {e}")
+
+    @staticmethod
+    def _is_indexed(path: str) -> bool:
+        return Path(path).suffix.lower() in _INDEXED_EXTENSIONS
+
+    def update(self, rev: str, save: bool = True) -> None:
+        """
+        インデックスを指定されたリビジョンの状態に更新します。
+        前回のコミットが分かっている場合は、その間に変更されたファイルのみを再解析します。
+
+        Args:
+            rev (str): インデックスするリビジョン。
+            save (bool): 更新したインデックスをファイルに保存するか (--dry-run では保存しない)。
+        """
+        commit = self.git_client.rev_parse(rev)
+        if commit == self.commit:
+            return
+
+        changed_paths: Optional[List[str]] = None
+        if self.commit:
+            try:
+                changes = self.git_client.get_changed_files(self.commit, commit)
+                changed_paths = []
+                for status, path in changes:
+                    if status.startswith('D'):
+                        self.files.pop(path, None)
+                    elif self._is_indexed(path):
+                        changed_paths.append(path)
+            except GitCommandError:
+                # 前回のコミットが失われている (gc済みなど) 場合は全体を再構築する
+                changed_paths = None
+
+        if changed_paths is None:
+            logging.info(f"Building repository index for {rev}...")
+            self.files = {}
+            changed_paths = [path for path in self.git_client.list_files(commit) if self._is_indexed(path)]
+        else:
+            logging.info(f"Updating repository index for {rev} ({len(changed_paths)} files changed).")
+
+        contents = self.git_client.read_files(commit, changed_paths)
+        for path in changed_paths:
+            blob = contents.get(path)
+            if blob is None or len(blob) > _MAX_FILE_BYTES or b'\0' in blob:
+                self.files.pop(path, None)
+                continue
+            self.files[path] = self._analyze(path, blob.decode('utf-8', errors='replace'))
+
+        self.commit = commit
+        if save:
+            self._save()
+
+    def overlay(self, contents: Dict[str, Optional[bytes]]) -> None:
+        """
+        コミットされていない変更 (作業ツリーやステージ済みのファイル) の内容をインデックスに反映します。
+        反映した内容はコミットに対応しないため、ファイルには保存しません。
+
+        Args:
+            contents (Dict[str, Optional[bytes]]): パスとファイルの内容。削除されたファイルはNone。
+        """
+        for path, blob in contents.items():
+            if not self._is_indexed(path):
+                continue
+            if blob is None or len(blob) > _MAX_FILE_BYTES or b'\0' in blob:
+                self.files.pop(path, None)
+                continue
+            self.files[path] = self._analyze(path, blob.decode('utf-8', errors='replace'))
+
+    @staticmethod
+    def _analyze(path: str, source: str) -> Dict[str, list]:
+        """ファイルを解析し、定義 [名前, 行] と参照 [名前, 行, 行テキスト] を返します。"""
+        lines = source.splitlines()
+        if path.endswith('.py'):
+            try:
+                return RepositoryIndex._analyze_python(ast.parse(source), lines)
+            except (SyntaxError, ValueError):
+                pass  # 解析できないファイルは正規表現で代替する
+        return RepositoryIndex._analyze_with_regex(lines)
+
+    @staticmethod
+    def _line_text(lines: List[str], lineno: int) -> str:
+        return lines[lineno - 1].strip()[:_MAX_LINE_CHARS] if 0 < lineno <= len(lines) else ''
+
+    @staticmethod
+    def _analyze_python(tree: ast.AST, lines: List[str]) -> Dict[str, list]:
+        definitions, references = [], []
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                definitions.append([node.name, node.lineno])
+            elif isinstance(node, ast.Call):
+                func = node.func
+                name = func.id if isinstance(func, ast.Name) else func.attr if isinstance(func, ast.Attribute) else None
+                if name:
+                    references.append([name, node.lineno, RepositoryIndex._line_text(lines, node.lineno)])
+        definitions.sort(key=lambda d: d[1])
+        return {'definitions': definitions, 'references': references}
+
+    @staticmethod
+    def _analyze_with_regex(lines: List[str]) -> Dict[str, list]:
+        definitions, references = [], []
+        for lineno, line in enumerate(lines, start=1):
+            match = _DEFINITION_REGEX.match(line)
+            defined_name = None
+            if match:
+                defined_name = next((name for name in match.groups() if name), None)
+                if defined_name and defined_name not in _KEYWORDS:
+                    definitions.append([defined_name, lineno])
+            for call in _CALL_REGEX.finditer(line):
+                name = call.group(1)
+                if name not in _KEYWORDS and name != defined_name:
+                    references.append([name, lineno, line.strip()[:_MAX_LINE_CHARS]])
+        return {'definitions': definitions, 'references': references}
+
+    def changed_symbols(self, code_diff: str) -> List[str]:
+        """
+        差分で変更された行を含む関数・クラスの名前を、差分内での出現順に返します。
+        """
+        symbols: List[str] = []
+        seen: Set[str] = set()
+
+        def add(name: Optional[str]):
+            # __init__ などの特殊メソッドは呼び出し箇所が特定できないため除外する
+            if name and name not in seen and name not in _KEYWORDS and not name.startswith('__'):
+                seen.add(name)
+                symbols.append(name)
+
+        current_path: Optional[str] = None
+        def_lines: List[int] = []
+        def_names: List[str] = []
+        new_lineno = 0
+
+        # ハンク内の '++ ' や '-- ' で始まる行をファイルヘッダーと誤認しないよう、ハンクの行数を追跡して解析する
+        for kind, line in iter_diff_lines(code_diff):
+            if kind == 'header':
+                if line.startswith('+++ '):
+                    target = line[4:].strip()
+                    current_path = target[2:] if target.startswith('b/') else None
+                    definitions = self.files.get(current_path, {}).get('definitions', []) if current_path else []
+                    def_lines = [lineno for _, lineno in definitions]
+                    def_names = [name for name, _ in definitions]
+                continue
+            if kind == 'hunk':
+                new_lineno = hunk_new_start(line)
+                continue
+            if kind == 'meta':
+                continue
+
+            if line.startswith('+'):
+                # 変更後の行番号から、その行を含む定義を逆引きする
+                position = bisect.bisect_right(def_lines, new_lineno) - 1
+                if position >= 0:
+                    add(def_names[position])
+                new_lineno += 1
+            elif line.startswith('-'):
+                # 削除された定義は変更後のファイルに存在しないため、行テキストから抽出する
+                match = _DEFINITION_REGEX.match(line[1:]) or re.match(r'\s*(?:async\s+)?(?:def|class)\s+(\w+)', line[1:])
+                if match:
+                    add(next((name for name in match.groups() if name), None))
+            else:
+                new_lineno += 1
+
+        return symbols
+
+    def find_references(self, symbol: str, exclude: Optional[Set[Tuple[str, int]]] = None) -> List[Tuple[str, int, str]]:
+        """指定されたシンボルの参照箇所を (パス, 行, 行テキスト) のリストで返します。"""
+        results = []
+        for path, entry in self.files.items():
+            for name, lineno, text in entry.get('references', []):
+                if name == symbol and not (exclude and (path, lineno) in exclude):
+                    results.append((path, lineno, text))
+        return results
+
+    def build_context(self, code_diff: str, budget_chars: int, max_sites_per_symbol: int = 5) -> Optional[str]:
+        """
+        差分で変更されたシンボルの呼び出し箇所を、指定された文字数の範囲でプロンプト用に整形します。
+
+        Args:
+            code_diff (str): レビュー対象の差分。
+            budget_chars (int): 出力する文字数の上限。
+            max_sites_per_symbol (int): 1シンボルあたりに含める呼び出し箇所の上限。
+
+        Returns:
+            Optional[str]: 整形された呼び出し箇所の一覧。該当がなければNone。
+        """
+        if budget_chars <= 0:
+            return None
+
+        changed_files = {line[6:].strip() for kind, line in iter_diff_lines(code_diff)
+                         if kind == 'header' and line.startswith('+++ b/')}
+        sections: List[str] = []
+        used = 0
+
+        for symbol in self.changed_symbols(code_diff):
+            references = self.find_references(symbol)
+            if not references:
+                continue
+            # 差分に含まれないファイルからの呼び出しを優先する
+            references.sort(key=lambda ref: (ref[0] in changed_files, ref[0], ref[1]))
+
+            lines = [f"- `{symbol}`"]
+            for path, lineno, text in references[:max_sites_per_symbol]:
+                lines.append(f"  - {path}:{lineno}: `{text}`")
+            section = "\n".join(lines)
+
+            if used + len(section) > budget_chars:
+                break
+            sections.append(section)
+            used += len(section) + 1
+
+        return "\n".join(sections) if sections else None
@@ -0,0 +1,119 @@
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from core.git_client import GitClient, LocalGitClient
+from core.settings import Settings
+
+# 操作の種類と、そのタイムアウトを上書きする設定名の対応
+_TIMEOUT_SETTINGS = {
+    'clone': 'GIT_TIMEOUT_CLONE',
+    'fetch': 'GIT_TIMEOUT_FETCH',
+    'diff': 'GIT_TIMEOUT_DIFF',
+    'default': 'GIT_TIMEOUT_DEFAULT',
+}
+
+
+class RepositoryManager:
+    """
+    レビュー対象リポジトリの準備（クローン/オープンとフェッチ）を一元管理するクラス。
+    プロセス内では同じリポジトリの GitClient を共有するため、クローン/オープンとフェッチはそれぞれ一度だけ実行されます。
+    すべてのエントリーポイントはこのクラスを経由して GitClient を取得してください。
+    """
+    _clients: Dict[Path, GitClient] = {}
+    _lock = threading.Lock()
+
+    def __init__(self):
+        """
+        RepositoryManagerクラスは直接インスタンス化されるべきではありません。
+        代わりに、open()などのクラスメソッドを使用してください。
+        """
+        raise TypeError("RepositoryManagerクラスはインスタンス化できません。RepositoryManager.open()を使用してください。")
+
+    @staticmethod
+    def repo_path_for(repo_url: str, local_path: Path) -> Path:
+        """リポジトリURLからクローン先のパス (local_path/リポジトリ名) を求めます。"""
+        return (Path(local_path) / Path(repo_url).stem).resolve()
+
+    @staticmethod
+    def git_options(extra_config: Optional[List[str]] = None) -> Dict[str, dict]:
+        """
+        設定から GitClient に渡すタイムアウトと `-c` 設定を組み立てます。
+
+        Args:
+            extra_config (Optional[List[str]]): コマンドラインで指定された `KEY=VALUE` 形式の設定。設定ファイルの値より優先されます。
+
+        Returns:
+            Dict[str, dict]: open() / open_local() にそのまま渡せる {'timeouts': ..., 'git_config': ...}。
+
+        Raises:
+            ValueError: 設定が `KEY=VALUE` 形式でない場合。
+        """
+        timeouts = {}
+        for operation, name in _TIMEOUT_SETTINGS.items():
+            value = Settings.get_typed(name)
+            if value is not None:
+                timeouts[operation] = value
+
+        entries = (Settings.get_list('GIT_CONFIG') or []) + list(extra_config or [])
+        git_config = {}
+        for entry in entries:
+            key, sep, value = entry.partition('=')
+            if not sep or not key.strip():
+                raise ValueError(f"Gitの設定は KEY=VALUE の形式で指定してください: {entry!r}")
+            git_config[key.strip()] = value.strip()
+        return {'timeouts': timeouts, 'git_config': git_config}
+
+    @classmethod
+    def open(cls, repo_url: str, local_path: Path, ssh_key_path: Optional[str] = None,
+             fetch_max_age: float = 0, timeouts: Optional[Dict[str, float]] = None,
+             git_config: Optional[Dict[str, str]] = None) -> GitClient:
+        """
+        リポジトリをクローンまたはオープンした GitClient を返します。同じリポジトリは2回目以降キャッシュを返します。
+        キャッシュを返す場合も、fetch_max_age・timeouts・git_config には今回指定された値を反映します。
+
+        Args:
+            repo_url (str): GitリポジトリのURL。
+            local_path (Path): リポジトリを格納する親ディレクトリ。
+            ssh_key_path (Optional[str]): SSH秘密鍵へのパス。
+            fetch_max_age (float): 前回のフェッチからこの秒数以内であれば、フェッチを省略します。
+            timeouts (Optional[Dict[str, float]]): 操作の種類ごとのタイムアウト秒数。
+            git_config (Optional[Dict[str, str]]): すべてのgitコマンドに `-c key=value` として渡す設定。
+        """
+        repo_path = cls.repo_path_for(repo_url, local_path)
+        with cls._lock:
+            client = cls._clients.get(repo_path)
+            if client is None or client.repo_url != repo_url:
+                client = GitClient(
+                    repo_url=repo_url,
+                    repo_path=str(repo_path),
+                    ssh_key_path=ssh_key_path,
+                    fetch_max_age=fetch_max_age,
+                    timeouts=timeouts,
+                    git_config=git_config
+                )
+                cls._clients[repo_path] = client
+            else:
+                client.fetch_max_age = fetch_max_age
+                client.apply_options(timeouts, git_config)
+            return client
+
+    @classmethod
+    def open_local(cls, repo_path: str, timeouts: Optional[Dict[str, float]] = None,
+                   git_config: Optional[Dict[str, str]] = None) -> LocalGitClient:
+        """既存の作業ツリーを、クローンやフェッチを行わずに開きます。キャッシュを返す場合も timeouts・git_config は今回の値を反映します。"""
+        resolved = Path(repo_path).resolve()
+        with cls._lock:
+            client = cls._clients.get(resolved)
+            if not isinstance(client, LocalGitClient):
+                client = LocalGitClient(str(resolved), timeouts=timeouts, git_config=git_config)
+                cls._clients[resolved] = client
+            else:
+                client.apply_options(timeouts, git_config)
+            return client
+
+    @classmethod
+    def clear(cls) -> None:
+        """キャッシュしている GitClient を破棄します（テストや長時間稼働するプロセス向け）。"""
+        with cls._lock:
+            cls._clients.clear()
@@ -0,0 +1,104 @@
+import math
+from dataclasses import dataclass, field
+from typing import List, Optional, Set
+
+# Gemini のトークナイザーを呼び出さずに見積もるための目安
+# (ASCII文字はおよそ4文字で1トークン、日本語などの非ASCII文字はおよそ1文字で1トークン)
+_ASCII_CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """APIを呼び出さずに、テキストのトークン数を概算します。"""
+    if not text:
+        return 0
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    non_ascii_chars = len(text) - ascii_chars
+    return math.ceil(ascii_chars / _ASCII_CHARS_PER_TOKEN) + non_ascii_chars
+
+
+def diff_file_headers(code_diff: str) -> Set[str]:
+    """差分に含まれるファイルの `diff --git` ヘッダーの集合を返します（ファイル数の集計に使用）。"""
+    return {line for line in code_diff.splitlines() if line.startswith("diff --git")}
+
+
+@dataclass
+class ChunkEstimate:
+    """1回のAPI呼び出し（チャンク）の見積もり。"""
+    label: str
+    model_name: str
+    prompt_tokens: int
+
+
+@dataclass
+class ReviewEstimate:
+    """レビュー全体の規模・コストの見積もり。"""
+    file_count: int
+    diff_bytes: int
+    chunks: List[ChunkEstimate] = field(default_factory=list)
+    output_tokens_per_call: int = 1500
+    input_cost_per_mtok: float = 0.10
+    output_cost_per_mtok: float = 0.40
+    base_latency_seconds: float = 2.0
+    output_tokens_per_second: float = 150.0
+    concurrency: int = 1
+    # 送信前のサニタイズで差分から除去されたバイト数
+    sanitized_bytes: int = 0
+
+    @property
+    def api_calls(self) -> int:
+        return len(self.chunks)
+
+    @property
+    def prompt_tokens(self) -> int:
+        return sum(chunk.prompt_tokens for chunk in self.chunks)
+
+    @property
+    def max_chunk_tokens(self) -> int:
+        return max((chunk.prompt_tokens for chunk in self.chunks), default=0)
+
+    @property
+    def output_tokens(self) -> int:
+        return self.output_tokens_per_call * self.api_calls
+
+    @property
+    def latency_seconds(self) -> float:
+        """並列度を考慮した、API呼び出しにかかる時間の概算（秒）。"""
+        if not self.chunks:
+            return 0.0
+        per_call = self.base_latency_seconds + self.output_tokens_per_call / self.output_tokens_per_second
+        return per_call * math.ceil(self.api_calls / max(1, self.concurrency))
+
+    @property
+    def cost_usd(self) -> float:
+        return (self.prompt_tokens * self.input_cost_per_mtok + self.output_tokens * self.output_cost_per_mtok) / 1_000_000
+
+    def format_report(self) -> str:
+        """ドライラン結果として表示するレポートを整形します。"""
+        lines = [
+            f"ファイル数: {self.file_count}",
+            f"差分サイズ: {self.diff_bytes:,} bytes (サニタイズで除去: {self.sanitized_bytes:,} bytes)",
+            f"API呼び出し回数: {self.api_calls}",
+        ]
+        for chunk in self.chunks:
+            lines.append(f"  - {chunk.label} ({chunk.model_name}): 入力 約 {chunk.prompt_tokens:,} トークン")
+        lines.extend([
+            f"入力トークン合計: 約 {self.prompt_tokens:,}",
+            f"出力トークン合計: 約 {self.output_tokens:,} (1回あたり {self.output_tokens_per_call:,} と仮定)",
+            f"推定所要時間: 約 {self.latency_seconds:.1f} 秒 (並列度 {self.concurrency})",
+            f"推定コスト: 約 ${self.cost_usd:.4f}",
+        ])
+        return "\n".join(lines)
+
+
+class TokenBudget:
+    """1回のAPI呼び出しあたりの入力トークン上限をチェックするクラス。"""
+
+    def __init__(self, max_tokens: Optional[int]):
+        self.max_tokens = max_tokens if max_tokens and max_tokens > 0 else None
+
+    def exceeded(self, prompt: str) -> Optional[int]:
+        """上限を超えている場合は推定トークン数を、超えていなければNoneを返します。"""
+        if self.max_tokens is None:
+            return None
+        tokens = estimate_tokens(prompt)
+        return tokens if tokens > self.max_tokens else None
@@ -0,0 +1,245 @@
+import json
+import re
+import threading
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+
+SEVERITIES = ("critical", "major", "minor", "info")
+
+# Gemini の response_schema に渡すレビュー結果のスキーマ
+FINDINGS_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "summary": {"type": "string"},
+        "findings": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "file": {"type": "string"},
+                    "line": {"type": "integer"},
+                    "severity": {"type": "string", "enum": list(SEVERITIES)},
+                    "message": {"type": "string"},
+                    "suggestion": {"type": "string"},
+                },
+                "required": ["file", "line", "severity", "message"],
+            },
+        },
+    },
+    "required": ["summary", "findings"],
+}
+
+_HUNK_HEADER_REGEX = re.compile(r'^@@ -\d+(?:,\d+)? \+(\d+)(?:,\d+)? @@')
+_HUNK_RANGE_REGEX = re.compile(r'^@@ -\d+(?:,(\d+))? \+\d+(?:,(\d+))? @@')
+
+
+def iter_diff_lines(code_diff: str) -> Iterator[Tuple[str, str]]:
+    """
+    unified diff の各行を種別とともに返します。
+    ハンクヘッダーの行数を追跡し、ハンク内の '--- ' や '+++ ' で始まる削除・追加行をファイルヘッダーと誤認しないようにします。
+
+    Yields:
+        Tuple[str, str]: ('header' | 'hunk' | 'line' | 'meta', 行) の組。
+            'header' は ---/+++ のファイルヘッダー、'line' はハンク内の行、'meta' はそれ以外の行です。
+    """
+    old_left = new_left = 0
+    for line in code_diff.splitlines():
+        if old_left > 0 or new_left > 0:
+            if line.startswith('\\'):
+                yield 'meta', line
+                continue
+            if line.startswith('-'):
+                old_left -= 1
+            elif line.startswith('+'):
+                new_left -= 1
+            else:
+                old_left -= 1
+                new_left -= 1
+            yield 'line', line
+            continue
+
+        match = _HUNK_RANGE_REGEX.match(line)
+        if match:
+            old_left = int(match.group(1)) if match.group(1) is not None else 1
+            new_left = int(match.group(2)) if match.group(2) is not None else 1
+            yield 'hunk', line
+        elif line.startswith(('--- ', '+++ ')):
+            yield 'header', line
+        else:
+            yield 'meta', line
+
+
+def hunk_new_start(hunk_line: str) -> int:
+    """ハンクヘッダー ('@@ -a,b +c,d @@') から変更後のファイルの開始行番号を返します。"""
+    return int(_HUNK_HEADER_REGEX.match(hunk_line).group(1))
+
+
+class ReviewSchemaError(ValueError):
+    """構造化レビュー結果がスキーマに適合しない場合に発生。"""
+    pass
+
+
+@dataclass
+class Finding:
+    """ファイルと行に紐づく1件の指摘事項。"""
+    file: str
+    line: int
+    severity: str
+    message: str
+    suggestion: str = ""
+    # 差分上の位置 (ファイルごとの差分内で最初のハンクヘッダーの次の行を1とする行番号)
+    position: Optional[int] = None
+    hunk: Optional[str] = None
+    in_diff: bool = False
+
+
+@dataclass
+class StructuredReview:
+    """構造化されたレビュー結果。"""
+    summary: str
+    findings: List[Finding] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"summary": self.summary, "findings": [asdict(finding) for finding in self.findings]}
+
+    def to_markdown(self) -> str:
+        """Backlogコメントや標準出力向けに、既存のMarkdown形式のレビューと同じ構成で整形します。"""
+        lines = ["**総評:**", self.summary]
+        by_file: Dict[str, List[Finding]] = {}
+        for finding in self.findings:
+            by_file.setdefault(finding.file, []).append(finding)
+
+        for path, findings in by_file.items():
+            lines.append("")
+            lines.append(f"#### ファイル名: {path}")
+            for finding in sorted(findings, key=lambda f: f.line):
+                lines.append(f"- **{finding.line}行目** [{finding.severity}] {finding.message}")
+                if finding.suggestion:
+                    lines.append(f"  - 修正案: {finding.suggestion}")
+        return "\n".join(lines)
+
+
+def validate_review(data: Any) -> StructuredReview:
+    """
+    モデルが返したJSONを検証し、StructuredReview に変換します。
+
+    Raises:
+        ReviewSchemaError: 必須項目の欠落や型の不一致がある場合。
+    """
+    if not isinstance(data, dict):
+        raise ReviewSchemaError("レビュー結果がJSONオブジェクトではありません。")
+    summary = data.get("summary")
+    raw_findings = data.get("findings")
+    if not isinstance(summary, str):
+        raise ReviewSchemaError("'summary' が文字列ではありません。")
+    if not isinstance(raw_findings, list):
+        raise ReviewSchemaError("'findings' が配列ではありません。")
+
+    findings = []
+    for index, item in enumerate(raw_findings):
+        if not isinstance(item, dict):
+            raise ReviewSchemaError(f"findings[{index}] がオブジェクトではありません。")
+        for key, expected in (("file", str), ("line", int), ("severity", str), ("message", str)):
+            value = item.get(key)
+            if not isinstance(value, expected) or isinstance(value, bool):
+                raise ReviewSchemaError(f"findings[{index}].{key} が不正です: {value!r}")
+        severity = item["severity"].lower()
+        if severity not in SEVERITIES:
+            raise ReviewSchemaError(f"findings[{index}].severity が不正です: {item['severity']!r}")
+        suggestion = item.get("suggestion") or ""
+        if not isinstance(suggestion, str):
+            raise ReviewSchemaError(f"findings[{index}].suggestion が文字列ではありません。")
+        findings.append(Finding(
+            file=item["file"].strip(),
+            line=item["line"],
+            severity=severity,
+            message=item["message"].strip(),
+            suggestion=suggestion.strip(),
+        ))
+    return StructuredReview(summary=summary.strip(), findings=findings)
+
+
+def parse_review_json(text: str) -> StructuredReview:
+    """モデルの応答テキストをJSONとして解析し、検証します。"""
+    try:
+        data = json.loads(text)
+    except ValueError as e:
+        raise ReviewSchemaError(f"レビュー結果のJSON解析に失敗しました: {e}") from e
+    return validate_review(data)
+
+
+class DiffPositionMap:
+    """
+    差分を解析し、変更後のファイルの行番号から差分上の位置とハンクヘッダーを引けるようにするクラス。
+    """
+
+    def __init__(self):
+        self._positions: Dict[str, Dict[int, Tuple[int, str]]] = {}
+
+    @classmethod
+    def from_diff(cls, code_diff: str) -> "DiffPositionMap":
+        position_map = cls()
+        current: Optional[Dict[int, Tuple[int, str]]] = None
+        position = 0
+        new_lineno = 0
+        hunk = ""
+
+        for kind, line in iter_diff_lines(code_diff):
+            if kind == 'header':
+                if line.startswith('+++ '):
+                    path = line[4:].strip()
+                    path = path[2:] if path.startswith('b/') else path
+                    current = position_map._positions.setdefault(path, {})
+                    position = 0
+                continue
+            if kind == 'meta' and line.startswith('diff --git'):
+                current = None
+                continue
+            if current is None:
+                continue
+
+            if kind == 'hunk':
+                if position:
+                    position += 1  # 2つ目以降のハンクヘッダーも位置に数える
+                new_lineno = hunk_new_start(line)
+                hunk = line
+                continue
+            if kind == 'meta' and not line.startswith('\\'):
+                continue
+
+            position += 1
+            if line.startswith('-') or line.startswith('\\'):
+                continue
+            current[new_lineno] = (position, hunk)
+            new_lineno += 1
+
+        return position_map
+
+    def locate(self, path: str, line: int) -> Optional[Tuple[int, str]]:
+        """変更後のファイルの行番号に対応する (差分上の位置, ハンクヘッダー) を返します。差分外の行はNone。"""
+        return self._positions.get(path, {}).get(line)
+
+    def anchor(self, review: StructuredReview) -> StructuredReview:
+        """レビュー結果の各指摘事項に、差分上の位置を設定します。"""
+        for finding in review.findings:
+            located = self.locate(finding.file, finding.line)
+            if located:
+                finding.position, finding.hunk = located
+                finding.in_diff = True
+        return review
+
+
+class JsonlWriter:
+    """構造化レビュー結果をJSON Lines形式で逐次書き出すクラス。並列レビューからの書き込みに対応します。"""
+
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def write_review(self, review: StructuredReview, commit: Optional[str] = None) -> None:
+        records = [{"type": "summary", "commit": commit, "summary": review.summary, "finding_count": len(review.findings)}]
+        records.extend({"type": "finding", "commit": commit, **asdict(finding)} for finding in review.findings)
+        payload = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        with self._lock:
+            self.stream.write(payload)
+            self.stream.flush()
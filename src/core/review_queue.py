@@ -0,0 +1,213 @@
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+# ジョブの状態
+STATUS_PENDING = 'pending'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+STATUS_SUPERSEDED = 'superseded'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS review_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_key TEXT NOT NULL,
+    sha TEXT,
+    mode TEXT NOT NULL,
+    args_json TEXT NOT NULL,
+    diff_size INTEGER NOT NULL DEFAULT 0,
+    priority REAL NOT NULL,
+    status TEXT NOT NULL,
+    superseded_by INTEGER,
+    enqueued_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS review_jobs_status_priority ON review_jobs (status, priority, id);
+CREATE INDEX IF NOT EXISTS review_jobs_key_status ON review_jobs (job_key, status);
+"""
+
+
+class ReviewQueueError(Exception):
+    """ジョブキューの操作に失敗した場合に発生。"""
+    pass
+
+
+@dataclass
+class ReviewJob:
+    """キューに登録されたレビュージョブ。"""
+    id: int
+    job_key: str
+    sha: Optional[str]
+    mode: str
+    args: Dict[str, Any]
+    diff_size: int
+    status: str
+    enqueued_at: float
+    superseded_by: Optional[int] = None
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "ReviewJob":
+        return cls(
+            id=row['id'],
+            job_key=row['job_key'],
+            sha=row['sha'],
+            mode=row['mode'],
+            args=json.loads(row['args_json']),
+            diff_size=row['diff_size'],
+            status=row['status'],
+            enqueued_at=row['enqueued_at'],
+            superseded_by=row['superseded_by'],
+        )
+
+
+def job_key_for(repo: str, branch: Optional[str]) -> str:
+    """ジョブをまとめる単位 (リポジトリ, フィーチャーブランチ) のキーを返します。"""
+    return f"{repo}#{branch or ''}"
+
+
+class ReviewQueue:
+    """
+    SQLiteに保存するレビュージョブのキュー。
+    同じ (リポジトリ, フィーチャーブランチ) のジョブは最新の1件にまとめられ、古いジョブは 'superseded' になります。
+    ジョブは登録時刻と差分の規模から求めた優先度の順に取り出されます (古いもの・小さいものが先)。
+    複数のプロセスから同時に利用できます。
+    """
+
+    def __init__(self, db_path: Path, size_penalty_seconds: float = 0.1):
+        """
+        Args:
+            db_path (Path): キューを保存するSQLiteファイルのパス。
+            size_penalty_seconds (float): 差分1行あたり、登録時刻を遅らせたものとして扱う秒数。
+                大きい差分は後回しになりますが、時間が経てば必ず取り出されます。
+        """
+        self.db_path = Path(db_path)
+        self.size_penalty_seconds = size_penalty_seconds
+        self._local = threading.local()
+        try:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection().executescript(_SCHEMA)
+        except (OSError, sqlite3.Error) as e:
+            raise ReviewQueueError(f"ジョブキューを開けません ({self.db_path}): {e}") from e
+
+    def _connection(self) -> sqlite3.Connection:
+        """スレッドごとの接続を返します。トランザクションは明示的に BEGIN IMMEDIATE で開始します。"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def _transaction(self):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        return connection
+
+    def enqueue(self, job_key: str, mode: str, args: Dict[str, Any], sha: Optional[str] = None,
+                diff_size: int = 0) -> Tuple[int, bool]:
+        """
+        ジョブを登録します。同じキーの待機中のジョブは置き換えられ、実行中のジョブには中止が要求されます。
+
+        Args:
+            job_key (str): job_key_for() で求めたキー。
+            mode (str): 'backlog' または 'generic'。
+            args (Dict[str, Any]): レビュアーに渡すコマンドライン引数。
+            sha (Optional[str]): レビュー対象のコミット。同じコミットのジョブが待機中・実行中であれば登録しません。
+            diff_size (int): 差分の変更行数 (不明な場合は0)。
+
+        Returns:
+            Tuple[int, bool]: (ジョブID, 新規に登録したか)。
+        """
+        now = time.time()
+        connection = self._transaction()
+        try:
+            if sha:
+                row = connection.execute(
+                    "SELECT id FROM review_jobs WHERE job_key = ? AND sha = ? AND status IN (?, ?) ORDER BY id DESC LIMIT 1",
+                    (job_key, sha, STATUS_PENDING, STATUS_RUNNING)
+                ).fetchone()
+                if row:
+                    connection.execute("COMMIT")
+                    return row['id'], False
+
+            priority = now + max(0, diff_size) * self.size_penalty_seconds
+            job_id = connection.execute(
+                "INSERT INTO review_jobs (job_key, sha, mode, args_json, diff_size, priority, status, enqueued_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_key, sha, mode, json.dumps(args, ensure_ascii=False), diff_size, priority, STATUS_PENDING, now)
+            ).lastrowid
+            # 待機中の古いジョブは実行せずに置き換え、実行中のジョブにはワーカーが検知できるよう印を付ける
+            connection.execute(
+                "UPDATE review_jobs SET status = ?, superseded_by = ?, finished_at = ? "
+                "WHERE job_key = ? AND status = ? AND id != ?",
+                (STATUS_SUPERSEDED, job_id, now, job_key, STATUS_PENDING, job_id)
+            )
+            connection.execute(
+                "UPDATE review_jobs SET superseded_by = ? WHERE job_key = ? AND status = ?",
+                (job_id, job_key, STATUS_RUNNING)
+            )
+            connection.execute("COMMIT")
+            return job_id, True
+        except sqlite3.Error as e:
+            connection.execute("ROLLBACK")
+            raise ReviewQueueError(f"ジョブの登録に失敗しました: {e}") from e
+
+    def claim(self) -> Optional[ReviewJob]:
+        """優先度が最も高い待機中のジョブを実行中にして返します。待機中のジョブがなければNone。"""
+        connection = self._transaction()
+        try:
+            row = connection.execute(
+                "SELECT * FROM review_jobs WHERE status = ? ORDER BY priority, id LIMIT 1", (STATUS_PENDING,)
+            ).fetchone()
+            if row is None:
+                connection.execute("COMMIT")
+                return None
+            connection.execute(
+                "UPDATE review_jobs SET status = ?, started_at = ? WHERE id = ?", (STATUS_RUNNING, time.time(), row['id'])
+            )
+            connection.execute("COMMIT")
+        except sqlite3.Error as e:
+            connection.execute("ROLLBACK")
+            raise ReviewQueueError(f"ジョブの取得に失敗しました: {e}") from e
+        job = ReviewJob.from_row(row)
+        job.status = STATUS_RUNNING
+        return job
+
+    def is_superseded(self, job_id: int) -> bool:
+        """実行中のジョブが、より新しいジョブによって置き換えられたかを返します。"""
+        row = self._connection().execute("SELECT superseded_by FROM review_jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row['superseded_by'])
+
+    def finish(self, job_id: int, status: str, error: Optional[str] = None) -> None:
+        """ジョブを終了状態 ('done' / 'failed' / 'superseded') にします。"""
+        self._connection().execute(
+            "UPDATE review_jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+            (status, error, time.time(), job_id)
+        )
+
+    def requeue_stale(self, max_running_seconds: float) -> int:
+        """
+        異常終了したワーカーが残した実行中のジョブを待機中に戻します。
+
+        Returns:
+            int: 待機中に戻したジョブの数。
+        """
+        cursor = self._connection().execute(
+            "UPDATE review_jobs SET status = ?, started_at = NULL "
+            "WHERE status = ? AND superseded_by IS NULL AND started_at < ?",
+            (STATUS_PENDING, STATUS_RUNNING, time.time() - max_running_seconds)
+        )
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        """状態ごとのジョブ数を返します。"""
+        rows = self._connection().execute("SELECT status, COUNT(*) AS n FROM review_jobs GROUP BY status").fetchall()
+        return {row['status']: row['n'] for row in rows}
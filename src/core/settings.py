@@ -1,44 +1,209 @@
 import os
 import sys
-from typing import Optional, Any
+import contextlib
+import contextvars
+import functools
+import threading
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, TypeVar
 from pathlib import Path
 import importlib.util
 
-class Settings:
+_T = TypeVar('_T')
+
+_TRUE_VALUES = ('1', 'true', 'yes', 'on')
+_FALSE_VALUES = ('0', 'false', 'no', 'off')
+
+
+def _parse_bool(value: str) -> bool:
+    lowered = value.lower()
+    if lowered in _TRUE_VALUES:
+        return True
+    if lowered in _FALSE_VALUES:
+        return False
+    raise ValueError(f"真偽値 ({'/'.join(_TRUE_VALUES + _FALSE_VALUES)}) ではありません")
+
+
+# 型を持つ設定項目。スナップショットの作成時に検証されます (ここにない項目は文字列として扱います)
+SETTING_TYPES: Dict[str, Callable[[str], Any]] = {
+    'GIT_FETCH_MAX_AGE_SECONDS': float,
+    'GIT_TIMEOUT_CLONE': float,
+    'GIT_TIMEOUT_FETCH': float,
+    'GIT_TIMEOUT_DIFF': float,
+    'GIT_TIMEOUT_DEFAULT': float,
+    'GEMINI_CACHE_ENABLED': _parse_bool,
+    'GEMINI_CACHE_TTL_SECONDS': int,
+    'GEMINI_CACHE_MIN_CHARS': int,
+    'GEMINI_OUTPUT_TOKENS_PER_REVIEW': int,
+    'GEMINI_INPUT_COST_PER_MTOK': float,
+    'GEMINI_OUTPUT_COST_PER_MTOK': float,
+    'GEMINI_OUTPUT_TOKENS_PER_SECOND': float,
+    'REVIEW_QUEUE_SIZE_PENALTY_SECONDS': float,
+    'DIFF_SANITIZE_ENABLED': _parse_bool,
+    'DIFF_MAX_LINE_LENGTH': int,
+    'DIFF_ENTROPY_THRESHOLD': float,
+    'CASSETTE_STRICT': _parse_bool,
+    'CASSETTE_APPEND': _parse_bool,
+    'CASSETTE_LATENCY_SCALE': float,
+    'CASSETTE_EXTRA_LATENCY_MS': float,
+    'CASSETTE_JITTER_MS': float,
+    'CASSETTE_ERROR_RATE': float,
+    'CASSETTE_RATE_LIMIT_PER_MINUTE': int,
+    'CASSETTE_SEED': int,
+    'CONSENSUS_CALL_TIMEOUT_SECONDS': float,
+    'ISSUE_CONTEXT_MAX_CHARS': int,
+    'BACKLOG_ISSUE_CACHE_TTL_SECONDS': float,
+    'ISSUE_PREFETCH_TIMEOUT_SECONDS': float,
+}
+
+
+class SettingsError(ValueError):
+    """設定値が不正な場合に発生。"""
+    pass
+
+
+@dataclass(frozen=True)
+class SettingsSnapshot:
     """
-    環境変数またはconfig.pyファイルから設定値を管理するクラス。
-    シングルトンパターンを適用し、設定の初期化を一度だけ行います。
+    ある時点の設定値を保持する不変のスナップショット。
+    環境変数とconfig.pyは作成時に一度だけ読み込まれ、以降の参照ではファイルや環境変数を再読み込みしません。
     """
-    _config: Optional[Any] = None
-
-    PROMPT_DIR: Path = Path.cwd() / "prompts"  # promptsディレクトリのパスを基準にする
-    PROMPT_GENERIC_PATH: Path = PROMPT_DIR / "generic.md"
-    PROMPT_BACKLOG_PATH: Path = PROMPT_DIR / "backlog.md"
+    base_dir: Path
+    prompt_dir: Path
+    values: Mapping[str, str] = field(default_factory=dict)
+    typed_values: Mapping[str, Any] = field(default_factory=dict)
+    loaded_at: float = 0.0
 
     @classmethod
-    def _initialize_config(cls):
+    def load(cls, base_dir: Optional[Path] = None) -> "SettingsSnapshot":
         """
-        config.pyモジュールを一度だけロードします。
+        config.py と環境変数から新しいスナップショットを作成します。環境変数がconfig.pyより優先されます。
+
+        Args:
+            base_dir (Optional[Path]): config.py と prompts ディレクトリを探すディレクトリ。省略時はカレントディレクトリ。
+
+        Raises:
+            SettingsError: 型を持つ設定項目の値が不正な場合。
         """
-        if cls._config is not None:
-            return
+        base_dir = Path(base_dir or Path.cwd()).resolve()
+        values: Dict[str, str] = {}
 
-        config_path = os.path.join(os.getcwd(), 'config.py')
-        if not os.path.exists(config_path):
-            print("情報: config.pyが見つかりません。設定は環境変数を優先して読み込まれます。", file=sys.stderr)
-            cls._config = None
-            return
+        config_module = cls._load_config_module(base_dir / 'config.py')
+        if config_module is not None:
+            for name in dir(config_module):
+                value = getattr(config_module, name, None)
+                if name.isupper() and isinstance(value, str) and value.strip():
+                    values[name] = value.strip()
+
+        for name, value in os.environ.items():
+            if value.strip():
+                values[name] = value.strip()
+
+        prompt_dir = Path(values['PROMPT_DIR']) if values.get('PROMPT_DIR') else base_dir / 'prompts'
+        if not prompt_dir.is_absolute():
+            prompt_dir = base_dir / prompt_dir
+        return cls._build(base_dir, prompt_dir.resolve(), values)
+
+    @classmethod
+    def _build(cls, base_dir: Path, prompt_dir: Path, values: Dict[str, str]) -> "SettingsSnapshot":
+        typed_values: Dict[str, Any] = {}
+        errors = []
+        for name, parse in SETTING_TYPES.items():
+            if name not in values:
+                continue
+            try:
+                typed_values[name] = parse(values[name])
+            except ValueError as e:
+                errors.append(f"{name}={values[name]!r}: {e}")
+        if errors:
+            raise SettingsError("設定値が不正です: " + "; ".join(errors))
+        return cls(
+            base_dir=base_dir,
+            prompt_dir=prompt_dir,
+            values=MappingProxyType(dict(values)),
+            typed_values=MappingProxyType(typed_values),
+            loaded_at=time.time()
+        )
 
+    @staticmethod
+    def _load_config_module(config_path: Path) -> Optional[Any]:
+        """config.pyモジュールをロードします。存在しない、またはロードに失敗した場合はNone。"""
+        if not config_path.exists():
+            print("情報: config.pyが見つかりません。設定は環境変数を優先して読み込まれます。", file=sys.stderr)
+            return None
         try:
             # config.pyを動的にインポート
-            spec = importlib.util.spec_from_file_location("config", config_path)
+            spec = importlib.util.spec_from_file_location("config", str(config_path))
             config_module = importlib.util.module_from_spec(spec)
             sys.modules["config"] = config_module
             spec.loader.exec_module(config_module)
-            cls._config = config_module
+            return config_module
         except Exception as e:
             print(f"警告: config.pyのロード中にエラーが発生しました: {e}", file=sys.stderr)
-            cls._config = None
+            return None
+
+    def with_overrides(self, values: Optional[Mapping[str, Any]] = None,
+                       prompt_dir: Optional[Path] = None) -> "SettingsSnapshot":
+        """
+        一部の設定値を上書きした新しいスナップショットを返します (元のスナップショットは変更されません)。
+        値に None を指定した項目は未設定として扱います。
+        """
+        merged = dict(self.values)
+        for name, value in (values or {}).items():
+            if value is None:
+                merged.pop(name, None)
+            else:
+                merged[name] = str(value).strip()
+        new_prompt_dir = Path(prompt_dir).resolve() if prompt_dir else self.prompt_dir
+        return self._build(self.base_dir, new_prompt_dir, merged)
+
+    def get(self, name: str) -> Optional[str]:
+        """設定値を文字列として取得します。見つからなければNone。"""
+        return self.values.get(name)
+
+    def get_typed(self, name: str, default: Any = None) -> Any:
+        """SETTING_TYPES に従って変換済みの設定値を取得します。未設定の場合は default。"""
+        if name in SETTING_TYPES:
+            return self.typed_values.get(name, default)
+        value = self.values.get(name)
+        return default if value is None else value
+
+    def get_list(self, name: str) -> Optional[List[str]]:
+        """カンマ区切りの設定値をリストとして取得します。未設定の場合はNone。"""
+        value = self.values.get(name)
+        if not value:
+            return None
+        return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class _PromptPath:
+    """現在のスナップショットの prompts ディレクトリを基準にプロンプトファイルのパスを返す記述子。"""
+
+    def __init__(self, filename: Optional[str] = None):
+        self.filename = filename
+
+    def __get__(self, obj, owner) -> Path:
+        prompt_dir = owner.snapshot().prompt_dir
+        return prompt_dir / self.filename if self.filename else prompt_dir
+
+
+class Settings:
+    """
+    環境変数またはconfig.pyファイルから設定値を管理するクラス。
+    設定は初回参照時に一度だけ読み込まれて不変のスナップショットとして保持され、reload() で明示的に再読み込みします。
+    override() を使うと、ジョブごとに一部の設定値を上書きできます。
+    """
+    _snapshot: Optional[SettingsSnapshot] = None
+    _lock = threading.Lock()
+    _override: contextvars.ContextVar = contextvars.ContextVar('settings_override', default=None)
+
+    # promptsディレクトリは読み込み時のカレントディレクトリ (または PROMPT_DIR) を基準にする
+    PROMPT_DIR = _PromptPath()
+    PROMPT_GENERIC_PATH = _PromptPath("generic.md")
+    PROMPT_BACKLOG_PATH = _PromptPath("backlog.md")
+    PROMPT_STRUCTURED_PATH = _PromptPath("structured.md")
 
     def __init__(self):
         """
@@ -47,8 +212,83 @@ class Settings:
         """
         raise TypeError("Settingsクラスはインスタンス化できません。Settings.get()を使用してください。")
 
-    @staticmethod
-    def get(name: str) -> Optional[str]:
+    @classmethod
+    def snapshot(cls) -> SettingsSnapshot:
+        """
+        現在有効な設定のスナップショットを返します。override() の内側では上書き後のスナップショットを返します。
+
+        Raises:
+            SettingsError: 初回読み込み時に設定値が不正な場合。
+        """
+        override = cls._override.get()
+        if override is not None:
+            return override
+        if cls._snapshot is None:
+            with cls._lock:
+                if cls._snapshot is None:
+                    cls._snapshot = SettingsSnapshot.load()
+        return cls._snapshot
+
+    @classmethod
+    def reload(cls, base_dir: Optional[Path] = None) -> SettingsSnapshot:
+        """
+        config.py と環境変数を再読み込みし、スナップショットを差し替えます。
+
+        Args:
+            base_dir (Optional[Path]): config.py と prompts ディレクトリを探すディレクトリ。省略時はカレントディレクトリ。
+        """
+        snapshot = SettingsSnapshot.load(base_dir)
+        with cls._lock:
+            cls._snapshot = snapshot
+        return snapshot
+
+    @classmethod
+    @contextlib.contextmanager
+    def override(cls, values: Optional[Mapping[str, Any]] = None,
+                 prompt_dir: Optional[Path] = None) -> Iterator[SettingsSnapshot]:
+        """
+        ブロック内でのみ一部の設定値を上書きします (ジョブごとの設定向け)。
+        上書きは現在のコンテキストにのみ適用され、他のスレッドや並行するジョブには影響しません。
+
+        Args:
+            values (Optional[Mapping[str, Any]]): 上書きする設定値。None を指定した項目は未設定として扱います。
+            prompt_dir (Optional[Path]): プロンプトファイルを読み込むディレクトリ。
+
+        Raises:
+            SettingsError: 上書き後の設定値が不正な場合。
+        """
+        snapshot = cls.snapshot().with_overrides(values, prompt_dir=prompt_dir)
+        token = cls._override.set(snapshot)
+        try:
+            yield snapshot
+        finally:
+            cls._override.reset(token)
+
+    @classmethod
+    def bind(cls, fn: Callable[..., _T]) -> Callable[..., _T]:
+        """
+        現在の override() による上書きを引き継いで fn を実行する関数を返します。
+        ThreadPoolExecutor などで起動したスレッドは呼び出し元のコンテキストを引き継がないため、スレッドで実行する関数はこれで包んでください。
+
+        Args:
+            fn (Callable): 別スレッドで実行する関数。
+
+        Returns:
+            Callable: 呼び出し時に上書きを適用してから fn を実行する関数。複数のスレッドから同時に呼び出せます。
+        """
+        override = cls._override.get()
+
+        @functools.wraps(fn)
+        def bound(*args, **kwargs):
+            token = cls._override.set(override)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                cls._override.reset(token)
+        return bound
+
+    @classmethod
+    def get(cls, name: str) -> Optional[str]:
         """
         設定値を取得します。環境変数がconfig.pyより優先されます。
 
@@ -58,18 +298,23 @@ class Settings:
         Returns:
             Optional[str]: 見つかった設定値。見つからなければNone。
         """
-        # 初回呼び出し時に設定を初期化
-        Settings._initialize_config()
+        return cls.snapshot().get(name)
 
-        # 1. 環境変数を優先して検索
-        value = os.getenv(name)
-        if value is not None and value.strip():
-            return value.strip()
+    @classmethod
+    def get_typed(cls, name: str, default: Any = None) -> Any:
+        """
+        型を持つ設定項目 (SETTING_TYPES) を変換済みの値で取得します。
 
-        # 2. 環境変数になければ、ロード済みのconfigモジュールから検索
-        if Settings._config:
-            value = getattr(Settings._config, name, None)
-            if isinstance(value, str) and value.strip():
-                return value.strip()
+        Args:
+            name (str): 取得したい設定項目の名前。
+            default (Any): 未設定の場合に返す値。
 
-        return None
\ No newline at end of file
+        Returns:
+            Any: 変換済みの設定値。
+        """
+        return cls.snapshot().get_typed(name, default)
+
+    @classmethod
+    def get_list(cls, name: str) -> Optional[List[str]]:
+        """カンマ区切りの設定値をリストとして取得します。未設定の場合はNone。"""
+        return cls.snapshot().get_list(name)
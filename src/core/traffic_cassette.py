@@ -0,0 +1,428 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from core.settings import Settings
+
+MODE_RECORD = 'record'
+MODE_PLAYBACK = 'playback'
+CASSETTE_MODES = (MODE_RECORD, MODE_PLAYBACK)
+
+CHANNEL_GEMINI = 'gemini'
+CHANNEL_BACKLOG = 'backlog'
+
+_USAGE_FIELDS = ('prompt_token_count', 'cached_content_token_count', 'candidates_token_count', 'total_token_count')
+
+
+# --- Custom Exceptions ---
+class CassetteError(Exception):
+    """TrafficCassette related errors base class."""
+    pass
+
+
+class CassetteMissError(CassetteError):
+    """再生モードで、リクエストに対応する記録が見つからない場合に発生。"""
+    pass
+
+
+class InjectedFaultError(CassetteError):
+    """再生モードで、設定により意図的に発生させたエラー。"""
+    pass
+
+
+class RateLimitExceededError(InjectedFaultError):
+    """再生モードで、設定したレート制限を超えた場合に発生 (HTTP 429 相当)。"""
+    pass
+
+
+class ReplayedError(CassetteError):
+    """記録時に発生したエラーを再生する場合に発生。"""
+    pass
+
+
+@dataclass
+class FaultProfile:
+    """
+    再生時に注入する遅延・エラー・レート制限の設定。
+
+    Attributes:
+        latency_scale (float): 記録時の所要時間に掛ける倍率。0の場合は記録時の所要時間を再現しません。
+        extra_latency_ms (float): 1回の応答ごとに追加する遅延 (ミリ秒)。
+        jitter_ms (float): 追加する遅延のばらつきの最大値 (ミリ秒)。
+        error_rate (float): 応答の代わりに InjectedFaultError を発生させる確率 (0〜1)。
+        rate_limit_per_minute (int): チャネルごとの1分あたりの最大リクエスト数。0の場合は制限しません。
+        seed (Optional[int]): 乱数のシード。指定すると注入されるエラーと遅延が再現可能になります。
+    """
+    latency_scale: float = 1.0
+    extra_latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    rate_limit_per_minute: int = 0
+    seed: Optional[int] = None
+
+    @classmethod
+    def from_settings(cls) -> "FaultProfile":
+        """CASSETTE_* の設定値から生成します。"""
+        return cls(
+            latency_scale=Settings.get_typed('CASSETTE_LATENCY_SCALE', 1.0),
+            extra_latency_ms=Settings.get_typed('CASSETTE_EXTRA_LATENCY_MS', 0.0),
+            jitter_ms=Settings.get_typed('CASSETTE_JITTER_MS', 0.0),
+            error_rate=Settings.get_typed('CASSETTE_ERROR_RATE', 0.0),
+            rate_limit_per_minute=Settings.get_typed('CASSETTE_RATE_LIMIT_PER_MINUTE', 0),
+            seed=Settings.get_typed('CASSETTE_SEED', None),
+        )
+
+
+class _RateLimiter:
+    """直近60秒間のリクエスト時刻を保持する、チャネルごとのスライディングウィンドウ。"""
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self._calls: Dict[str, Deque[float]] = {}
+
+    def acquire(self, channel: str, now: float) -> bool:
+        if self.per_minute <= 0:
+            return True
+        calls = self._calls.setdefault(channel, deque())
+        while calls and calls[0] <= now - 60.0:
+            calls.popleft()
+        if len(calls) >= self.per_minute:
+            return False
+        calls.append(now)
+        return True
+
+
+def request_key(channel: str, request: Dict[str, Any]) -> str:
+    """リクエストの内容から、記録を照合するためのキー (SHA-256) を算出します。"""
+    payload = json.dumps([channel, request], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _serialize_gemini_response(response: Any) -> Dict[str, Any]:
+    """GenerateContentResponse から、レビューで参照する項目のみを取り出します。"""
+    try:
+        text = response.text
+    except ValueError:
+        # ブロックされた応答では text の参照が例外になる
+        text = ""
+    block_reason = None
+    prompt_feedback = getattr(response, 'prompt_feedback', None)
+    if prompt_feedback is not None and getattr(prompt_feedback, 'block_reason', None):
+        block_reason = prompt_feedback.block_reason.name
+    usage = getattr(response, 'usage_metadata', None)
+    usage_dict = {name: getattr(usage, name, 0) or 0 for name in _USAGE_FIELDS} if usage is not None else None
+    return {'text': text, 'block_reason': block_reason, 'usage': usage_dict}
+
+
+def _deserialize_gemini_response(data: Dict[str, Any]) -> Any:
+    """記録した応答を、GenerateContentResponse と同じ属性を持つオブジェクトに戻します。"""
+    block_reason = SimpleNamespace(name=data['block_reason']) if data.get('block_reason') else None
+    usage = SimpleNamespace(**data['usage']) if data.get('usage') else None
+    return SimpleNamespace(
+        text=data.get('text', ""),
+        prompt_feedback=SimpleNamespace(block_reason=block_reason),
+        usage_metadata=usage,
+    )
+
+
+class _RecordingModel:
+    """generate_content の呼び出しを実際のモデルに転送し、要求と応答をカセットに記録します。"""
+
+    def __init__(self, cassette: "TrafficCassette", model: Any, model_name: str, prefix: str = ""):
+        self._cassette = cassette
+        self._model = model
+        self._model_name = model_name
+        self._prefix = prefix
+
+    def generate_content(self, contents: str, **kwargs) -> Any:
+        request = self._cassette.gemini_request(self._model_name, self._prefix + contents, kwargs)
+        started = time.monotonic()
+        try:
+            response = self._model.generate_content(contents, **kwargs)
+        except Exception as e:
+            self._cassette.record(CHANNEL_GEMINI, request, error=e, elapsed=time.monotonic() - started)
+            raise
+        self._cassette.record(CHANNEL_GEMINI, request, response=_serialize_gemini_response(response),
+                              elapsed=time.monotonic() - started)
+        return response
+
+
+class _PlaybackModel:
+    """generate_content の呼び出しに、カセットに記録された応答を返します。"""
+
+    def __init__(self, cassette: "TrafficCassette", model_name: str, prefix: str = ""):
+        self._cassette = cassette
+        self._model_name = model_name
+        self._prefix = prefix
+
+    def generate_content(self, contents: str, **kwargs) -> Any:
+        request = self._cassette.gemini_request(self._model_name, self._prefix + contents, kwargs)
+        return _deserialize_gemini_response(self._cassette.replay(CHANNEL_GEMINI, request))
+
+
+class TrafficCassette:
+    """
+    Gemini と Backlog API の通信を記録・再生するカセット。
+    記録モードでは実際のAPIを呼び出し、要求と応答をJSON Lines形式のファイルに書き込みます。
+    再生モードではネットワークを使わずに記録した応答を返し、FaultProfile に従って遅延・エラー・レート制限を注入します。
+    同じパス・モードのカセットはプロセス内で共有されます (open() を使用)。
+    """
+
+    _instances: Dict[Tuple[str, str], "TrafficCassette"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path: Path, mode: str, faults: Optional[FaultProfile] = None, strict: bool = True,
+                 append: bool = False):
+        """
+        Args:
+            path (Path): カセットファイル (JSON Lines) のパス。
+            mode (str): 'record' または 'playback'。
+            faults (Optional[FaultProfile]): 再生時に注入する遅延・エラー。省略時は記録時の所要時間のみを再現します。
+            strict (bool): 再生時に、内容が一致する記録がない場合にエラーとするか。
+                Falseの場合は同じチャネルの記録を順に返します (差分が毎回異なる負荷試験向け)。
+            append (bool): 記録モードで、既存のカセットに追記するか。Falseの場合は開いた時点で空にします。
+
+        Raises:
+            CassetteError: モードが不正な場合、カセットを作成できない場合、または再生モードでカセットを読み込めない場合。
+        """
+        if mode not in CASSETTE_MODES:
+            raise CassetteError(f"カセットのモードが不正です: {mode} ({' / '.join(CASSETTE_MODES)} のいずれかを指定してください)")
+        self.path = Path(path)
+        self.mode = mode
+        self.faults = faults or FaultProfile()
+        self.strict = strict
+        self._lock = threading.Lock()
+        self._random = random.Random(self.faults.seed)
+        self._rate_limiter = _RateLimiter(self.faults.rate_limit_per_minute)
+        self._by_key: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._by_channel: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursor: Dict[str, int] = {}
+        self.stats: Dict[str, int] = {'recorded': 0, 'replayed': 0, 'missed': 0, 'injected_errors': 0, 'rate_limited': 0}
+        if mode == MODE_PLAYBACK:
+            self._load()
+        else:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                # 以前の記録が残っていると、同じリクエストに古い応答が先に再生されるため、追記しない場合は空にする
+                with self.path.open('a' if append else 'w', encoding='utf-8'):
+                    pass
+            except OSError as e:
+                raise CassetteError(f"カセットの保存先を作成できません ({self.path}): {e}") from e
+
+    @classmethod
+    def open(cls, path: Path, mode: str, faults: Optional[FaultProfile] = None, strict: bool = True,
+             append: bool = False) -> "TrafficCassette":
+        """
+        同じパス・モードのカセットを共有して返します。存在しなければ作成します。
+        記録モードのカセットは、プロセス内で最初に開いた時点でのみ空にします (append が False の場合)。
+        """
+        key = (str(Path(path).resolve()), mode)
+        with cls._instances_lock:
+            cassette = cls._instances.get(key)
+            if cassette is None:
+                cassette = cls(path, mode, faults=faults, strict=strict, append=append)
+                cls._instances[key] = cassette
+            return cassette
+
+    @classmethod
+    def from_settings(cls, path: Optional[str] = None, mode: Optional[str] = None) -> Optional["TrafficCassette"]:
+        """
+        引数または REVIEW_CASSETTE_PATH / REVIEW_CASSETTE_MODE からカセットを開きます。パスが未指定の場合はNone。
+        """
+        path = path or Settings.get('REVIEW_CASSETTE_PATH')
+        if not path:
+            return None
+        mode = mode or Settings.get('REVIEW_CASSETTE_MODE') or MODE_PLAYBACK
+        return cls.open(Path(path), mode, faults=FaultProfile.from_settings(),
+                        strict=Settings.get_typed('CASSETTE_STRICT', True),
+                        append=Settings.get_typed('CASSETTE_APPEND', False))
+
+    @property
+    def is_playback(self) -> bool:
+        return self.mode == MODE_PLAYBACK
+
+    def _load(self) -> None:
+        try:
+            with self.path.open(encoding='utf-8') as f:
+                for line_no, line in enumerate(f, start=1):
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError as e:
+                        raise CassetteError(f"カセットの {line_no} 行目を解析できません ({self.path}): {e}") from e
+                    self._by_key.setdefault(entry['key'], deque()).append(entry)
+                    self._by_channel.setdefault(entry['channel'], []).append(entry)
+        except OSError as e:
+            raise CassetteError(f"カセットを読み込めません ({self.path}): {e}") from e
+
+    # --- Gemini ---
+
+    @staticmethod
+    def gemini_request(model_name: str, prompt: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """generate_content の呼び出しを照合用の辞書にします。"""
+        generation_config = kwargs.get('generation_config')
+        return {
+            'model': model_name,
+            'prompt': prompt,
+            # JSONスキーマ出力や temperature が異なる呼び出しを区別する
+            'generation_config': str(generation_config) if generation_config is not None else None,
+        }
+
+    def wrap_model(self, model: Any, model_name: str, prefix: str = "") -> Any:
+        """
+        モデル (generate_content を持つオブジェクト) をカセット経由で呼び出すようにラップします。
+
+        Args:
+            model (Any): 実際のモデル。再生モードでは呼び出されません。
+            model_name (str): モデル名。照合キーに含まれます。
+            prefix (str): キャッシュ済みモデルの場合の静的プレフィックス。
+                キャッシュの有無にかかわらず、送信されるプロンプト全体で照合するために使用します。
+        """
+        if self.is_playback:
+            return _PlaybackModel(self, model_name, prefix)
+        return _RecordingModel(self, model, model_name, prefix)
+
+    # --- Backlog ---
+
+    def backlog_exchange(self, method: str, endpoint: str, params: Optional[Dict[str, Any]],
+                         data: Optional[Dict[str, Any]], send: Callable[[], Any]) -> Any:
+        """
+        Backlog API の1回のリクエストを記録または再生します。
+
+        Args:
+            method (str): HTTPメソッド。
+            endpoint (str): ベースURLからの相対パス。
+            params (Optional[Dict[str, Any]]): クエリパラメータ。
+            data (Optional[Dict[str, Any]]): リクエストボディ。
+            send (Callable[[], Any]): 記録モードで実際にリクエストを送信する関数。
+
+        Returns:
+            Any: 応答のJSON。
+
+        Raises:
+            ConnectionError / ValueError: 記録時に同じエラーが発生していた場合。
+            CassetteError: 再生モードで、記録がない場合やエラーを注入した場合。
+        """
+        request = {'method': method.upper(), 'endpoint': endpoint, 'params': params, 'data': data}
+        if self.is_playback:
+            return self.replay(CHANNEL_BACKLOG, request)
+
+        started = time.monotonic()
+        try:
+            response = send()
+        except Exception as e:
+            self.record(CHANNEL_BACKLOG, request, error=e, elapsed=time.monotonic() - started)
+            raise
+        self.record(CHANNEL_BACKLOG, request, response=response, elapsed=time.monotonic() - started)
+        return response
+
+    # --- 記録と再生 ---
+
+    def record(self, channel: str, request: Dict[str, Any], response: Any = None,
+               error: Optional[BaseException] = None, elapsed: float = 0.0) -> None:
+        """1回の通信をカセットに追記します。"""
+        entry = {
+            'channel': channel,
+            'key': request_key(channel, request),
+            'request': request,
+            'response': response,
+            'error': {'type': type(error).__name__, 'message': str(error)} if error is not None else None,
+            'elapsed': round(elapsed, 4),
+            'recorded_at': time.time(),
+        }
+        line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            try:
+                with self.path.open('a', encoding='utf-8') as f:
+                    f.write(line)
+            except OSError as e:
+                raise CassetteError(f"カセットに書き込めません ({self.path}): {e}") from e
+            self.stats['recorded'] += 1
+
+    def replay(self, channel: str, request: Dict[str, Any]) -> Any:
+        """
+        リクエストに対応する記録を探し、注入する遅延・エラーを適用してから応答を返します。
+        同じ内容のリクエストが複数回記録されている場合は記録順に返し、最後の記録は繰り返し使用します。
+        レート制限や注入したエラーで失敗したリクエストは記録を消費しないため、再試行すると同じ記録が返ります。
+        """
+        key = request_key(channel, request)
+        with self._lock:
+            # 実際のAPIと同様に、レート制限は応答の有無にかかわらずリクエストを数える
+            if not self._rate_limiter.acquire(channel, time.monotonic()):
+                self.stats['rate_limited'] += 1
+                raise RateLimitExceededError(
+                    f"レート制限を超えました ({channel}: {self.faults.rate_limit_per_minute} 回/分) [429 Too Many Requests]"
+                )
+            entry = self._next_entry(channel, key)
+            if entry is None:
+                self.stats['missed'] += 1
+                raise CassetteMissError(f"カセットに一致する記録がありません ({channel}, key={key[:12]})")
+            inject_error = self.faults.error_rate > 0 and self._random.random() < self.faults.error_rate
+            delay = self._delay_for(entry)
+            if inject_error:
+                self.stats['injected_errors'] += 1
+            else:
+                self._next_entry(channel, key, consume=True)
+                self.stats['replayed'] += 1
+
+        # 遅延はロックの外で待ち、並列リクエストが互いを待たないようにする
+        if delay > 0:
+            time.sleep(delay)
+        if inject_error:
+            raise InjectedFaultError(f"注入されたエラーです ({channel}) [503 Service Unavailable]")
+        if entry.get('error'):
+            self._raise_recorded_error(entry['error'])
+        return entry.get('response')
+
+    def _next_entry(self, channel: str, key: str, consume: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        次に返す記録を返します。consume が True の場合は、その記録を使用済みにします (ロックを保持して呼び出すこと)。
+        """
+        entries = self._by_key.get(key)
+        if entries:
+            if consume and len(entries) > 1:
+                return entries.popleft()
+            return entries[0]
+        if self.strict:
+            return None
+        # 緩い照合: 同じチャネルの記録を順に使い回す
+        candidates = self._by_channel.get(channel)
+        if not candidates:
+            return None
+        index = self._cursor.get(channel, 0)
+        if consume:
+            self._cursor[channel] = index + 1
+        return candidates[index % len(candidates)]
+
+    def _delay_for(self, entry: Dict[str, Any]) -> float:
+        delay_ms = entry.get('elapsed', 0.0) * 1000.0 * self.faults.latency_scale + self.faults.extra_latency_ms
+        if self.faults.jitter_ms > 0:
+            delay_ms += self._random.uniform(0, self.faults.jitter_ms)
+        return max(0.0, delay_ms / 1000.0)
+
+    @staticmethod
+    def _raise_recorded_error(error: Dict[str, str]) -> None:
+        message = error.get('message', "")
+        # Backlogクライアントの呼び出し元が扱う例外の型は、記録時と同じ型で再生する
+        if error.get('type') == 'ConnectionError':
+            raise ConnectionError(message)
+        if error.get('type') == 'ValueError':
+            raise ValueError(message)
+        raise ReplayedError(f"{error.get('type')}: {message}")
+
+    def format_summary(self) -> str:
+        """記録・再生の件数をまとめた1行の文字列を返します。"""
+        if not self.is_playback:
+            return f"記録 {self.stats['recorded']} 件 ({self.path})"
+        return (
+            f"再生 {self.stats['replayed']} 件, 記録なし {self.stats['missed']} 件, "
+            f"注入エラー {self.stats['injected_errors']} 件, レート制限 {self.stats['rate_limited']} 件 ({self.path})"
+        )
@@ -1,9 +1,9 @@
 # backlog_reviewer/backlog_reviewer.py
 
 import sys
-from typing import Any, Optional
+from typing import Any
 
-from .generic_reviewer import GitCodeReviewer
+from .generic_reviewer import ConfigurationError, GitCodeReviewer, ReviewCancelledError
 from core.backlog_api_client import BacklogApiClient
 from core.settings import Settings
 from core.string_utils import sanitize_string
@@ -15,18 +15,39 @@ class BacklogCodeReviewer(GitCodeReviewer):
     def __init__(self, args: Any):
         super().__init__(args)
         self.project_id = Settings.get('PROJECT_ID')
-        self.backlog_client: Optional[BacklogApiClient] = None
 
     def _setup_backlog_client(self) -> BacklogApiClient:
-        """Backlog APIクライアントを初期化します。（Backlog固有）"""
-        api_key = Settings.get('BACKLOG_API_KEY')
-        domain = Settings.get('BACKLOG_DOMAIN')
+        """
+        Backlog APIクライアントを初期化します。（Backlog固有）
 
-        if not api_key or not domain or "YOUR_API_KEY" in api_key or "your-space.backlog.jp" in domain:
-            print("エラー: Backlogの認証情報が設定されていません。環境変数またはconfig.pyを確認してください。", file=sys.stderr)
-            sys.exit(1)
+        Raises:
+            ConfigurationError: Backlogの認証情報が設定されていない場合。
+        """
+        client = self._create_backlog_client()
+        if client is None:
+            raise ConfigurationError("Backlogの認証情報が設定されていません。環境変数またはconfig.pyを確認してください。")
+        return client
+
+    def _post_commit_reviews(self, issue_id: str) -> None:
+        """
+        コミットごとのレビュー結果を、1コミットにつき1件のコメントとして投稿します。
+        同一パッチのレビュー済みのコミットや結果が空のコミットは投稿せず、中止された場合は残りを投稿しません。
+
+        Raises:
+            ReviewCancelledError: 投稿の途中で cancel() された場合。
+        """
+        postable = [commit_review for commit_review in self.commit_reviews if not commit_review.skipped]
+        skipped = len(self.commit_reviews) - len(postable)
+        if not postable:
+            print(f"Backlogへのコメント投稿をスキップしました (投稿するコミットのレビュー結果がありません。スキップ: {skipped} 件)。")
+            return
 
-        return BacklogApiClient(api_key=api_key, backlog_domain=domain)
+        print(f"Backlogにコミットごとのレビュー結果を投稿中... ({len(postable)} 件、スキップ: {skipped} 件)")
+        for commit_review in postable:
+            # 新しいコミットでジョブが置き換えられた場合は、残りのコミットのレビュー結果を投稿しない
+            self._raise_if_cancelled()
+            self.backlog_client.add_issue_comment(issue_id, sanitize_string(commit_review.to_markdown()))
+        print("--- ✅ Backlogにコメントを投稿しました ---")
 
     def execute_review(self):
         """
@@ -41,14 +62,18 @@ class BacklogCodeReviewer(GitCodeReviewer):
 
         try:
             # 1. Backlogクライアントの初期化
-            self.backlog_client = self._setup_backlog_client()
+            self.backlog_client = self.backlog_client or self._setup_backlog_client()
 
             # 2. 汎用レビューの実行
             # 親クラスの execute_review を呼び出し、Git操作とGeminiレビューを実行
             review_result = super().execute_review()
+            # 新しいコミットでジョブが置き換えられた場合は、古いレビュー結果を投稿しない
+            self._raise_if_cancelled()
 
             # 3. 結果のBacklogへの投稿 (Backlog固有)
-            if review_result and review_result.strip():
+            if getattr(self.args, 'comment_per_commit', False) and self.commit_reviews:
+                self._post_commit_reviews(issue_id)
+            elif review_result and review_result.strip():
                 print("Backlogにレビュー結果をコメント投稿中...")
                 sanitized_result = sanitize_string(review_result)
                 self.backlog_client.add_issue_comment(issue_id, sanitized_result)
@@ -58,6 +83,8 @@ class BacklogCodeReviewer(GitCodeReviewer):
 
             return review_result
 
+        except ReviewCancelledError:
+            raise
         except Exception as e:
             print(f"エラーが発生しました: {e}", file=sys.stderr)
             sys.exit(1)
\ No newline at end of file
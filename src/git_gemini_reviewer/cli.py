@@ -1,5 +1,6 @@
 # cli.py
 import argparse
+import contextlib
 import sys
 import os
 from typing import Optional, Union
@@ -7,6 +8,10 @@ from typing import Optional, Union
 # 2つのクラスをインポート
 from .backlog_reviewer import BacklogCodeReviewer
 from .generic_reviewer import GitCodeReviewer
+from .review_worker import ReviewWorker
+from core.review_findings import JsonlWriter
+from core.review_queue import ReviewQueue, job_key_for
+from core.settings import Settings
 
 # --- 定数定義 ---
 DEFAULT_LOCAL_PATH = os.path.join(os.getcwd(), 'var', 'tmp')
@@ -16,17 +21,22 @@ Reviewer = Union[BacklogCodeReviewer, GitCodeReviewer]
 
 def run_reviewer(args: argparse.Namespace, is_backlog_mode: bool):
     """レビュープロセス全体を管理・実行する。"""
-    try:
-        reviewer = _select_reviewer(args, is_backlog_mode)
-        review_result = reviewer.execute_review()
-
-        #  汎用モードの場合にのみ、結果を標準出力する
-        if isinstance(reviewer, GitCodeReviewer) and not is_backlog_mode:
-            _print_review_result(review_result)
+    is_jsonl = getattr(args, 'output_format', 'markdown') == 'jsonl'
+    # JSONL出力時は標準出力を結果専用とし、進捗メッセージは標準エラー出力に回す
+    result_stream = sys.stdout
+    progress = contextlib.redirect_stdout(sys.stderr) if is_jsonl else contextlib.nullcontext()
 
-        # Backlogモード完了時のメッセージを追加
-        if is_backlog_mode:
-            print("✅ Backlogモードの処理が完了しました。")
+    try:
+        with progress:
+            # 設定はここで一度だけ読み込んで検証し、以降はスナップショットを参照する
+            Settings.snapshot()
+            if getattr(args, 'enqueue', False):
+                # Webhookなどからの呼び出しでは、レビューを実行せずにキューへ登録するだけで終了する
+                _enqueue_review(args, is_backlog_mode)
+                sys.exit(0)
+            reviewer = _build_reviewer(args, is_backlog_mode, result_stream)
+            review_result = reviewer.execute_review()
+            _report_result(args, reviewer, review_result, is_backlog_mode)
 
     except ValueError as ve:
         # 引数バリデーションなど、予測可能なエラー
@@ -39,8 +49,73 @@ def run_reviewer(args: argparse.Namespace, is_backlog_mode: bool):
 
     sys.exit(0)
 
+def _build_reviewer(args: argparse.Namespace, is_backlog_mode: bool, result_stream=None) -> Reviewer:
+    """レビュアーを生成し、JSONL出力の場合は結果の書き出し先を設定する。"""
+    reviewer = _select_reviewer(args, is_backlog_mode)
+    if getattr(args, 'output_format', 'markdown') == 'jsonl':
+        reviewer.findings_writer = JsonlWriter(result_stream or sys.stdout)
+    return reviewer
+
+def _report_result(args: argparse.Namespace, reviewer: Reviewer, review_result: Optional[str], is_backlog_mode: bool):
+    """レビュー結果 (またはドライランの見積もり) を表示する。"""
+    is_jsonl = getattr(args, 'output_format', 'markdown') == 'jsonl'
+    if getattr(args, 'dry_run', False):
+        # ドライランでは見積もりのみを表示し、Gemini / Backlog は呼び出さない
+        print("\n--- 🔍 Dry Run: レビューの規模とコストの見積もり ---")
+        print(review_result)
+        print("------------------------------------")
+    #  汎用モードの場合にのみ、結果を標準出力する (JSONLは逐次出力済み)
+    elif isinstance(reviewer, GitCodeReviewer) and not is_backlog_mode and not is_jsonl:
+        _print_review_result(review_result)
+
+    # Backlogモード完了時のメッセージを追加
+    if is_backlog_mode and not getattr(args, 'dry_run', False):
+        print("✅ Backlogモードの処理が完了しました。")
+
+    if getattr(reviewer, 'cassette', None):
+        print(f"📼 カセット: {reviewer.cassette.format_summary()}")
+
+def _open_queue(queue_path: Optional[str] = None) -> ReviewQueue:
+    """設定に従ってレビュージョブのキューを開く。"""
+    path = queue_path or Settings.get('REVIEW_QUEUE_PATH') or str(Settings.snapshot().base_dir / 'var' / 'queue' / 'review_jobs.sqlite3')
+    return ReviewQueue(path, size_penalty_seconds=Settings.get_typed('REVIEW_QUEUE_SIZE_PENALTY_SECONDS', 0.1))
+
+def _absolute_path_args(args: argparse.Namespace):
+    """ワーカーは別のカレントディレクトリで実行されるため、パスを指定する引数を絶対パスに変換する。"""
+    for name in ('repo', 'local_path', 'cassette'):
+        value = getattr(args, name, None)
+        if value:
+            setattr(args, name, os.path.abspath(os.path.expanduser(value)))
+    if getattr(args, 'context_file', None):
+        args.context_file = [os.path.abspath(os.path.expanduser(path)) for path in args.context_file]
+
+def _enqueue_review(args: argparse.Namespace, is_backlog_mode: bool):
+    """レビューをジョブキューに登録する。同じリポジトリ・ブランチの古いジョブは置き換えられる。"""
+    _validate_source_args(args)
+    _absolute_path_args(args)
+    job_args = {key: value for key, value in vars(args).items() if key not in ('enqueue', 'sha', 'diff_size', 'queue_path')}
+    branch = (args.range or args.feature_branch) if args.repo else args.feature_branch
+    queue = _open_queue(args.queue_path)
+    job_id, created = queue.enqueue(
+        job_key=job_key_for(args.repo or args.git_clone_url, branch),
+        mode='backlog' if is_backlog_mode else 'generic',
+        args=job_args,
+        sha=args.sha,
+        diff_size=args.diff_size or 0
+    )
+    if created:
+        print(f"✅ レビュージョブ #{job_id} を登録しました。")
+    else:
+        print(f"ℹ️ 同じコミットのレビュージョブ #{job_id} が登録済みのため、新しいジョブは登録しませんでした。")
+
 def _select_reviewer(args: argparse.Namespace, is_backlog_mode: bool) -> Reviewer:
     """引数に基づいて適切なレビュワークラスのインスタンスを返す。"""
+    _validate_source_args(args)
+
+    if args.dry_run:
+        print("🔍 ドライランモードで実行します (Gemini / Backlog は呼び出しません)。")
+        return GitCodeReviewer(args)
+
     if is_backlog_mode and not args.no_post:
         if not args.issue_id:
             raise ValueError("Backlogへコメント投稿するには `--issue-id` が必須です。\n投稿をスキップする場合は `--no-post` を指定してください。")
@@ -53,6 +128,15 @@ def _select_reviewer(args: argparse.Namespace, is_backlog_mode: bool) -> Reviewe
         print("⚙️ 汎用モードで実行します。")
     return GitCodeReviewer(args)
 
+def _validate_source_args(args: argparse.Namespace):
+    """差分のソース (リモートURLまたはローカルの作業ツリー) に関する引数の組み合わせを検証する。"""
+    if not args.repo and not args.git_clone_url:
+        raise ValueError("`--git-clone-url` または `--repo` のいずれかを指定してください。")
+    if not args.repo and (args.staged or args.working_tree or args.range):
+        raise ValueError("`--staged` / `--working-tree` / `--range` は `--repo` と併せて指定してください。")
+    if args.range is not None and (not args.range or args.range.startswith('-')):
+        raise ValueError(f"`--range` に不正なリビジョン範囲が指定されました: '{args.range}'")
+
 def _print_review_result(result: Optional[str]):
     """レビュー結果を標準出力にフォーマットして表示する。"""
     if result:
@@ -67,12 +151,39 @@ def _print_review_result(result: Optional[str]):
 def _build_common_parser() -> argparse.ArgumentParser:
     """両方のエントリーポイントで共通の引数を定義するパーサーを構築する。"""
     parser = argparse.ArgumentParser()
-    parser.add_argument('-u', '--git-clone-url', required=True, type=str, help='レビュー対象のGitリポジトリURL')
+    parser.add_argument('-u', '--git-clone-url', type=str, default=None, help='レビュー対象のGitリポジトリURL (--repo を指定しない場合は必須)')
+    parser.add_argument('--repo', type=str, default=None, help='クローン/フェッチを行わず、指定したローカルの作業ツリーをレビューします (例: --repo .)')
+    local_mode = parser.add_mutually_exclusive_group()
+    local_mode.add_argument('--staged', action='store_true', help='--repo 指定時に、ステージ済みの変更をレビューします')
+    local_mode.add_argument('--working-tree', action='store_true', help='--repo 指定時に、HEADからの未コミットの変更と未追跡のファイルをレビューします (デフォルト)')
+    local_mode.add_argument('--range', type=str, default=None, help='--repo 指定時に、任意のリビジョン範囲 (例: main..HEAD) をレビューします')
     parser.add_argument('-b', '--base-branch', type=str, default='main', help='差分比較の基準ブランチ (デフォルト: main)')
     parser.add_argument('-f', '--feature-branch', type=str, default='develop', help='レビュー対象のフィーチャーブランチ (デフォルト: develop)')
     parser.add_argument('-p', '--local-path', type=str, default=DEFAULT_LOCAL_PATH, help=f'リポジトリを格納するローカルパス (デフォルト: {DEFAULT_LOCAL_PATH})')
     parser.add_argument('-i', '--issue-id', type=str, default=None, help='関連課題ID (レビュープロンプトやBacklog投稿に使用)')
     parser.add_argument('-g', '--gemini-model-name', type=str, default=DEFAULT_GEMINI_MODEL, help=f'使用するGeminiモデル名 (デフォルト: {DEFAULT_GEMINI_MODEL})')
+    parser.add_argument('--fast-model', type=str, default=None, help='小規模・低リスクな差分に使用する高速モデル名。指定するとモデルの振り分けが有効になり、-g のモデルは大規模・高リスクな差分に使用されます')
+    parser.add_argument('--route-max-fast-lines', type=int, default=200, help='高速モデルに回す差分の最大変更行数 (デフォルト: 200)')
+    parser.add_argument('--escalate', action='store_true', help='高速モデルが指摘事項を検出した場合に、-g のモデルで再レビューします')
+    parser.add_argument('--consensus-models', type=lambda value: [item for item in value.split(',') if item.strip()], default=None, metavar='MODEL[@TEMPERATURE],...', help='-g のモデルと並列にレビューさせる追加のモデル (カンマ区切り、@で temperature を指定可)。重複する指摘をまとめた1つのレビュー結果を出力します')
+    parser.add_argument('--quorum', type=int, default=None, help='--consensus-models 時に、この数のモデルが応答した時点で残りの呼び出しを打ち切ります (デフォルト: すべてのモデル)')
+    parser.add_argument('--consensus-deadline', type=float, default=None, help='--consensus-models 時に応答を待つ最大秒数。期限を過ぎた呼び出しは打ち切ります')
+    parser.add_argument('--context-file', action='append', default=None, help='プロンプトに含めるリポジトリ全体のコンテキスト (コーディング規約など)。複数指定可')
+    parser.add_argument('--by-commit', action='store_true', help='差分をまとめずに、コミットごとに並列でレビューします (マージコミットとレビュー済みのパッチはスキップ)')
+    parser.add_argument('--max-workers', type=int, default=4, help='--by-commit 時に同時に実行するレビューの最大数 (デフォルト: 4)')
+    parser.add_argument('--output-format', choices=['markdown', 'jsonl'], default='markdown', help='レビュー結果の形式。jsonl はファイル・行・重要度つきの指摘事項をJSON Linesで標準出力に逐次出力します (デフォルト: markdown)')
+    parser.add_argument('--dry-run', action='store_true', help='Gemini / Backlog を呼び出さず、差分の規模・推定トークン数・API呼び出し回数・所要時間・コストを表示します')
+    parser.add_argument('--max-tokens', type=int, default=None, help='1回のAPI呼び出しあたりの推定入力トークン数の上限。超えた場合はAPIを呼び出さずにエラー終了します')
+    parser.add_argument('--call-site-budget', type=int, default=0, help='変更された関数の呼び出し箇所をプロンプトに含める際の最大文字数 (デフォルト: 0 = 無効)')
+    parser.add_argument('--git-config', action='append', default=None, metavar='KEY=VALUE', help='すべてのgitコマンドに -c として渡す設定 (例: pack.threads=4, diff.renameLimit=2000)。複数指定可')
+    queue = parser.add_argument_group('ジョブキュー')
+    queue.add_argument('--enqueue', action='store_true', help='レビューを実行せずにジョブキューへ登録します。同じリポジトリ・ブランチの古いジョブは置き換えられます (review-worker で実行)')
+    queue.add_argument('--sha', type=str, default=None, help='--enqueue 時のレビュー対象のコミット。同じコミットのジョブが登録済みであれば登録しません')
+    queue.add_argument('--diff-size', type=int, default=0, help='--enqueue 時の差分の変更行数。小さい差分ほど優先して実行されます')
+    queue.add_argument('--queue-path', type=str, default=None, help='ジョブキューのSQLiteファイル (デフォルト: REVIEW_QUEUE_PATH または ./var/queue/review_jobs.sqlite3)')
+    cassette = parser.add_argument_group('通信の記録・再生')
+    cassette.add_argument('--cassette', type=str, default=None, help='Gemini / Backlog の通信を記録・再生するカセットファイル (JSON Lines) (デフォルト: REVIEW_CASSETTE_PATH)')
+    cassette.add_argument('--cassette-mode', choices=['record', 'playback'], default=None, help='record は実際のAPIを呼び出して通信を記録し、playback はネットワークを使わずに記録から応答します (デフォルト: REVIEW_CASSETTE_MODE または playback)')
     return parser
 
 # --- エントリーポイント ---
@@ -84,6 +195,8 @@ def main():
     # Backlogモード専用の引数を追加
     parser.add_argument('--no-post', action='store_true',
                         help='レビュー結果をBacklogにコメント投稿せず、標準出力します。')
+    parser.add_argument('--comment-per-commit', action='store_true',
+                        help='--by-commit 時に、コミットごとに別々のコメントとして投稿します。')
 
     args = parser.parse_args()
     run_reviewer(args, is_backlog_mode=True)
@@ -93,4 +206,29 @@ def main_generic():
     parser = _build_common_parser()
     parser.description = "Gitリポジトリの差分をGeminiでコードレビューし、結果を標準出力します。"
     args = parser.parse_args()
-    run_reviewer(args, is_backlog_mode=False)
\ No newline at end of file
+    run_reviewer(args, is_backlog_mode=False)
+
+def main_worker():
+    """コマンド: `review-worker` のエントリーポイント (ジョブキューの処理)"""
+    parser = argparse.ArgumentParser(description="--enqueue で登録されたレビュージョブを優先度の順に実行します。")
+    parser.add_argument('--queue-path', type=str, default=None, help='ジョブキューのSQLiteファイル (デフォルト: REVIEW_QUEUE_PATH または ./var/queue/review_jobs.sqlite3)')
+    parser.add_argument('--once', action='store_true', help='待機中のジョブがなくなった時点で終了します')
+    parser.add_argument('--poll-interval', type=float, default=2.0, help='待機中のジョブがない場合の確認間隔 (秒) (デフォルト: 2.0)')
+    parser.add_argument('--stale-after', type=float, default=3600, help='この秒数を超えて実行中のままのジョブは、異常終了したものとして再実行します (デフォルト: 3600)')
+    args = parser.parse_args()
+
+    try:
+        Settings.snapshot()
+        queue = _open_queue(args.queue_path)
+        requeued = queue.requeue_stale(args.stale_after)
+        if requeued:
+            print(f"⚠️ 実行中のまま残っていたジョブ {requeued} 件を再登録しました。")
+        worker = ReviewWorker(queue, reviewer_factory=_build_reviewer, result_handler=_report_result, poll_interval=args.poll_interval)
+        processed = worker.run(once=args.once)
+        print(f"✅ {processed} 件のジョブを処理しました。")
+    except KeyboardInterrupt:
+        print("ワーカーを停止しました。", file=sys.stderr)
+    except Exception as e:
+        print(f"致命的なエラーが発生しました: {e}", file=sys.stderr)
+        sys.exit(1)
+    sys.exit(0)
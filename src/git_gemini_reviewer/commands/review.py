@@ -1,11 +1,12 @@
 import sys
-import subprocess
 from pathlib import Path
 from typing import Optional, Any
 
 from core.backlog_api_client import BacklogApiClient
+from core.diff_sanitizer import DiffSanitizer
 from core.gemini_reviewer import GeminiReviewer
 from core.git_client import GitClient
+from core.repository_manager import RepositoryManager
 from core.settings import Settings
 from core.string_utils import sanitize_string
 
@@ -50,47 +51,13 @@ class CodeReviewer:
         if not api_key or "YOUR_GEMINI_API_KEY" in api_key:
             print("エラー: Gemini APIキーが設定されていません。環境変数またはconfig.pyを確認してください。", file=sys.stderr)
             sys.exit(1)
-        return GeminiReviewer(api_key=api_key, model_name=model_name)
-
-    def _prepare_local_repository(self, git_clone_url: str, local_path_obj: Path) -> Path:
-        """
-        指定されたGitリポジトリURLからローカルにクローンまたは更新します。
-
-        Args:
-            git_clone_url (str): クローンするGitリポジトリのURL。
-            local_path_obj (Path): ローカルパスのPathオブジェクト（親ディレクトリ）。
-
-        Returns:
-            Path: クローンまたは更新されたリポジトリのパス。
-        """
-        # リポジトリ名のサニタイズ（ディレクトリ名として安全に使うため）
-        repo_name = Path(git_clone_url).stem
-        local_repo_path = local_path_obj / repo_name
-
-        print(f"ターゲットリポジトリ: '{git_clone_url}'")
-
-        try:
-            if not local_repo_path.exists():
-                print(f"リポジトリをクローン中: {git_clone_url} -> {local_repo_path}")
-                command = ['git', 'clone', git_clone_url, str(local_repo_path)]
-                subprocess.run(command, check=True, stdout=sys.stdout, stderr=sys.stderr)
-                print("✅ リポジトリのクローンが完了しました。")
-            else:
-                print(f"ローカルリポジトリが既に存在します: {local_repo_path}")
-                print("リモートの最新情報を取得します (git fetch)...")
-                # git -C <path> fetch を実行
-                command = ['git', '-C', str(local_repo_path), 'fetch']
-                subprocess.run(command, check=True, stdout=sys.stdout, stderr=sys.stderr)
-                print("✅ リモートの最新情報の取得が完了しました。")
-
-            return local_repo_path
-
-        except subprocess.CalledProcessError as e:
-            print(f"エラー: Gitコマンドの実行に失敗しました。詳細: {e}", file=sys.stderr)
-            sys.exit(1)
-        except Exception as e:
-            print(f"予期せぬエラーが発生しました: {e}", file=sys.stderr)
-            sys.exit(1)
+        return GeminiReviewer(
+            api_key=api_key,
+            model_name=model_name,
+            prompt_generic_path=Settings.PROMPT_GENERIC_PATH,
+            prompt_backlog_path=Settings.PROMPT_BACKLOG_PATH,
+            diff_sanitizer=DiffSanitizer.from_settings()
+        )
 
     def _process_diff_and_review(self, issue_id: str, base_branch: str, feature_branch: str) -> Optional[str]:
         """
@@ -123,29 +90,25 @@ class CodeReviewer:
             self.backlog_client = self._setup_backlog_client()
             self.gemini_reviewer = self._get_gemini_reviewer(self.args.gemini_model_name)
 
-            # 2. リポジトリのクローン/更新
+            # 2. リポジトリのクローン/オープン (RepositoryManager で一元管理し、フェッチは差分取得時に一度だけ)
             # argsには新しい引数 git_clone_url が含まれていることを想定
-            local_repo_path = self._prepare_local_repository(
-                self.args.git_clone_url,
-                Path(self.args.local_path)
-            )
-
-            # 3. Gitクライアントの初期化
-            git_clone_url = self.args.git_clone_url
-            self.git_client = GitClient(
-                repo_url=git_clone_url,
-                repo_path=str(local_repo_path),
-                ssh_key_path=getattr(self.args, 'ssh_key_path', None)
+            print(f"ターゲットリポジトリ: '{self.args.git_clone_url}'")
+            self.git_client = RepositoryManager.open(
+                repo_url=self.args.git_clone_url,
+                local_path=Path(self.args.local_path),
+                ssh_key_path=getattr(self.args, 'ssh_key_path', None),
+                fetch_max_age=Settings.get_typed('GIT_FETCH_MAX_AGE_SECONDS', 0.0),
+                **RepositoryManager.git_options(getattr(self.args, 'git_config', None))
             )
 
-            # 4. 差分の取得とレビューの実行
+            # 3. 差分の取得とレビューの実行
             review_result = self._process_diff_and_review(
                 self.args.issue_id,
                 self.args.base_branch,
                 self.args.feature_branch
             )
 
-            # 5. 結果のBacklogへの投稿
+            # 4. 結果のBacklogへの投稿
             if review_result:
                 print("Backlogにレビュー結果をコメント投稿中...")
                 sanitized_result = sanitize_string(review_result)
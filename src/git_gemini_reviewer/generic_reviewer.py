@@ -1,12 +1,29 @@
 import sys
-import subprocess
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Any
+from typing import Callable, Dict, Optional, Any, List, Tuple, Union
 
-from core.git_client import GitClient
+from core.background_call import BackgroundCall
+from core.backlog_api_client import BacklogApiClient
+from core.consensus_reviewer import ConsensusReviewer
+from core.commit_review import CommitReview, PatchIdCache, format_commit_report
+from core.diff_sanitizer import DiffSanitizer
+from core.git_client import GitClient, GitClientError
 from core.gemini_reviewer import GeminiReviewer
+from core.issue_context import IssueContext, IssueContextCache
+from core.model_router import ModelRouter
+from core.review_estimator import ChunkEstimate, ReviewEstimate, TokenBudget, diff_file_headers, estimate_tokens
+from core.review_findings import JsonlWriter
+from core.repo_index import RepositoryIndex
+from core.repository_manager import RepositoryManager
+from core.prompt_cache import PromptCacheRegistry, GeminiCacheBackend, LocalStubCacheBackend
 from core.settings import Settings
+from core.traffic_cassette import CassetteError, TrafficCassette
+
+# 実行中の Gemini 呼び出しを待つ間に、cancel() されたかを確認する間隔 (秒)
+_CANCEL_POLL_INTERVAL = 0.2
 
 # --- Custom Exceptions for GitCodeReviewer ---
 # Note: これらはcore.exceptionsファイルに移動することが望ましい
@@ -17,6 +34,14 @@ class GitReviewerError(Exception):
 class ConfigurationError(GitReviewerError):
     """必須の設定が見つからない、または無効な場合に発生。"""
     pass
+
+class TokenBudgetExceededError(GitReviewerError):
+    """プロンプトの推定トークン数が --max-tokens を超えた場合に発生。"""
+    pass
+
+class ReviewCancelledError(GitReviewerError):
+    """cancel() によってレビューが中止された場合に発生 (新しいコミットでジョブが置き換えられた場合など)。"""
+    pass
 # ---------------------------------------------
 
 class GitCodeReviewer:
@@ -31,14 +56,36 @@ class GitCodeReviewer:
         self.args = args
         # local-path は CLI 側でデフォルト値が設定されていることを前提とし、Path オブジェクトに変換
         self.local_path_obj = Path(args.local_path)
-        self.gemini_reviewer: Optional[GeminiReviewer] = None
+        self.gemini_reviewer: Optional[Union[GeminiReviewer, ModelRouter, ConsensusReviewer]] = None
         self.git_client: Optional[GitClient] = None
+        # 'jsonl' の場合は行に紐づいた構造化レビューを行い、指摘事項を逐次書き出す
+        self.output_format: str = getattr(args, 'output_format', None) or 'markdown'
+        self.findings_writer: Optional[JsonlWriter] = None
+        # --by-commit モードで生成されたコミットごとのレビュー結果
+        self.commit_reviews: List[CommitReview] = []
+
+        # --dry-run では Gemini / Backlog を呼び出さず、規模とコストの見積もりのみを行う
+        self.dry_run: bool = getattr(args, 'dry_run', False)
+        self.token_budget = TokenBudget(getattr(args, 'max_tokens', None))
+
+        # --repo が指定された場合はローカルの作業ツリーを差分のソースとする
+        self.local_repo: Optional[str] = getattr(args, 'repo', None)
 
         # issue_id はオプションとして getattr で取得し、Noneを許容
         self.issue_id: Optional[str] = getattr(args, 'issue_id', None)
 
+        # ジョブキューから実行された場合に、古くなったレビューを途中で打ち切るためのフラグ
+        self._cancel_event = threading.Event()
+
+        # プロンプトに含める課題の内容 (差分の取得と並行して取得する)
+        self.backlog_client: Optional[BacklogApiClient] = None
+        self._issue_call: Optional[BackgroundCall] = None
+        self._issue_context_text: Optional[str] = None
+        self._issue_context_lock = threading.Lock()
+
         # 初期化フェーズで依存関係をセットアップ
         try:
+            self.cassette: Optional[TrafficCassette] = self._setup_cassette()
             self._setup_gemini_reviewer()
             self._setup_git_client()
         except (ConfigurationError, GitReviewerError) as e:
@@ -46,110 +93,519 @@ class GitCodeReviewer:
             print(f"初期化中にエラーが発生しました: {e}", file=sys.stderr)
             sys.exit(1)
 
+    def cancel(self) -> None:
+        """
+        実行中のレビューを中止します。実行中のgitコマンドは終了され、実行中のGemini呼び出しは応答を待たずに打ち切られます。
+        以降のGemini呼び出しと結果の投稿は行われません。
+        別スレッドから呼び出すことを想定しています。
+        """
+        self._cancel_event.set()
+        if self.git_client:
+            self.git_client.cancel()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def _raise_if_cancelled(self) -> None:
+        if self._cancel_event.is_set():
+            raise ReviewCancelledError("レビューは中止されました。")
+
+    def _call_cancellable(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Gemini の呼び出しをデーモンスレッドで実行し、完了するか cancel() されるまで待ちます。
+        中止された場合は応答を待たずに ReviewCancelledError を送出し、実行中の呼び出しの結果と出力は破棄されます。
+        """
+        self._raise_if_cancelled()
+        call = BackgroundCall(fn, *args, name="gemini-call", **kwargs).start()
+        while not call.wait(_CANCEL_POLL_INTERVAL):
+            if self.cancelled:
+                call.abandon()
+                self._raise_if_cancelled()
+        return call.result()
+
+    def _setup_cassette(self) -> Optional[TrafficCassette]:
+        """--cassette または REVIEW_CASSETTE_PATH が指定されている場合に、通信の記録・再生用のカセットを開きます。"""
+        if self.dry_run:
+            return None
+        try:
+            cassette = TrafficCassette.from_settings(getattr(self.args, 'cassette', None), getattr(self.args, 'cassette_mode', None))
+        except CassetteError as e:
+            raise ConfigurationError(str(e)) from e
+        if cassette:
+            label = "再生" if cassette.is_playback else "記録"
+            print(f"--- 📼 Gemini / Backlog の通信を{label}します ({cassette.path}) ---")
+        return cassette
+
+    def _create_backlog_client(self) -> Optional[BacklogApiClient]:
+        """Backlog APIクライアントを生成します。認証情報が設定されていない場合はNone。"""
+        api_key = Settings.get('BACKLOG_API_KEY')
+        domain = Settings.get('BACKLOG_DOMAIN')
+
+        if self.cassette and self.cassette.is_playback:
+            # 再生時はBacklogに接続しないため、認証情報が未設定でも仮の値で初期化する
+            return BacklogApiClient(api_key=api_key or "playback", backlog_domain=domain or "playback.invalid",
+                                    cassette=self.cassette)
+
+        if not api_key or not domain or "YOUR_API_KEY" in api_key or "your-space.backlog.jp" in domain:
+            return None
+        return BacklogApiClient(api_key=api_key, backlog_domain=domain, cassette=self.cassette)
+
+    def _start_prefetch(self) -> None:
+        """
+        差分の取得 (フェッチ) と並行して、プロンプトに含める課題の内容の取得を開始します。
+        Backlog の認証情報がない場合は取得しません。ドライランでは Backlog に問い合わせず、キャッシュのみを参照します。
+        """
+        if not self.issue_id or self._issue_call is not None or Settings.get_typed('ISSUE_CONTEXT_MAX_CHARS', 2000) <= 0:
+            return
+        if self.dry_run:
+            client, domain = None, Settings.get('BACKLOG_DOMAIN')
+        else:
+            client = self.backlog_client or self._create_backlog_client()
+            domain = client.backlog_domain if client else None
+        if not domain:
+            return
+
+        cache_path = Settings.get('BACKLOG_ISSUE_CACHE_PATH') or str(Settings.snapshot().base_dir / 'var' / 'cache' / 'backlog_issues.json')
+        cache = IssueContextCache(
+            Path(cache_path),
+            domain,
+            client,
+            ttl_seconds=Settings.get_typed('BACKLOG_ISSUE_CACHE_TTL_SECONDS', 600)
+        )
+        self._issue_call = BackgroundCall(cache.get, self.issue_id, name="issue-prefetch").start()
+
+    def _issue_context(self, issue_key: str) -> Optional[str]:
+        """先行して取得した課題の内容を、予算 (ISSUE_CONTEXT_MAX_CHARS) 内に整形して返します。"""
+        if self._issue_call is None or issue_key != self.issue_id:
+            return None
+        with self._issue_context_lock:
+            if self._issue_context_text is None:
+                self._issue_context_text = self._resolve_issue_context(issue_key)
+            return self._issue_context_text or None
+
+    def _resolve_issue_context(self, issue_key: str) -> str:
+        timeout = Settings.get_typed('ISSUE_PREFETCH_TIMEOUT_SECONDS', 15.0)
+        if not self._issue_call.wait(timeout):
+            self._issue_call.abandon()
+            print(f"--- ⚠️ 注意: 課題 {issue_key} の取得が {timeout:g} 秒以内に完了しませんでした。課題キーのみでレビューします ---", file=sys.stderr)
+            return ""
+        try:
+            context: Optional[IssueContext] = self._issue_call.result()
+        except Exception as e:
+            print(f"--- ⚠️ 注意: 課題 {issue_key} の内容を取得できませんでした。課題キーのみでレビューします: {e} ---", file=sys.stderr)
+            return ""
+        if context is None:
+            if self.dry_run:
+                print(f"--- ℹ️ 課題 {issue_key} の内容はキャッシュにないため、見積もりに含めません ---", file=sys.stderr)
+            else:
+                print(f"--- ⚠️ 注意: 課題 {issue_key} の内容を取得できませんでした。課題キーのみでレビューします ---", file=sys.stderr)
+            return ""
+        text = context.format(Settings.get_typed('ISSUE_CONTEXT_MAX_CHARS', 2000))
+        print(f"--- ✅ 課題 {context.issue_key} の内容をプロンプトに追加しました ({len(text)} 文字) ---")
+        return text
 
     def _setup_gemini_reviewer(self):
         """GeminiReviewerを環境変数から初期化します。"""
         # settings インスタンスから直接属性として値を取得する
         api_key = Settings.get('GEMINI_API_KEY')
         if not api_key or "YOUR_GEMINI_API_KEY" in api_key:
-            raise ConfigurationError("Gemini APIキーが設定されていません。")
+            if not self.dry_run and not (self.cassette and self.cassette.is_playback):
+                raise ConfigurationError("Gemini APIキーが設定されていません。")
+            # ドライランとカセットの再生ではAPIを呼び出さないため、APIキーは不要
+            api_key = None
 
         # Settingsクラスからプロンプトのパスを取得
         prompt_generic_path = Settings.PROMPT_GENERIC_PATH
         prompt_backlog_path = Settings.PROMPT_BACKLOG_PATH
 
-        self.gemini_reviewer = GeminiReviewer(
-            api_key=api_key,
-            model_name=self.args.gemini_model_name,
-            prompt_generic_path=prompt_generic_path,
-            prompt_backlog_path=prompt_backlog_path
-        )
+        repository_context = self._load_repository_context()
+        prompt_cache = None if self.dry_run else self._setup_prompt_cache()
+        diff_sanitizer = DiffSanitizer.from_settings()
 
-    def _prepare_local_repository(self) -> Path:
-        """
-        指定されたGitリポジトリURLからローカルにクローンまたは更新します。（汎用フロー）
-        """
-        git_clone_url = self.args.git_clone_url
+        def create_reviewer(model_name: str, temperature: Optional[float] = None) -> GeminiReviewer:
+            return GeminiReviewer(
+                api_key=api_key,
+                model_name=model_name,
+                temperature=temperature,
+                prompt_generic_path=prompt_generic_path,
+                prompt_backlog_path=prompt_backlog_path,
+                repository_context=repository_context,
+                prompt_cache=prompt_cache,
+                prompt_structured_path=Settings.PROMPT_STRUCTURED_PATH,
+                diff_sanitizer=diff_sanitizer,
+                cassette=self.cassette,
+                issue_context_provider=self._issue_context
+            )
+
+        slow_reviewer = create_reviewer(self.args.gemini_model_name)
+        consensus_models = getattr(self.args, 'consensus_models', None)
+        if consensus_models:
+            # --consensus-models 指定時は、-g のモデルと合わせて並列にレビューし、結果をまとめる
+            reviewers = [slow_reviewer] + [create_reviewer(*self._parse_model_spec(spec)) for spec in consensus_models]
+            try:
+                slow_reviewer = ConsensusReviewer(
+                    reviewers,
+                    quorum=getattr(self.args, 'quorum', None),
+                    deadline_seconds=getattr(self.args, 'consensus_deadline', None),
+                    call_timeout_seconds=Settings.get_typed('CONSENSUS_CALL_TIMEOUT_SECONDS', 600.0)
+                )
+            except ValueError as e:
+                raise ConfigurationError(str(e)) from e
+
+        fast_model_name = getattr(self.args, 'fast_model', None)
+        if not fast_model_name:
+            self.gemini_reviewer = slow_reviewer
+            return
 
-        # URLからリポジトリ名（ディレクトリ名）を抽出
-        repo_name = Path(git_clone_url).stem
+        # --fast-model 指定時は、差分の規模とリスクに応じてモデルを振り分けるルーターを前段に置く
+        self.gemini_reviewer = ModelRouter(
+            fast_reviewer=create_reviewer(fast_model_name),
+            slow_reviewer=slow_reviewer,
+            max_fast_lines=self.args.route_max_fast_lines,
+            escalate=self.args.escalate,
+            low_risk_patterns=Settings.get_list('ROUTER_LOW_RISK_PATTERNS'),
+            high_risk_patterns=Settings.get_list('ROUTER_HIGH_RISK_PATTERNS')
+        )
+
+    @staticmethod
+    def _parse_model_spec(spec: str) -> Tuple[str, Optional[float]]:
+        """'モデル名' または 'モデル名@temperature' 形式の指定を (モデル名, temperature) に分割します。"""
+        model_name, _, temperature = spec.strip().partition('@')
+        if not temperature:
+            return model_name, None
+        try:
+            return model_name, float(temperature)
+        except ValueError as e:
+            raise ConfigurationError(f"temperature が数値ではありません: {spec}") from e
 
-        # 1. ローカルパス（親ディレクトリ）が存在しない場合は作成
-        if not self.local_path_obj.exists():
+    def _load_repository_context(self) -> Optional[str]:
+        """--context-file で指定されたリポジトリ全体のコンテキスト（コーディング規約や設計メモ）を読み込みます。"""
+        context_files = getattr(self.args, 'context_file', None) or []
+        contexts = []
+        for context_file in context_files:
             try:
-                # 存在しない場合は作成 (mkdir -p 相当)
-                self.local_path_obj.mkdir(parents=True, exist_ok=True)
-                print(f"✅ ローカルパスを作成しました: {self.local_path_obj}")
+                contexts.append(Path(context_file).read_text(encoding="utf-8"))
             except OSError as e:
-                # パス作成エラーをカスタム例外でラップ
-                raise GitReviewerError(f"ローカルパスの作成に失敗しました ({self.local_path_obj}): {e}") from e
+                raise ConfigurationError(f"コンテキストファイルを読み込めません ({context_file}): {e}") from e
+        return "\n\n".join(contexts) if contexts else None
 
-        local_repo_path = self.local_path_obj / repo_name
+    def _setup_prompt_cache(self) -> Optional[PromptCacheRegistry]:
+        """静的プレフィックス用のコンテキストキャッシュを設定から初期化します。"""
+        if not Settings.get_typed('GEMINI_CACHE_ENABLED', True):
+            return None
 
-        print(f"ターゲットリポジトリ: '{git_clone_url}'")
+        # カセットの再生中はネットワークを使わないよう、キャッシュもスタブで再現する
+        use_stub = Settings.get('GEMINI_CACHE_BACKEND') == 'stub' or (self.cassette and self.cassette.is_playback)
+        backend = LocalStubCacheBackend() if use_stub else GeminiCacheBackend()
+        registry_path = Settings.get('GEMINI_CACHE_REGISTRY_PATH') or str(Settings.snapshot().base_dir / 'var' / 'cache' / 'gemini_prompt_cache.json')
+        try:
+            return PromptCacheRegistry(
+                registry_path=Path(registry_path),
+                backend=backend,
+                ttl_seconds=Settings.get_typed('GEMINI_CACHE_TTL_SECONDS', 3600),
+                min_chars=Settings.get_typed('GEMINI_CACHE_MIN_CHARS', 16000)
+            )
+        except ValueError as e:
+            raise ConfigurationError(f"コンテキストキャッシュの設定値が不正です: {e}") from e
 
+    def _setup_git_client(self):
+        """RepositoryManager を通じてリポジトリを準備し、GitClientを取得します。"""
         try:
-            if not local_repo_path.exists():
-                print(f"リポジトリをクローン中: {git_clone_url} -> {local_repo_path}")
-                command = ['git', 'clone', git_clone_url, str(local_repo_path)]
-                subprocess.run(command, check=True, stdout=sys.stdout, stderr=sys.stderr)
-                print("✅ クローンが完了しました。")
-            else:
-                print(f"ローカルリポジトリが既に存在します: {local_repo_path}")
-                print("リモートの最新情報を取得します (git fetch)...")
-                command = ['git', '-C', str(local_repo_path), 'fetch', '--all']
-                subprocess.run(command, check=True, stdout=sys.stdout, stderr=sys.stderr)
-                print("✅ リモート情報の取得が完了しました。")
+            git_options = RepositoryManager.git_options(getattr(self.args, 'git_config', None))
+            if self.local_repo:
+                # --repo 指定時は手元の作業ツリーをそのまま使い、クローンやフェッチは行わない
+                self.git_client = RepositoryManager.open_local(self.local_repo, **git_options)
+                return
 
-            return local_repo_path # <--- インデントが修正されたことを確認
+            # クローン/オープンは RepositoryManager がプロセス内で一度だけ行い、フェッチも差分取得時に一度だけ実行される
+            self.git_client = RepositoryManager.open(
+                repo_url=self.args.git_clone_url,
+                local_path=self.local_path_obj,
+                ssh_key_path=getattr(self.args, 'ssh_key_path', None),
+                fetch_max_age=Settings.get_typed('GIT_FETCH_MAX_AGE_SECONDS', 0.0),
+                **git_options
+            )
+        except GitClientError as e:
+            raise GitReviewerError(str(e)) from e
+        except ValueError as e:
+            raise ConfigurationError(f"Gitの設定値が不正です: {e}") from e
 
-        except subprocess.CalledProcessError as e:
-            raise GitReviewerError(f"Gitコマンドの実行に失敗しました。詳細: {e}") from e
-        except Exception as e:
-            raise GitReviewerError(f"予期せぬエラーが発生しました: {e}") from e
+    def _get_diff(self) -> str:
+        """引数で指定された差分のソース (リモートのブランチ間、またはローカルの作業ツリー) から差分を取得します。"""
+        if not self.local_repo:
+            return self.git_client.get_diff(base_branch=self.args.base_branch, feature_branch=self.args.feature_branch)
+        if getattr(self.args, 'staged', False):
+            return self.git_client.get_staged_diff()
+        if getattr(self.args, 'range', None):
+            return self.git_client.get_range_diff(self.args.range)
+        return self.git_client.get_working_tree_diff()
 
-    def _setup_git_client(self):
-        """リポジトリの準備とGitClientの初期化を結合します。"""
-        git_clone_url = self.args.git_clone_url
-        repo_name = Path(git_clone_url).stem
-        local_repo_path = self.local_path_obj / repo_name
-        self.git_client = GitClient(
-            repo_url=git_clone_url,
-            repo_path=str(local_repo_path),
-            ssh_key_path=getattr(self.args, 'ssh_key_path', None)
-        )
+    def _commit_range(self) -> Tuple[str, str]:
+        """--by-commit でコミットを列挙する範囲 (base, feature) を返します。"""
+        if not self.local_repo:
+            return self.args.base_branch, self.args.feature_branch
+        rev_range = getattr(self.args, 'range', None)
+        if not rev_range or '..' not in rev_range:
+            raise GitReviewerError("--repo と --by-commit を併用する場合は --range rev1..rev2 を指定してください。")
+        base, _, feature = rev_range.replace('...', '..').partition('..')
+        return base or 'HEAD', feature or 'HEAD'
 
+    def _review_target_rev(self) -> str:
+        """レビュー対象の変更後のリビジョン (シンボルインデックスの構築に使用) を返します。"""
+        if not self.local_repo:
+            return f"origin/{self.args.feature_branch}"
+        rev_range = getattr(self.args, 'range', None)
+        if rev_range and '..' in rev_range:
+            return rev_range.rpartition('..')[2].lstrip('.') or 'HEAD'
+        return 'HEAD'
 
     def _process_diff_and_review(self) -> Optional[str]:
         """Gitの差分を取得し、Geminiにレビューさせます。（引数を内部属性に依存）"""
         if not self.git_client or not self.gemini_reviewer:
             raise RuntimeError("GitClientまたはGeminiReviewerが初期化されていません。")
 
-        base_branch = self.args.base_branch
-        feature_branch = self.args.feature_branch
-
-        diff = self.git_client.get_diff(base_branch=base_branch, feature_branch=feature_branch)
+        diff = self._get_diff()
 
         if diff is None or not diff.strip():
             print("差分がありませんでした。レビューをスキップします。")
             return None
 
+        related_context = self._collect_related_context(diff)
+        # フィルタリングとサニタイズは一度だけ行い、トークン数の確認とレビューの両方で同じ差分を使用する
+        prepared_diff = self.gemini_reviewer.prepare_diff(diff)
+        self._check_token_budget(prepared_diff, related_context)
+        self._raise_if_cancelled()
+
         print("Geminiによるコードレビューを実行中...")
 
-        # issue_id は None の場合もそのまま渡す（GeminiReviewer側で対応済み）
-        result = self.gemini_reviewer.review_code(
-            code_diff=diff,
-            issue_key=self.issue_id
-        )
+        result = self._review_diff(prepared_diff, extra_context=related_context)
+        self._raise_if_cancelled()
         print("✅ コードレビューが完了しました。")
         return result
 
+    def _review_diff(self, diff: str, extra_context: Optional[str] = None, commit: Optional[str] = None) -> Optional[str]:
+        """
+        prepare_diff() 済みの差分を出力形式に応じてレビューし、Markdown形式の結果を返します。
+        構造化出力の場合は、指摘事項を findings_writer に逐次書き出します。
+        """
+        if self.output_format != 'jsonl':
+            # issue_id は None の場合もそのまま渡す（GeminiReviewer側で対応済み）
+            return self._call_cancellable(
+                self.gemini_reviewer.review_code, code_diff=diff, issue_key=self.issue_id, extra_context=extra_context,
+                prepared=True
+            )
+
+        structured = self._call_cancellable(
+            self.gemini_reviewer.review_code_structured,
+            code_diff=diff,
+            issue_key=self.issue_id,
+            extra_context=extra_context,
+            prepared=True
+        )
+        if structured is None:
+            return ""
+        if self.findings_writer:
+            self.findings_writer.write_review(structured, commit=commit)
+        return structured.to_markdown()
+
+    def _collect_commits(self) -> Tuple[List[CommitReview], List[Tuple[CommitReview, str, Optional[str]]], PatchIdCache]:
+        """
+        base..feature のコミットを列挙し、(全コミットの結果, レビュー対象の (結果, 差分, patch-id), patch-idキャッシュ) を返します。
+        マージコミットと、patch-id が一致するレビュー済みのコミットはレビュー対象から除外します。
+        """
+        base_branch, feature_branch = self._commit_range()
+        commits = self.git_client.list_commits(base_branch, feature_branch)
+
+        patch_id_cache = PatchIdCache(self.git_client.git_dir / 'gemini-reviewer-patch-ids.json')
+        reviews: List[CommitReview] = []
+        pending: List[Tuple[CommitReview, str, Optional[str]]] = []
+        seen_patch_ids = {}
+
+        for commit, subject in commits:
+            review = CommitReview(commit=commit, subject=subject)
+            reviews.append(review)
+            diff = self.git_client.get_commit_diff(commit)
+            if not diff.strip():
+                continue
+
+            patch_id = self.git_client.get_patch_id(diff)
+            duplicate_of = (patch_id_cache.get(patch_id) or seen_patch_ids.get(patch_id)) if patch_id else None
+            if duplicate_of:
+                review.duplicate_of = duplicate_of
+                continue
+            if patch_id:
+                seen_patch_ids[patch_id] = commit
+            pending.append((review, diff, patch_id))
+
+        return reviews, pending, patch_id_cache
+
+    def _process_commits_and_review(self) -> Optional[str]:
+        """
+        base..feature のコミットを1件ずつ並列にレビューし、コミット別のレポートを返します。
+        マージコミットと、patch-id が一致するレビュー済みのコミットはスキップします。
+        """
+        if not self.git_client or not self.gemini_reviewer:
+            raise RuntimeError("GitClientまたはGeminiReviewerが初期化されていません。")
+
+        reviews, pending, patch_id_cache = self._collect_commits()
+        if not reviews:
+            print("レビュー対象のコミットがありませんでした。レビューをスキップします。")
+            return None
+
+        # API呼び出しの前にすべてのコミットの差分をサニタイズしてトークン数を確認し、上限超過時は即座に失敗させる
+        pending = [(review, self.gemini_reviewer.prepare_diff(diff), patch_id) for review, diff, patch_id in pending]
+        for review, diff, _ in pending:
+            self._check_token_budget(diff, label=f"コミット {review.short_sha}")
+
+        print(f"コミット単位でレビューを実行中... (対象: {len(pending)} 件 / 全 {len(reviews)} 件)")
+
+        def review_commit(item: Tuple[CommitReview, str, Optional[str]]):
+            review, diff, patch_id = item
+            if self.cancelled:
+                return
+            try:
+                review.review = self._review_diff(diff, commit=review.commit)
+                if patch_id:
+                    patch_id_cache.put(patch_id, review.commit)
+            except Exception as e:
+                # 1コミットの失敗でレポート全体を失わないよう、エラーとして記録する
+                review.error = str(e)
+
+        with ThreadPoolExecutor(max_workers=self._max_workers()) as executor:
+            # override() による上書き (ワーカーのジョブごとの設定など) をスレッドにも引き継ぐ
+            list(executor.map(Settings.bind(review_commit), pending))
+        self._raise_if_cancelled()
+
+        self.commit_reviews = reviews
+        print("✅ コミット単位のコードレビューが完了しました。")
+        return format_commit_report(reviews)
+
+    def _max_workers(self) -> int:
+        return max(1, getattr(self.args, 'max_workers', 4) or 1)
+
+    def _reviewer_for(self, diff: str) -> Union[GeminiReviewer, ConsensusReviewer]:
+        """差分のレビューに使用されるレビュアーを返します（モデル振り分けを考慮）。"""
+        if isinstance(self.gemini_reviewer, ModelRouter):
+            return self.gemini_reviewer.reviewer_for(diff)
+        return self.gemini_reviewer
+
+    def _render_prompt(self, diff: str, extra_context: Optional[str] = None) -> Optional[str]:
+        """prepare_diff() 済みの差分から、送信されるプロンプトを組み立てます。"""
+        return self._reviewer_for(diff).render_prompt(
+            diff, issue_key=self.issue_id, extra_context=extra_context, structured=self.output_format == 'jsonl',
+            prepared=True
+        )
+
+    def _check_token_budget(self, diff: str, extra_context: Optional[str] = None, label: str = "差分") -> None:
+        """
+        prepare_diff() 済みの差分のプロンプトの推定トークン数が --max-tokens を超えていれば TokenBudgetExceededError を送出します。
+        """
+        if self.token_budget.max_tokens is None:
+            return
+        prompt = self._render_prompt(diff, extra_context)
+        tokens = self.token_budget.exceeded(prompt) if prompt else None
+        if tokens is not None:
+            raise TokenBudgetExceededError(
+                f"{label} のプロンプトが約 {tokens:,} トークンあり、上限 (--max-tokens {self.token_budget.max_tokens:,}) を超えています。"
+            )
+
+    def _estimate_review(self) -> ReviewEstimate:
+        """
+        Gemini / Backlog を呼び出さずに差分の取得・フィルタリング・プロンプトの組み立てを行い、規模とコストを見積もります。
+        """
+        units: List[Tuple[str, str, Optional[str]]] = []
+        if getattr(self.args, 'by_commit', False):
+            _, pending, _ = self._collect_commits()
+            units = [(f"コミット {review.short_sha}", diff, None) for review, diff, _ in pending]
+        else:
+            diff = self._get_diff()
+            if diff and diff.strip():
+                units = [("差分全体", diff, self._collect_related_context(diff))]
+
+        headers = set()
+        fan_out = 1
+        estimate = ReviewEstimate(
+            file_count=0,
+            diff_bytes=0,
+            concurrency=self._max_workers() if getattr(self.args, 'by_commit', False) else 1,
+            output_tokens_per_call=Settings.get_typed('GEMINI_OUTPUT_TOKENS_PER_REVIEW', 1500),
+            input_cost_per_mtok=Settings.get_typed('GEMINI_INPUT_COST_PER_MTOK', 0.10),
+            output_cost_per_mtok=Settings.get_typed('GEMINI_OUTPUT_COST_PER_MTOK', 0.40),
+            output_tokens_per_second=Settings.get_typed('GEMINI_OUTPUT_TOKENS_PER_SECOND', 150.0),
+        )
+        for label, diff, extra_context in units:
+            headers |= diff_file_headers(diff)
+            estimate.diff_bytes += len(diff.encode('utf-8'))
+            prepared_diff = self.gemini_reviewer.prepare_diff(diff)
+            sanitize_report = self.gemini_reviewer.last_sanitize_report
+            if sanitize_report:
+                estimate.sanitized_bytes += sanitize_report.bytes_removed
+            prompt = self._render_prompt(prepared_diff, extra_context)
+            if prompt is None:
+                continue  # 拡張子フィルタリングによりAPI呼び出しが発生しない
+            reviewer = self._reviewer_for(prepared_diff)
+            # 合議レビューでは、同じプロンプトがすべてのモデルに並列に送信される
+            members = reviewer.reviewers if isinstance(reviewer, ConsensusReviewer) else [reviewer]
+            fan_out = max(fan_out, len(members))
+            for member in members:
+                estimate.chunks.append(ChunkEstimate(label, member.model_name, estimate_tokens(prompt)))
+        estimate.concurrency *= fan_out
+        estimate.file_count = len(headers)
+        return estimate
+
+    def _collect_related_context(self, diff: str) -> Optional[str]:
+        """
+        リポジトリのシンボルインデックスを更新し、差分で変更された関数・クラスの呼び出し箇所を抽出します。
+        --call-site-budget が0の場合は何もしません。
+        """
+        budget = getattr(self.args, 'call_site_budget', 0) or 0
+        if budget <= 0:
+            return None
+
+        try:
+            index = RepositoryIndex(self.git_client)
+            # --dry-run ではリポジトリ内のインデックスファイルを書き換えない
+            index.update(self._review_target_rev(), save=not self.dry_run)
+            uncommitted = self._uncommitted_contents()
+            if uncommitted:
+                index.overlay(uncommitted)
+            related_context = index.build_context(diff, budget_chars=budget)
+        except Exception as e:
+            # 呼び出し箇所は補助情報のため、取得に失敗してもレビューは継続する
+            print(f"--- ⚠️ 注意: 呼び出し箇所の抽出に失敗しました: {e} ---", file=sys.stderr)
+            return None
+
+        if related_context:
+            print(f"--- ✅ 関連する呼び出し箇所を追加しました ({len(related_context)} 文字) ---")
+        return related_context
+
+    def _uncommitted_contents(self) -> Optional[Dict[str, Optional[bytes]]]:
+        """
+        作業ツリー・ステージ済みの変更をレビューする場合に、変更されたファイルの現在の内容を返します。
+        インデックスはHEADから構築されるため、未コミットの追加・リネームされたシンボルをこの内容で補います。
+        """
+        if not self.local_repo or getattr(self.args, 'range', None):
+            return None
+        if getattr(self.args, 'staged', False):
+            paths = self.git_client.list_uncommitted_files(staged=True)
+            # ステージ済みの内容は `:path` (リビジョンを省略した指定) で読み込む。存在しないパスは削除されたファイル
+            staged = self.git_client.read_files('', paths)
+            return {path: staged.get(path) for path in paths}
+        return self.git_client.read_working_tree_files(self.git_client.list_uncommitted_files())
+
     def execute_review(self) -> Optional[str]:
         """
         コードレビューのメイン処理を実行し、結果の文字列を返します。
         """
         try:
             # すべてのクライアントは __init__ でセットアップ済み
+            # 課題の内容は、差分の取得 (フェッチ) と並行して取得する
+            self._start_prefetch()
+            if self.dry_run:
+                return self._estimate_review().format_report()
+            if getattr(self.args, 'by_commit', False):
+                return self._process_commits_and_review()
             review_result = self._process_diff_and_review()
             return review_result
 
@@ -0,0 +1,128 @@
+import argparse
+import contextlib
+import sys
+import threading
+import time
+import traceback
+from typing import Callable, Optional, TextIO
+
+from core.repository_manager import RepositoryManager
+from core.review_queue import ReviewJob, ReviewQueue, STATUS_DONE, STATUS_FAILED, STATUS_SUPERSEDED
+from core.settings import Settings
+from .generic_reviewer import GitCodeReviewer
+
+ReviewerFactory = Callable[[argparse.Namespace, bool, Optional[TextIO]], GitCodeReviewer]
+ResultHandler = Callable[[argparse.Namespace, GitCodeReviewer, Optional[str], bool], None]
+
+
+class _JobState:
+    """ジョブ実行スレッドと監視側で共有する状態。"""
+
+    def __init__(self):
+        self.reviewer: Optional[GitCodeReviewer] = None
+        self.cancelled = threading.Event()
+        self.error: Optional[str] = None
+        self.lock = threading.Lock()
+
+    def attach(self, reviewer: GitCodeReviewer) -> None:
+        with self.lock:
+            self.reviewer = reviewer
+            if self.cancelled.is_set():
+                reviewer.cancel()
+
+    def cancel(self) -> None:
+        with self.lock:
+            self.cancelled.set()
+            if self.reviewer:
+                self.reviewer.cancel()
+
+
+class ReviewWorker:
+    """
+    ReviewQueue からジョブを取り出してレビューを実行するワーカー。
+    実行中のジョブが新しいコミットのジョブに置き換えられた場合は、レビューを中止して結果を投稿しません。
+    """
+
+    def __init__(self, queue: ReviewQueue, reviewer_factory: ReviewerFactory,
+                 result_handler: Optional[ResultHandler] = None,
+                 poll_interval: float = 2.0, cancel_check_interval: float = 1.0):
+        """
+        Args:
+            queue (ReviewQueue): ジョブキュー。
+            reviewer_factory (ReviewerFactory): (引数, Backlogモードか, JSONLの書き出し先) からレビュアーを生成する関数。
+            result_handler (Optional[ResultHandler]): レビュー完了時に結果を受け取る関数。
+            poll_interval (float): 待機中のジョブがない場合に次に確認するまでの秒数。
+            cancel_check_interval (float): 実行中のジョブが置き換えられたかを確認する間隔 (秒)。
+        """
+        self.queue = queue
+        self.reviewer_factory = reviewer_factory
+        self.result_handler = result_handler
+        self.poll_interval = poll_interval
+        self.cancel_check_interval = cancel_check_interval
+
+    def run(self, once: bool = False) -> int:
+        """
+        ジョブを順に処理します。
+
+        Args:
+            once (bool): Trueの場合、待機中のジョブがなくなった時点で終了します。
+
+        Returns:
+            int: 処理したジョブの数。
+        """
+        processed = 0
+        while True:
+            job = self.queue.claim()
+            if job is None:
+                if once:
+                    return processed
+                time.sleep(self.poll_interval)
+                continue
+            self.process(job)
+            processed += 1
+
+    def process(self, job: ReviewJob) -> str:
+        """1件のジョブを実行し、終了時の状態を返します。"""
+        state = _JobState()
+        # JSONL出力のジョブでは、CLIと同様に標準出力を結果専用とし、進捗メッセージは標準エラー出力に回す
+        result_stream = sys.stdout
+        is_jsonl = job.args.get('output_format') == 'jsonl'
+        with contextlib.redirect_stdout(sys.stderr) if is_jsonl else contextlib.nullcontext():
+            print(f"--- 🔁 ジョブ #{job.id} を開始します ({job.job_key}, sha={job.sha or '-'}, 差分 {job.diff_size} 行) ---")
+            thread = threading.Thread(target=self._run_job, args=(job, state, result_stream), daemon=True)
+            thread.start()
+            while thread.is_alive():
+                thread.join(self.cancel_check_interval)
+                if thread.is_alive() and not state.cancelled.is_set() and self.queue.is_superseded(job.id):
+                    print(f"--- ⏭️ ジョブ #{job.id} は新しいコミットのジョブに置き換えられたため中止します ---")
+                    state.cancel()
+
+            if state.cancelled.is_set() or self.queue.is_superseded(job.id):
+                status = STATUS_SUPERSEDED
+            elif state.error:
+                status = STATUS_FAILED
+                print(f"--- ❌ ジョブ #{job.id} が失敗しました: {state.error} ---", file=sys.stderr)
+            else:
+                status = STATUS_DONE
+                print(f"--- ✅ ジョブ #{job.id} が完了しました ---")
+        self.queue.finish(job.id, status, error=state.error if status == STATUS_FAILED else None)
+        return status
+
+    def _run_job(self, job: ReviewJob, state: _JobState, result_stream: TextIO) -> None:
+        args = argparse.Namespace(**job.args)
+        is_backlog_mode = job.mode == 'backlog'
+        try:
+            # 共有されている GitClient を破棄し、ジョブごとに必ず最新のリモートを取得する
+            RepositoryManager.clear()
+            with Settings.override({'GIT_FETCH_MAX_AGE_SECONDS': None}):
+                reviewer = self.reviewer_factory(args, is_backlog_mode, result_stream)
+                state.attach(reviewer)
+                result = reviewer.execute_review()
+                if self.result_handler and not reviewer.cancelled:
+                    self.result_handler(args, reviewer, result, is_backlog_mode)
+        except SystemExit as e:
+            # レビュアーは致命的なエラーで sys.exit() するため、ワーカーは止めずにジョブの失敗として記録する
+            state.error = f"レビューが終了コード {e.code} で終了しました。"
+        except Exception as e:
+            state.error = str(e) or traceback.format_exc(limit=1)
+
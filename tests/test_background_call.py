@@ -0,0 +1,35 @@
+import threading
+
+import pytest
+
+from core.background_call import BackgroundCall, print_status
+from core.settings import Settings
+
+
+def test_result_carries_override_and_errors():
+    with Settings.override({'GIT_FETCH_MAX_AGE_SECONDS': '7'}):
+        call = BackgroundCall(Settings.get_typed, 'GIT_FETCH_MAX_AGE_SECONDS').start()
+    assert call.result() == 7.0
+
+    failing = BackgroundCall(int, 'x').start()
+    with pytest.raises(ValueError):
+        failing.result()
+
+
+def test_abandoned_call_does_not_print(capsys):
+    release = threading.Event()
+
+    def slow():
+        release.wait(5)
+        print_status("late")
+        # 入れ子の呼び出しも、外側が打ち切られていれば出力しない
+        BackgroundCall(print_status, "nested late").start().result()
+        return "ignored"
+
+    call = BackgroundCall(slow).start()
+    assert not call.wait(0.05)
+    call.abandon()
+    release.set()
+    assert call.result() == "ignored"
+    print_status("caller")
+    assert capsys.readouterr().out == "caller\n"
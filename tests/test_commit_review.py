@@ -0,0 +1,99 @@
+import json
+import threading
+
+import pytest
+
+from core.commit_review import CommitReview, PatchIdCache, format_commit_report
+from git_gemini_reviewer.backlog_reviewer import BacklogCodeReviewer
+from git_gemini_reviewer.generic_reviewer import ReviewCancelledError
+
+
+def test_patch_id_cache_persists_across_instances(tmp_path):
+    cache_path = tmp_path / "cache" / "patch_ids.json"
+    PatchIdCache(cache_path).put("p1", "a" * 40)
+
+    cache = PatchIdCache(cache_path)
+    assert cache.get("p1") == "a" * 40
+    assert cache.get("p2") is None
+    assert json.loads(cache_path.read_text(encoding="utf-8"))["p1"]["commit"] == "a" * 40
+
+
+def test_patch_id_cache_ignores_unreadable_file(tmp_path):
+    cache_path = tmp_path / "patch_ids.json"
+    cache_path.write_text("not json", encoding="utf-8")
+    cache = PatchIdCache(cache_path)
+
+    assert cache.get("p1") is None
+    cache.put("p1", "b" * 40)
+    assert PatchIdCache(cache_path).get("p1") == "b" * 40
+
+
+def test_format_commit_report_lists_each_commit():
+    report = format_commit_report([
+        CommitReview("1" * 40, "first", review="looks good"),
+        CommitReview("2" * 40, "second", duplicate_of="3" * 40),
+        CommitReview("4" * 40, "third", error="timeout"),
+        CommitReview("5" * 40, "fourth"),
+    ])
+
+    assert report.startswith("## コミット別レビュー (4 件)")
+    assert "### コミット `11111111`: first\n\nlooks good" in report
+    assert "(`33333333`) はレビュー済み" in report
+    assert ":warning: レビューに失敗しました: timeout" in report
+    assert "レビュー対象の差分がありませんでした。" in report
+
+
+@pytest.mark.parametrize("review, expected", [
+    (CommitReview("1" * 40, "s", review="ok"), False),
+    (CommitReview("1" * 40, "s", review="ok", duplicate_of="2" * 40), True),
+    (CommitReview("1" * 40, "s", review="  \n"), True),
+    (CommitReview("1" * 40, "s"), True),
+    (CommitReview("1" * 40, "s", error="timeout"), False),
+])
+def test_commit_review_skipped(review, expected):
+    assert review.skipped is expected
+
+
+class _BacklogClient:
+    def __init__(self, on_post=None):
+        self.comments = []
+        self.on_post = on_post
+
+    def add_issue_comment(self, issue_id, content):
+        self.comments.append((issue_id, content))
+        if self.on_post:
+            self.on_post()
+
+
+def _reviewer(commit_reviews, client):
+    reviewer = BacklogCodeReviewer.__new__(BacklogCodeReviewer)
+    reviewer._cancel_event = threading.Event()
+    reviewer.git_client = None
+    reviewer.commit_reviews = commit_reviews
+    reviewer.backlog_client = client
+    return reviewer
+
+
+def test_comment_per_commit_skips_duplicates_and_empty_reviews():
+    client = _BacklogClient()
+    reviewer = _reviewer([
+        CommitReview("1" * 40, "first", review="ok"),
+        CommitReview("2" * 40, "dup", review="ok", duplicate_of="1" * 40),
+        CommitReview("3" * 40, "empty", review=""),
+        CommitReview("4" * 40, "failed", error="timeout"),
+    ], client)
+
+    reviewer._post_commit_reviews("P-1")
+
+    assert [content.splitlines()[0] for _, content in client.comments] == [
+        "### コミット `11111111`: first", "### コミット `44444444`: failed",
+    ]
+
+
+def test_comment_per_commit_stops_when_cancelled():
+    reviewer = _reviewer([CommitReview(str(i) * 40, f"c{i}", review="ok") for i in range(1, 4)], None)
+    reviewer.backlog_client = _BacklogClient(on_post=reviewer.cancel)
+
+    with pytest.raises(ReviewCancelledError):
+        reviewer._post_commit_reviews("P-1")
+    assert len(reviewer.backlog_client.comments) == 1
@@ -0,0 +1,136 @@
+import threading
+import time
+
+import pytest
+
+from core.consensus_reviewer import (OUTCOME_ABANDONED, OUTCOME_ERROR, OUTCOME_OK, ConsensusReviewer,
+                                     merge_markdown_reviews, merge_structured_reviews)
+from core.gemini_reviewer import GeminiReviewerError
+from core.review_findings import validate_review
+
+
+def _review(*items, path="app.py", summary="**総評:** 要修正"):
+    return f"{summary}\n\n#### ファイル名: {path}\n" + "".join(f"- {item}\n" for item in items)
+
+
+class _Reviewer:
+    def __init__(self, label, text="", block=None, error=None):
+        self.label = label
+        self.text = text
+        self.block = block
+        self.error = error
+        self.timeouts = []
+        self.last_usage = {'output_tokens': 10}
+        self.last_sanitize_report = None
+
+    def prepare_diff(self, code_diff):
+        return code_diff
+
+    def review_code(self, code_diff, issue_key=None, extra_context=None, prepared=False, timeout=None):
+        self.timeouts.append(timeout)
+        if self.block is not None:
+            self.block.wait(5)
+        if self.error:
+            raise GeminiReviewerError(self.error)
+        return self.text
+
+
+@pytest.fixture
+def release():
+    event = threading.Event()
+    yield event
+    event.set()  # 打ち切った呼び出しのスレッドを終了させる
+
+
+def test_quorum_returns_without_waiting_for_remaining_calls(release):
+    reviewers = [_Reviewer("a", _review("**3行目**: None チェックがありません。")),
+                 _Reviewer("b", _review("**3行目**: None のチェックがありません。")),
+                 _Reviewer("c", _review("x"), block=release)]
+    consensus = ConsensusReviewer(reviewers, quorum=2, call_timeout_seconds=30)
+
+    started = time.monotonic()
+    merged = consensus.review_code("diff")
+
+    assert time.monotonic() - started < 2
+    assert "_(2/2 モデルが指摘)_" in merged
+    assert "2 モデル (a, b)" in merged
+    assert [o.status for o in consensus.last_outcomes] == [OUTCOME_OK, OUTCOME_OK, OUTCOME_ABANDONED]
+    assert consensus.last_usage == {'output_tokens': 20}
+    # 期限がなくても、すべての呼び出しにタイムアウトを渡す
+    assert [reviewer.timeouts for reviewer in reviewers] == [[30], [30], [30]]
+
+
+def test_deadline_merges_responses_received_in_time(release, capsys):
+    reviewers = [_Reviewer("a", block=release), _Reviewer("b", _review("**5行目**: 例外を握りつぶしています。"))]
+    consensus = ConsensusReviewer(reviewers, deadline_seconds=0.3, call_timeout_seconds=30)
+
+    merged = consensus.review_code("diff")
+
+    assert "例外を握りつぶしています" in merged
+    assert [o.status for o in consensus.last_outcomes] == [OUTCOME_ABANDONED, OUTCOME_OK]
+    assert 0 < reviewers[1].timeouts[0] <= 0.3
+    assert "定足数 (2) に満たない 1 モデル" in capsys.readouterr().out
+
+
+def test_errors_are_recorded_and_no_result_raises(release):
+    reviewers = [_Reviewer("a", error="quota"), _Reviewer("b", _review("**1行目**: typo"))]
+    consensus = ConsensusReviewer(reviewers)
+    assert "typo" in consensus.review_code("diff")
+    assert [o.status for o in consensus.last_outcomes] == [OUTCOME_ERROR, OUTCOME_OK]
+
+    failing = ConsensusReviewer([_Reviewer("a", error="quota"), _Reviewer("b", block=release)], deadline_seconds=0.1)
+    with pytest.raises(GeminiReviewerError, match="a: quota; b: 期限切れ"):
+        failing.review_code("diff")
+
+
+@pytest.mark.parametrize("kwargs", [dict(quorum=3), dict(quorum=-1), dict(call_timeout_seconds=0)])
+def test_invalid_arguments(kwargs):
+    with pytest.raises(ValueError):
+        ConsensusReviewer([_Reviewer("a"), _Reviewer("b")], **kwargs)
+
+
+def test_merge_markdown_reviews_deduplicates_similar_items():
+    merged, duplicates = merge_markdown_reviews([
+        ("a", _review("**10行目**: ユーザー入力を検証せずにSQLに埋め込んでいます。", "**40行目**: 変数名が不明瞭です。")),
+        ("b", _review("**11行目**: ユーザー入力を検証せずに SQL に埋め込んでいます。", summary="**総評:** 別の総評")),
+        ("c", _review("✅ 問題は見つかりませんでした。")),
+    ])
+
+    assert duplicates == 1
+    assert merged.startswith("**総評:** 要修正")
+    assert merged.count("埋め込んでいます") == 1
+    assert "**10行目**: ユーザー入力を検証せずにSQLに埋め込んでいます。 _(2/3 モデルが指摘)_" in merged
+    assert "変数名が不明瞭です" in merged
+    # 他のモデルが指摘しているファイルでは「問題なし」を表示しない
+    assert "問題は見つかりませんでした" not in merged
+
+
+def test_merge_markdown_reviews_keeps_distant_lines_and_other_files():
+    merged, duplicates = merge_markdown_reviews([
+        ("a", _review("**10行目**: 例外を握りつぶしています。")),
+        ("b", _review("**30行目**: 例外を握りつぶしています。")),
+        ("c", _review("✅ 問題は見つかりませんでした。", path="docs.md")),
+    ])
+    assert duplicates == 0
+    assert merged.count("例外を握りつぶしています") == 2
+    assert "#### ファイル名: docs.md\n- ✅ 問題は見つかりませんでした。" in merged
+
+
+def test_merge_markdown_reviews_single_or_empty():
+    assert merge_markdown_reviews([("a", ""), ("b", "  ")]) == ("", 0)
+    assert merge_markdown_reviews([("a", "text"), ("b", "")]) == ("text", 0)
+
+
+def test_merge_structured_reviews_keeps_highest_severity():
+    def review(severity, line, message):
+        return validate_review({"summary": severity, "findings": [
+            {"file": "app.py", "line": line, "severity": severity, "message": message}]})
+
+    merged, duplicates = merge_structured_reviews([
+        ("a", review("minor", 10, "SQL injection via user input")),
+        ("b", review("critical", 11, "SQL injection via user input!")),
+        ("c", None),
+    ])
+    assert duplicates == 1
+    assert merged.summary == "minor"
+    assert [(f.line, f.severity) for f in merged.findings] == [(11, "critical")]
@@ -0,0 +1,75 @@
+import os
+import subprocess
+import time
+
+import pytest
+
+from core.git_client import GitCancelledError, GitClientError, LocalGitClient
+
+
+def _git(repo, *args):
+    subprocess.run(['git', *args], cwd=repo, check=True, capture_output=True)
+
+
+@pytest.fixture
+def client(tmp_path):
+    _git(tmp_path, 'init', '-q')
+    _git(tmp_path, 'config', 'user.email', 'test@example.com')
+    _git(tmp_path, 'config', 'user.name', 'test')
+    (tmp_path / 'with space.txt').write_text("hello\n")
+    (tmp_path / 'a.py').write_text("x = 1\n")
+    _git(tmp_path, 'add', '.')
+    _git(tmp_path, 'commit', '-q', '-m', 'init')
+    return LocalGitClient(str(tmp_path))
+
+
+def test_read_files_skips_missing_paths_with_spaces(client):
+    contents = client.read_files('HEAD', ['no such file.txt', 'with space.txt', 'a.py'])
+    assert contents == {'with space.txt': b"hello\n", 'a.py': b"x = 1\n"}
+
+
+def test_cancelled_client_does_not_start_commands(client):
+    client.cancel()
+    with pytest.raises(GitCancelledError):
+        client.read_files('HEAD', ['a.py'])
+    client.reset_cancellation()
+    assert client.read_files('HEAD', ['a.py']) == {'a.py': b"x = 1\n"}
+
+
+def test_progress_timeout_kills_process_and_joins_readers(client):
+    process = subprocess.Popen(['sh', '-c', 'echo start >&2; sleep 30'], stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, start_new_session=(os.name == 'posix'))
+    started = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        client._communicate_with_progress(process, 'fetch', timeout=0.2)
+    assert time.monotonic() - started < 5
+    assert process.returncode is not None
+
+
+def test_working_tree_diff_includes_untracked_files(client):
+    repo = client.repo_path
+    (repo / 'a.py').write_text("x = 2\n")
+    (repo / 'new file.py').write_text("def added():\n    pass\n")
+    (repo / '.gitignore').write_text("ignored.log\n")
+    (repo / 'ignored.log').write_text("noise\n")
+
+    diff = client.get_working_tree_diff()
+
+    assert "+x = 2" in diff
+    assert "+++ b/new file.py" in diff and "+def added():" in diff
+    assert "+++ b/.gitignore" in diff
+    assert "ignored.log\n+noise" not in diff and "b/ignored.log" not in diff
+    assert set(client.list_uncommitted_files()) == {'a.py', 'new file.py', '.gitignore'}
+    assert client.list_uncommitted_files(staged=True) == []
+
+
+@pytest.mark.parametrize("rev_range", ["--output=/tmp/x", "-p", ""])
+def test_range_diff_rejects_option_like_ranges(client, rev_range):
+    with pytest.raises(GitClientError):
+        client.get_range_diff(rev_range)
+
+
+def test_range_diff_does_not_treat_range_as_path(client):
+    (client.repo_path / 'a.py').write_text("x = 3\n")
+    _git(client.repo_path, 'commit', '-q', '-am', 'second')
+    assert "+x = 3" in client.get_range_diff('HEAD~1..HEAD')
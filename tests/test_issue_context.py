@@ -0,0 +1,62 @@
+import json
+import sys
+import types
+
+# requests が未インストールの環境でも読み込めるようにする (このテストでは通信しない)
+sys.modules.setdefault("requests", types.ModuleType("requests"))
+
+from core.issue_context import IssueContextCache  # noqa: E402
+
+ISSUE = {"issueKey": "P-1", "summary": "ログイン画面の改善", "description": "説明", "status": {"name": "処理中"},
+         "updated": "2026-01-01"}
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = []
+
+    def get_issue(self, issue_key, etag=None):
+        self.calls.append((issue_key, etag))
+        return ISSUE, '"v1"'
+
+
+def test_old_schema_entry_is_refetched_and_other_entries_kept(tmp_path):
+    cache_path = tmp_path / "issues.json"
+    cache_path.write_text(json.dumps({"dom/P-1": {"issue_key": "P-1", "summary": "s"}, "other": 1}))
+    client = FakeClient()
+
+    context = IssueContextCache(cache_path, "dom", client, ttl_seconds=60).get("P-1")
+
+    assert context.summary == "ログイン画面の改善"
+    assert client.calls == [("P-1", None)]
+    entries = json.loads(cache_path.read_text(encoding="utf-8"))
+    assert entries["other"] == 1 and entries["dom/P-1"]["etag"] == '"v1"'
+    assert [p.name for p in tmp_path.iterdir()] == ["issues.json"]
+
+
+def test_put_keeps_entries_written_by_another_process(tmp_path):
+    cache_path = tmp_path / "issues.json"
+    cache = IssueContextCache(cache_path, "dom", FakeClient(), ttl_seconds=60)
+    # 別プロセスが先に書き込んだ課題
+    other = IssueContextCache(cache_path, "dom", FakeClient(), ttl_seconds=60)
+    other.get("P-2")
+
+    cache.get("P-1")
+
+    assert set(json.loads(cache_path.read_text(encoding="utf-8"))) == {"dom/P-1", "dom/P-2"}
+
+
+def test_without_client_only_cache_is_used(tmp_path):
+    cache_path = tmp_path / "issues.json"
+    IssueContextCache(cache_path, "dom", FakeClient(), ttl_seconds=60).get("P-1")
+
+    offline = IssueContextCache(cache_path, "dom", None, ttl_seconds=0)
+
+    assert offline.get("P-1").summary == "ログイン画面の改善"
+    assert offline.get("P-9") is None
+
+
+def test_non_dict_cache_file_is_ignored(tmp_path):
+    cache_path = tmp_path / "issues.json"
+    cache_path.write_text("[1, 2]")
+    assert IssueContextCache(cache_path, "dom", None).get("P-1") is None
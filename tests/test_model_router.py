@@ -0,0 +1,87 @@
+import pytest
+
+from core.model_router import ModelRouter
+from core.review_findings import validate_review
+
+FINDINGS_TEXT = "**総評:** 要修正\n\n#### ファイル名: app.py\n- **3行目**: None チェックがありません。\n"
+CLEAN_TEXT = "**総評:** 問題ありません\n\n#### ファイル名: app.py\n- ✅ 問題は見つかりませんでした。\n"
+
+
+def _diff(path, added=1, removed=0):
+    lines = [f"diff --git a/{path} b/{path}", f"--- a/{path}", f"+++ b/{path}", f"@@ -1,{removed} +1,{added} @@"]
+    lines += ["-old"] * removed + ["+new"] * added
+    return "\n".join(lines) + "\n"
+
+
+class _Reviewer:
+    def __init__(self, name, text=CLEAN_TEXT, findings=()):
+        self.model_name = name
+        self.text = text
+        self.findings = list(findings)
+        self.last_usage = None
+        self.calls = []
+
+    def review_code(self, code_diff, issue_key=None, extra_context=None, prepared=False):
+        self.calls.append('text')
+        return self.text
+
+    def review_code_structured(self, code_diff, issue_key=None, extra_context=None, prepared=False):
+        self.calls.append('structured')
+        return validate_review({"summary": "s", "findings": self.findings})
+
+
+def test_classify_counts_changed_lines_inside_hunks():
+    # ハンク内の '--- ' で始まる削除行はファイルヘッダーではなく変更行として数える
+    diff = "diff --git a/q.sql b/q.sql\n--- a/q.sql\n+++ b/q.sql\n@@ -1,2 +1,1 @@\n--- comment\n-x\n+y\n"
+    decision = ModelRouter(_Reviewer('fast'), _Reviewer('slow')).classify(diff)
+    assert decision.files == ['q.sql']
+    assert decision.changed_lines == 3
+
+
+@pytest.mark.parametrize("diff, tier", [
+    (_diff('app.py', added=10), 'fast'),
+    (_diff('app.py', added=300), 'slow'),
+    (_diff('docs/guide.md', added=300), 'fast'),
+    (_diff('src/auth/login.py', added=1), 'slow'),
+    (_diff('tests/test_app.py') + _diff('src/auth.py'), 'slow'),
+])
+def test_classify_selects_tier(diff, tier):
+    assert ModelRouter(_Reviewer('fast'), _Reviewer('slow'), max_fast_lines=200).classify(diff).tier == tier
+
+
+def test_slow_tier_uses_slow_reviewer_only():
+    fast, slow = _Reviewer('fast'), _Reviewer('slow', text="slow review")
+    assert ModelRouter(fast, slow, escalate=True).review_code(_diff('auth.py')) == "slow review"
+    assert fast.calls == [] and slow.calls == ['text']
+
+
+def test_text_review_keeps_configured_prompt_without_findings():
+    fast, slow = _Reviewer('fast', text=CLEAN_TEXT), _Reviewer('slow')
+    assert ModelRouter(fast, slow, escalate=True).review_code(_diff('app.py')) == CLEAN_TEXT
+    assert fast.calls == ['text'] and slow.calls == []
+
+
+def test_text_review_escalates_on_findings():
+    fast, slow = _Reviewer('fast', text=FINDINGS_TEXT), _Reviewer('slow', text="slow review")
+    assert ModelRouter(fast, slow, escalate=True).review_code(_diff('app.py')) == "slow review"
+    assert fast.calls == ['text'] and slow.calls == ['text']
+
+
+def test_findings_are_not_escalated_without_flag():
+    fast, slow = _Reviewer('fast', text=FINDINGS_TEXT), _Reviewer('slow')
+    assert ModelRouter(fast, slow).review_code(_diff('app.py')) == FINDINGS_TEXT
+    assert slow.calls == []
+
+
+def test_structured_review_escalates_on_findings():
+    finding = {"file": "app.py", "line": 1, "severity": "major", "message": "bug"}
+    fast, slow = _Reviewer('fast', findings=[finding]), _Reviewer('slow')
+    review = ModelRouter(fast, slow, escalate=True).review_code_structured(_diff('app.py'))
+    assert review.findings == []
+    assert fast.calls == ['structured'] and slow.calls == ['structured']
+
+
+def test_has_findings_ignores_ok_markers():
+    assert ModelRouter.has_findings(FINDINGS_TEXT)
+    assert not ModelRouter.has_findings(CLEAN_TEXT)
+    assert not ModelRouter.has_findings(None)
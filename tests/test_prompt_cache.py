@@ -0,0 +1,156 @@
+import json
+
+import pytest
+
+from core.prompt_cache import PromptCacheRegistry, LocalStubCacheBackend
+
+
+class _BaseModel:
+    def __init__(self):
+        self.prompts = []
+
+    def generate_content(self, contents, **kwargs):
+        self.prompts.append(contents)
+        return contents
+
+
+class _PersistentBackend(LocalStubCacheBackend):
+    """レジストリファイルへの記録を確認するため、永続的なバックエンドとして振る舞うスタブ。"""
+    persistent = True
+
+
+class _FailingBackend(_PersistentBackend):
+    def create(self, model_name, content, ttl_seconds):
+        raise RuntimeError("quota exceeded")
+
+
+PREFIX = "x" * 100
+
+
+@pytest.fixture
+def registry_path(tmp_path):
+    return tmp_path / "registry.json"
+
+
+def test_short_prefix_is_not_cached(registry_path):
+    backend = LocalStubCacheBackend()
+    registry = PromptCacheRegistry(registry_path, backend=backend, min_chars=1000)
+    assert registry.get_model("m", PREFIX, _BaseModel()) is None
+    assert backend.create_count == 0
+
+
+def test_create_and_reuse(registry_path):
+    backend = LocalStubCacheBackend()
+    registry = PromptCacheRegistry(registry_path, backend=backend, min_chars=10)
+    base = _BaseModel()
+
+    first = registry.get_model("m", PREFIX, base)
+    second = registry.get_model("m", PREFIX, base)
+
+    assert first is second
+    assert backend.create_count == 1
+    first.generate_content("diff")
+    assert base.prompts == [PREFIX + "diff"]
+
+
+def test_stub_backend_does_not_persist_handles(registry_path):
+    registry = PromptCacheRegistry(registry_path, backend=LocalStubCacheBackend(), min_chars=10)
+    assert registry.get_model("m", PREFIX, _BaseModel()) is not None
+    assert not registry_path.exists()
+
+    # 別プロセスに相当する新しいレジストリでも、失効したスタブのハンドルを参照しない
+    backend = LocalStubCacheBackend()
+    other = PromptCacheRegistry(registry_path, backend=backend, min_chars=10)
+    assert other.get_model("m", PREFIX, _BaseModel()) is not None
+    assert backend.create_count == 1
+
+
+def test_persistent_backend_reuses_registry_across_instances(registry_path):
+    backend = _PersistentBackend()
+    PromptCacheRegistry(registry_path, backend=backend, min_chars=10).get_model("m", PREFIX, _BaseModel())
+    PromptCacheRegistry(registry_path, backend=backend, min_chars=10).get_model("m", PREFIX, _BaseModel())
+
+    assert backend.create_count == 1
+    assert len(json.loads(registry_path.read_text(encoding="utf-8"))) == 1
+
+
+def test_entry_close_to_expiry_is_refreshed(registry_path):
+    backend = LocalStubCacheBackend()
+    registry = PromptCacheRegistry(registry_path, backend=backend, min_chars=10,
+                                   ttl_seconds=3600, refresh_margin_seconds=4000)
+    registry.get_model("m", PREFIX, _BaseModel())
+    registry.get_model("m", PREFIX, _BaseModel())
+
+    assert backend.create_count == 1
+    assert backend.refresh_count == 1
+
+
+def test_expired_entry_is_recreated(registry_path):
+    backend = LocalStubCacheBackend()
+    registry = PromptCacheRegistry(registry_path, backend=backend, min_chars=10)
+    registry.get_model("m", PREFIX, _BaseModel())
+    for entry in registry._load().values():
+        entry["expires_at"] = 0
+
+    registry.get_model("m", PREFIX, _BaseModel())
+    assert backend.create_count == 2
+
+
+def test_failed_refresh_falls_back_to_create(registry_path):
+    backend = LocalStubCacheBackend()
+    registry = PromptCacheRegistry(registry_path, backend=backend, min_chars=10, refresh_margin_seconds=4000)
+    registry.get_model("m", PREFIX, _BaseModel())
+    backend.contents.clear()  # サーバー側でキャッシュが失効した状態
+
+    assert registry.get_model("m", PREFIX, _BaseModel()) is not None
+    assert backend.create_count == 2
+
+
+def test_backend_error_falls_back_and_removes_stale_handle(registry_path):
+    registry_path.write_text(json.dumps({
+        PromptCacheRegistry.content_key("m", PREFIX): {"name": "cachedContents/gone", "model": "m", "expires_at": 0}
+    }), encoding="utf-8")
+    registry = PromptCacheRegistry(registry_path, backend=_FailingBackend(), min_chars=10)
+
+    assert registry.get_model("m", PREFIX, _BaseModel()) is None
+    assert json.loads(registry_path.read_text(encoding="utf-8")) == {}
+
+
+def test_save_merges_handles_written_by_another_process(registry_path):
+    backend = _PersistentBackend()
+    first = PromptCacheRegistry(registry_path, backend=backend, min_chars=10)
+    second = PromptCacheRegistry(registry_path, backend=backend, min_chars=10)
+    # 両方のプロセスがレジストリを読み込んだ後に、それぞれ別のプレフィックスを登録する
+    first._load()
+    second._load()
+
+    first.get_model("m", PREFIX, _BaseModel())
+    second.get_model("m", "y" * 100, _BaseModel())
+
+    assert set(json.loads(registry_path.read_text(encoding="utf-8"))) == {
+        PromptCacheRegistry.content_key("m", PREFIX), PromptCacheRegistry.content_key("m", "y" * 100),
+    }
+    assert [p.name for p in registry_path.parent.iterdir() if p.name.endswith(".tmp")] == []
+
+
+def test_handle_created_by_another_process_is_reused(registry_path):
+    backend = _PersistentBackend()
+    late = PromptCacheRegistry(registry_path, backend=backend, min_chars=10)
+    late._load()  # 他のプロセスが作成する前に読み込んだ状態
+    PromptCacheRegistry(registry_path, backend=backend, min_chars=10).get_model("m", PREFIX, _BaseModel())
+
+    assert late.get_model("m", PREFIX, _BaseModel()) is not None
+    assert backend.create_count == 1
+
+
+def test_models_are_keyed_by_generation_config(registry_path):
+    backend = LocalStubCacheBackend()
+    registry = PromptCacheRegistry(registry_path, backend=backend, min_chars=10)
+
+    default = registry.get_model("m", PREFIX, _BaseModel())
+    warm = registry.get_model("m", PREFIX, _BaseModel(), {"temperature": 0.7})
+
+    assert warm is not default
+    assert warm.generation_config == {"temperature": 0.7}
+    assert registry.get_model("m", PREFIX, _BaseModel(), {"temperature": 0.7}) is warm
+    assert backend.create_count == 1
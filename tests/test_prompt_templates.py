@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+from core.prompt_templates import PromptTemplate, PromptTemplateCache
+
+
+def test_compile_splits_at_code_diff_placeholder():
+    template = PromptTemplate.compile("review:\n{code_diff}\nend")
+    assert (template.head, template.tail, template.has_placeholder) == ("review:\n", "\nend", True)
+    assert not PromptTemplate.compile("no placeholder").has_placeholder
+    assert PromptTemplate.compile("x{code_diff}").with_preamble("ctx\n").head == "ctx\nx"
+
+
+def test_cache_reuses_unchanged_file(tmp_path):
+    path = tmp_path / "generic.md"
+    path.write_text("v1 {code_diff}", encoding="utf-8")
+    cache = PromptTemplateCache()
+    assert cache.load(path) is cache.load(path)
+
+
+def test_cache_reloads_when_size_changes_with_same_mtime(tmp_path):
+    path = tmp_path / "generic.md"
+    path.write_text("v1 {code_diff}", encoding="utf-8")
+    cache = PromptTemplateCache()
+    stat = path.stat()
+    cache.load(path)
+
+    path.write_text("version 2 {code_diff}", encoding="utf-8")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert cache.load(path).head == "version 2 "
+
+
+def test_cache_reloads_when_mtime_changes_with_same_size(tmp_path):
+    path = tmp_path / "generic.md"
+    path.write_text("v1 {code_diff}", encoding="utf-8")
+    cache = PromptTemplateCache()
+    stat = path.stat()
+    cache.load(path)
+
+    path.write_text("v2 {code_diff}", encoding="utf-8")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert cache.load(path).head == "v2 "
+
+
+def test_load_optional_and_clear(tmp_path):
+    cache = PromptTemplateCache()
+    assert cache.load_optional(None) is None
+    assert cache.load_optional(tmp_path / "missing.md") is None
+    with pytest.raises(FileNotFoundError):
+        cache.load(tmp_path / "missing.md")
+
+    path = tmp_path / "structured.md"
+    path.write_text("{code_diff}", encoding="utf-8")
+    first = cache.load(path)
+    cache.clear()
+    assert cache.load(path) is not first
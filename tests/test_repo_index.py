@@ -0,0 +1,65 @@
+import subprocess
+
+import pytest
+
+from core.git_client import LocalGitClient
+from core.repo_index import RepositoryIndex
+
+
+def _git(repo, *args):
+    subprocess.run(['git', *args], cwd=repo, check=True, capture_output=True)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    _git(tmp_path, 'init', '-q')
+    _git(tmp_path, 'config', 'user.email', 'test@example.com')
+    _git(tmp_path, 'config', 'user.name', 'test')
+    (tmp_path / 'a.py').write_text("def foo():\n    pass\n")
+    (tmp_path / 'b.py').write_text("from a import foo\nfoo()\n")
+    _git(tmp_path, 'add', '.')
+    _git(tmp_path, 'commit', '-q', '-m', 'init')
+    return tmp_path
+
+
+def test_overlay_indexes_uncommitted_symbols(repo):
+    (repo / 'a.py').write_text("def foo():\n    pass\n\ndef bar():\n    return 1\n")
+    (repo / 'b.py').write_text("from a import foo\nfoo()\nbar()\n")
+    client = LocalGitClient(str(repo))
+    diff = client.get_working_tree_diff()
+
+    index = RepositoryIndex(client)
+    index.update('HEAD', save=False)
+    assert 'bar' not in index.changed_symbols(diff)
+
+    index.overlay(client.read_working_tree_files(client.list_uncommitted_files()))
+    assert 'bar' in index.changed_symbols(diff)
+    assert ('b.py', 3, 'bar()') in index.find_references('bar')
+
+
+def test_update_without_save_leaves_no_index_file(repo):
+    client = LocalGitClient(str(repo))
+    index = RepositoryIndex(client)
+    index.update('HEAD', save=False)
+    assert not index.index_path.exists()
+
+    index.update('HEAD~0', save=True)
+    assert not index.index_path.exists()  # 同じコミットでは再構築も保存もしない
+
+    RepositoryIndex(client).update('HEAD')
+    assert index.index_path.exists()
+
+
+def test_changed_symbols_ignores_header_like_lines_inside_hunks(repo):
+    index = RepositoryIndex(LocalGitClient(str(repo)))
+    index.files = {
+        'a.py': {'definitions': [['foo', 1]], 'references': []},
+        'b.py': {'definitions': [['baz', 10]], 'references': []},
+    }
+    # 追加行 '++ x' と削除行 '-- y' はハンク内の行であり、ファイルヘッダーではない
+    diff = (
+        "diff --git a/a.py b/a.py\n--- a/a.py\n+++ b/a.py\n"
+        "@@ -1,2 +1,2 @@\n def foo():\n--- y\n+++ x\n"
+        "@@ -10 +10 @@\n-old\n+new\n"
+    )
+    assert index.changed_symbols(diff) == ['foo']
@@ -0,0 +1,27 @@
+import subprocess
+
+import pytest
+
+from core.repository_manager import RepositoryManager
+
+
+@pytest.fixture
+def origin(tmp_path):
+    repo = tmp_path / 'origin'
+    repo.mkdir()
+    for args in (['init', '-q'], ['config', 'user.email', 'test@example.com'], ['config', 'user.name', 'test'],
+                 ['commit', '-q', '--allow-empty', '-m', 'init']):
+        subprocess.run(['git', *args], cwd=repo, check=True, capture_output=True)
+    yield repo
+    RepositoryManager.clear()
+
+
+def test_open_applies_new_options_to_cached_client(origin, tmp_path):
+    first = RepositoryManager.open(str(origin), tmp_path / 'work', fetch_max_age=0, timeouts={'fetch': 10})
+    second = RepositoryManager.open(str(origin), tmp_path / 'work', fetch_max_age=300,
+                                    timeouts={'diff': 5}, git_config={'diff.renameLimit': '10'})
+    assert second is first
+    assert second.fetch_max_age == 300
+    assert second.timeouts['diff'] == 5
+    assert second.timeouts['fetch'] != 10
+    assert second.git_config == {'diff.renameLimit': '10'}
@@ -0,0 +1,64 @@
+import pytest
+
+from core.review_estimator import ChunkEstimate, ReviewEstimate, TokenBudget, diff_file_headers, estimate_tokens
+
+
+def test_estimate_tokens_counts_ascii_and_non_ascii():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+    assert estimate_tokens("日本語") == 3
+    assert estimate_tokens("abcd日本") == 3
+
+
+def test_diff_file_headers_deduplicates_files():
+    diff = (
+        "diff --git a/a.py b/a.py\n--- a/a.py\n+++ b/a.py\n@@ -1 +1 @@\n-x\n+y\n"
+        "diff --git a/b.py b/b.py\n--- a/b.py\n+++ b/b.py\n@@ -1 +1 @@\n-x\n+y\n"
+    )
+    assert diff_file_headers(diff + diff) == {"diff --git a/a.py b/a.py", "diff --git a/b.py b/b.py"}
+
+
+def _estimate(**overrides):
+    values = dict(
+        file_count=2, diff_bytes=1000,
+        chunks=[ChunkEstimate("c1", "m", 1_000_000), ChunkEstimate("c2", "m", 500_000), ChunkEstimate("c3", "m", 500_000)],
+        output_tokens_per_call=1000, input_cost_per_mtok=0.10, output_cost_per_mtok=0.40,
+        base_latency_seconds=2.0, output_tokens_per_second=100.0,
+    )
+    values.update(overrides)
+    return ReviewEstimate(**values)
+
+
+def test_review_estimate_totals_and_cost():
+    estimate = _estimate()
+    assert estimate.api_calls == 3
+    assert estimate.prompt_tokens == 2_000_000
+    assert estimate.max_chunk_tokens == 1_000_000
+    assert estimate.output_tokens == 3000
+    assert estimate.cost_usd == pytest.approx(2.0 * 0.10 + 0.003 * 0.40)
+
+
+@pytest.mark.parametrize("concurrency, expected", [(1, 36.0), (2, 24.0), (3, 12.0), (0, 36.0)])
+def test_review_estimate_latency_accounts_for_concurrency(concurrency, expected):
+    # 1回あたり 2秒 + 1000トークン / 100トークン毎秒 = 12秒
+    assert _estimate(concurrency=concurrency).latency_seconds == pytest.approx(expected)
+
+
+def test_empty_estimate_has_no_latency():
+    estimate = _estimate(chunks=[])
+    assert (estimate.latency_seconds, estimate.max_chunk_tokens, estimate.cost_usd) == (0.0, 0, 0.0)
+
+
+def test_format_report_includes_sanitized_bytes_and_chunks():
+    report = _estimate(sanitized_bytes=1234).format_report()
+    assert "サニタイズで除去: 1,234 bytes" in report
+    assert "API呼び出し回数: 3" in report
+    assert "  - c1 (m): 入力 約 1,000,000 トークン" in report
+
+
+def test_token_budget():
+    assert TokenBudget(None).exceeded("x" * 1000) is None
+    assert TokenBudget(0).max_tokens is None
+    assert TokenBudget(10).exceeded("x" * 40) is None
+    assert TokenBudget(10).exceeded("x" * 44) == 11
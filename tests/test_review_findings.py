@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+from core.review_findings import DiffPositionMap, ReviewSchemaError, iter_diff_lines, parse_review_json, validate_review
+
+SQL_DIFF = """diff --git a/schema.sql b/schema.sql
+index 1111111..2222222 100644
+--- a/schema.sql
++++ b/schema.sql
+@@ -1,4 +1,4 @@
+--- old comment
++-- new comment
+ CREATE TABLE users (
+   id INTEGER
+ );
+@@ -10,2 +10,3 @@ CREATE TABLE users (
+ SELECT 1;
++SELECT 2;
+ SELECT 3;
+diff --git a/b.py b/b.py
+--- a/b.py
++++ b/b.py
+@@ -1 +1 @@
+-x = 1
++x = 2
+"""
+
+
+def _finding(**overrides):
+    item = {"file": "a.py", "line": 3, "severity": "major", "message": "bug"}
+    item.update(overrides)
+    return item
+
+
+def test_validate_review_normalizes_fields():
+    review = validate_review({"summary": " ok ", "findings": [_finding(severity="MAJOR", message=" bug ")]})
+    assert review.summary == "ok"
+    assert review.findings[0].severity == "major"
+    assert review.findings[0].message == "bug"
+    assert review.findings[0].suggestion == ""
+
+
+@pytest.mark.parametrize("data", [
+    [],
+    {"summary": 1, "findings": []},
+    {"summary": "s", "findings": {}},
+    {"summary": "s", "findings": ["x"]},
+    {"summary": "s", "findings": [_finding(line="3")]},
+    {"summary": "s", "findings": [_finding(line=True)]},
+    {"summary": "s", "findings": [_finding(severity="blocker")]},
+    {"summary": "s", "findings": [_finding(suggestion=1)]},
+])
+def test_validate_review_rejects_invalid_data(data):
+    with pytest.raises(ReviewSchemaError):
+        validate_review(data)
+
+
+def test_parse_review_json_rejects_invalid_json():
+    with pytest.raises(ReviewSchemaError):
+        parse_review_json("not json")
+    assert parse_review_json(json.dumps({"summary": "s", "findings": []})).findings == []
+
+
+def test_iter_diff_lines_keeps_removed_sql_comment_inside_hunk():
+    kinds = [kind for kind, line in iter_diff_lines(SQL_DIFF) if line in ("--- old comment", "--- a/schema.sql")]
+    assert kinds == ['header', 'line']
+
+
+def test_position_map_counts_removed_comment_lines():
+    position_map = DiffPositionMap.from_diff(SQL_DIFF)
+    assert position_map.locate("schema.sql", 1) == (2, "@@ -1,4 +1,4 @@")
+    assert position_map.locate("schema.sql", 4) == (5, "@@ -1,4 +1,4 @@")
+    # 2つ目のハンクヘッダーも位置に数える
+    assert position_map.locate("schema.sql", 11) == (8, "@@ -10,2 +10,3 @@ CREATE TABLE users (")
+    assert position_map.locate("schema.sql", 5) is None
+    assert position_map.locate("b.py", 1) == (2, "@@ -1 +1 @@")
+
+
+def test_anchor_marks_findings_inside_diff():
+    review = validate_review({"summary": "s", "findings": [
+        _finding(file="schema.sql", line=11), _finding(file="schema.sql", line=99),
+    ]})
+    DiffPositionMap.from_diff(SQL_DIFF).anchor(review)
+    assert (review.findings[0].in_diff, review.findings[0].position) == (True, 8)
+    assert (review.findings[1].in_diff, review.findings[1].position) == (False, None)
@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+from core.review_queue import ReviewQueue, STATUS_PENDING, STATUS_RUNNING, STATUS_SUPERSEDED, job_key_for
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return ReviewQueue(tmp_path / 'queue.sqlite3', size_penalty_seconds=1.0)
+
+
+def test_enqueue_coalesces_same_commit(queue):
+    key = job_key_for('/repo', 'feature')
+    first, created = queue.enqueue(key, 'generic', {}, sha='abc')
+    again, created_again = queue.enqueue(key, 'generic', {}, sha='abc')
+    assert created and not created_again
+    assert again == first
+    assert queue.counts() == {STATUS_PENDING: 1}
+
+
+def test_newer_job_supersedes_pending_and_marks_running(queue):
+    key = job_key_for('/repo', 'feature')
+    running_id, _ = queue.enqueue(key, 'generic', {}, sha='a')
+    assert queue.claim().id == running_id
+    queue.enqueue(key, 'generic', {}, sha='b')
+    latest_id, _ = queue.enqueue(key, 'generic', {}, sha='c')
+
+    assert queue.is_superseded(running_id)
+    assert not queue.is_superseded(latest_id)
+    assert queue.counts() == {STATUS_RUNNING: 1, STATUS_SUPERSEDED: 1, STATUS_PENDING: 1}
+    assert queue.claim().id == latest_id
+    assert queue.claim() is None
+
+
+def test_claim_prefers_small_diffs_then_older_jobs(queue):
+    large, _ = queue.enqueue(job_key_for('/repo', 'a'), 'generic', {'n': 1}, diff_size=100)
+    small, _ = queue.enqueue(job_key_for('/repo', 'b'), 'backlog', {'n': 2}, diff_size=1)
+    later_small, _ = queue.enqueue(job_key_for('/repo', 'c'), 'generic', {'n': 3}, diff_size=1)
+    assert [queue.claim().id for _ in range(3)] == [small, later_small, large]
+    assert queue.claim() is None
+
+
+def test_requeue_stale_skips_superseded_jobs(queue):
+    key = job_key_for('/repo', 'feature')
+    superseded, _ = queue.enqueue(key, 'generic', {})
+    queue.claim()
+    other, _ = queue.enqueue(job_key_for('/repo', 'other'), 'generic', {})
+    queue.claim()
+    latest, _ = queue.enqueue(key, 'generic', {})
+    time.sleep(0.01)
+    # 置き換えられた実行中のジョブは再実行しない
+    assert queue.requeue_stale(0) == 1
+    assert [queue.claim().id, queue.claim().id] == [other, latest]
+    assert queue.is_superseded(superseded)
@@ -0,0 +1,99 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from core.settings import Settings, SettingsError, SettingsSnapshot
+
+
+@pytest.fixture
+def restore_snapshot():
+    original = Settings._snapshot
+    yield
+    Settings._snapshot = original
+
+
+def test_bind_carries_override_into_executor_threads():
+    def read(_):
+        return Settings.get_typed('GIT_FETCH_MAX_AGE_SECONDS')
+
+    with Settings.override({'GIT_FETCH_MAX_AGE_SECONDS': '42'}):
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            bound = list(executor.map(Settings.bind(read), range(8)))
+            unbound = executor.submit(read, 0).result()
+
+    assert bound == [42.0] * 8
+    assert unbound != 42.0
+
+
+@pytest.mark.parametrize("name, value", [
+    ('GIT_TIMEOUT_CLONE', 'soon'),
+    ('GEMINI_CACHE_ENABLED', 'maybe'),
+    ('GEMINI_CACHE_TTL_SECONDS', '1.5'),
+])
+def test_invalid_typed_value_raises_settings_error(tmp_path, monkeypatch, name, value):
+    monkeypatch.setenv(name, value)
+    with pytest.raises(SettingsError, match=name):
+        SettingsSnapshot.load(tmp_path)
+    with pytest.raises(SettingsError, match=name):
+        with Settings.override({name: value}):
+            pass
+
+
+def test_typed_values_are_parsed(tmp_path, monkeypatch):
+    monkeypatch.setenv('GEMINI_CACHE_ENABLED', 'off')
+    monkeypatch.setenv('GEMINI_CACHE_TTL_SECONDS', '120')
+    snapshot = SettingsSnapshot.load(tmp_path)
+    assert snapshot.get_typed('GEMINI_CACHE_ENABLED') is False
+    assert snapshot.get_typed('GEMINI_CACHE_TTL_SECONDS') == 120
+    assert snapshot.get_typed('GIT_TIMEOUT_DIFF', 30.0) == 30.0
+
+
+def test_override_nests_and_restores():
+    with Settings.override({'REVIEW_TEST_VALUE': 'outer', 'REVIEW_TEST_OTHER': 'kept'}):
+        with Settings.override({'REVIEW_TEST_VALUE': 'inner'}):
+            assert Settings.get('REVIEW_TEST_VALUE') == 'inner'
+            assert Settings.get('REVIEW_TEST_OTHER') == 'kept'
+            with Settings.override({'REVIEW_TEST_OTHER': None}):
+                assert Settings.get('REVIEW_TEST_OTHER') is None
+        assert Settings.get('REVIEW_TEST_VALUE') == 'outer'
+    assert Settings.get('REVIEW_TEST_VALUE') is None
+
+
+def test_override_is_isolated_between_threads():
+    entered = threading.Event()
+    release = threading.Event()
+    seen = {}
+
+    def job(name):
+        with Settings.override({'REVIEW_TEST_VALUE': name}):
+            entered.set()
+            release.wait(5)
+            seen[name] = Settings.get('REVIEW_TEST_VALUE')
+
+    worker = threading.Thread(target=job, args=('worker',))
+    worker.start()
+    entered.wait(5)
+    with Settings.override({'REVIEW_TEST_VALUE': 'main'}):
+        release.set()
+        worker.join(5)
+        seen['main'] = Settings.get('REVIEW_TEST_VALUE')
+
+    assert seen == {'worker': 'worker', 'main': 'main'}
+
+
+def test_reload_replaces_snapshot(tmp_path, monkeypatch, restore_snapshot):
+    (tmp_path / 'config.py').write_text("REVIEW_TEST_VALUE = 'from-config'\nREVIEW_TEST_ENV = 'config'\n")
+    monkeypatch.setenv('REVIEW_TEST_ENV', 'env')
+
+    first = Settings.reload(tmp_path)
+    assert Settings.snapshot() is first
+    assert Settings.get('REVIEW_TEST_VALUE') == 'from-config'
+    assert Settings.get('REVIEW_TEST_ENV') == 'env'  # 環境変数がconfig.pyより優先される
+    assert Settings.PROMPT_GENERIC_PATH == tmp_path.resolve() / 'prompts' / 'generic.md'
+
+    # 再読み込みするまでは、環境変数の変更はスナップショットに反映されない
+    monkeypatch.setenv('REVIEW_TEST_ENV', 'changed')
+    assert Settings.get('REVIEW_TEST_ENV') == 'env'
+    Settings.reload(tmp_path)
+    assert Settings.get('REVIEW_TEST_ENV') == 'changed'
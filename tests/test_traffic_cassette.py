@@ -0,0 +1,153 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from core.traffic_cassette import (CassetteMissError, FaultProfile, InjectedFaultError, RateLimitExceededError,
+                                   TrafficCassette)
+
+NO_LATENCY = dict(latency_scale=0.0)
+
+
+class _Model:
+    def __init__(self):
+        self.prompts = []
+
+    def generate_content(self, contents, **kwargs):
+        self.prompts.append(contents)
+        usage = SimpleNamespace(prompt_token_count=10, cached_content_token_count=0, candidates_token_count=5,
+                                total_token_count=15)
+        return SimpleNamespace(text=f"review of {contents}", prompt_feedback=None, usage_metadata=usage)
+
+
+def _record(path, *prompts, backlog=()):
+    cassette = TrafficCassette(path, 'record')
+    model = cassette.wrap_model(_Model(), 'gemini-x')
+    for prompt in prompts:
+        model.generate_content(prompt)
+    for endpoint, send in backlog:
+        try:
+            cassette.backlog_exchange('get', endpoint, None, None, send)
+        except (ConnectionError, ValueError):
+            pass
+    return cassette
+
+
+def _playback(path, strict=True, **faults):
+    return TrafficCassette(path, 'playback', faults=FaultProfile(**{**NO_LATENCY, **faults}), strict=strict)
+
+
+def test_record_and_playback_round_trip(tmp_path):
+    path = tmp_path / "cassette.jsonl"
+    _record(path, "diff-1", backlog=[("/issues/P-1", lambda: {"id": 1})])
+
+    cassette = _playback(path)
+    response = cassette.wrap_model(None, 'gemini-x').generate_content("diff-1")
+    assert response.text == "review of diff-1"
+    assert response.usage_metadata.total_token_count == 15
+    assert response.prompt_feedback.block_reason is None
+    assert cassette.backlog_exchange('GET', "/issues/P-1", None, None, send=None) == {"id": 1}
+    assert cassette.stats['replayed'] == 2
+
+
+def test_strict_playback_raises_on_unknown_request(tmp_path):
+    path = tmp_path / "cassette.jsonl"
+    _record(path, "diff-1")
+
+    cassette = _playback(path)
+    with pytest.raises(CassetteMissError):
+        cassette.wrap_model(None, 'gemini-x').generate_content("diff-2")
+    with pytest.raises(CassetteMissError):
+        cassette.wrap_model(None, 'other-model').generate_content("diff-1")
+    assert cassette.stats['missed'] == 2
+
+
+def test_loose_playback_cycles_recorded_entries(tmp_path):
+    path = tmp_path / "cassette.jsonl"
+    _record(path, "diff-1", "diff-2")
+
+    model = _playback(path, strict=False).wrap_model(None, 'gemini-x')
+    texts = [model.generate_content(f"other-{i}").text for i in range(3)]
+    assert texts == ["review of diff-1", "review of diff-2", "review of diff-1"]
+
+
+def test_repeated_request_replays_in_recorded_order(tmp_path):
+    path = tmp_path / "cassette.jsonl"
+    cassette = TrafficCassette(path, 'record')
+    responses = iter([{"n": 1}, {"n": 2}])
+    for _ in range(2):
+        cassette.backlog_exchange('get', "/issues", None, None, lambda: next(responses))
+
+    playback = _playback(path)
+    assert [playback.backlog_exchange('get', "/issues", None, None, None) for _ in range(3)] == [
+        {"n": 1}, {"n": 2}, {"n": 2},
+    ]
+
+
+def test_record_mode_truncates_unless_appending(tmp_path):
+    path = tmp_path / "cassette.jsonl"
+    _record(path, "old")
+    _record(path, "new")
+    assert [json.loads(line)['request']['prompt'] for line in path.read_text(encoding='utf-8').splitlines()] == ["new"]
+
+    cassette = TrafficCassette(path, 'record', append=True)
+    cassette.wrap_model(_Model(), 'gemini-x').generate_content("more")
+    assert len(path.read_text(encoding='utf-8').splitlines()) == 2
+
+
+def test_seeded_error_injection_is_reproducible_and_does_not_consume(tmp_path):
+    path = tmp_path / "cassette.jsonl"
+    cassette = TrafficCassette(path, 'record')
+    responses = iter(range(20))
+    for _ in range(20):
+        cassette.backlog_exchange('get', "/issues", None, None, lambda: next(responses))
+
+    def run():
+        playback = _playback(path, error_rate=0.5, seed=7)
+        outcomes = []
+        for _ in range(20):
+            try:
+                outcomes.append(playback.backlog_exchange('get', "/issues", None, None, None))
+            except InjectedFaultError:
+                outcomes.append('error')
+        return outcomes
+
+    outcomes = run()
+    assert outcomes == run()
+    assert 'error' in outcomes
+    # 注入したエラーでは記録を消費しないため、成功した応答は記録順に並ぶ
+    replayed = [outcome for outcome in outcomes if outcome != 'error']
+    assert replayed == list(range(len(replayed)))
+
+
+def test_rate_limit_rejects_without_consuming(tmp_path):
+    path = tmp_path / "cassette.jsonl"
+    _record(path, "diff-1", "diff-2")
+
+    cassette = _playback(path, rate_limit_per_minute=1)
+    model = cassette.wrap_model(None, 'gemini-x')
+    assert model.generate_content("diff-1").text == "review of diff-1"
+    with pytest.raises(RateLimitExceededError):
+        model.generate_content("diff-2")
+    assert cassette.stats == {'recorded': 0, 'replayed': 1, 'missed': 0, 'injected_errors': 0, 'rate_limited': 1}
+
+    cassette._rate_limiter.per_minute = 0
+    assert model.generate_content("diff-2").text == "review of diff-2"
+
+
+def test_recorded_errors_are_replayed_with_same_type(tmp_path):
+    path = tmp_path / "cassette.jsonl"
+
+    def refused():
+        raise ConnectionError("connection refused")
+
+    def invalid():
+        raise ValueError("invalid json")
+
+    _record(path, backlog=[("/a", refused), ("/b", invalid)])
+
+    cassette = _playback(path)
+    with pytest.raises(ConnectionError, match="connection refused"):
+        cassette.backlog_exchange('get', "/a", None, None, None)
+    with pytest.raises(ValueError, match="invalid json"):
+        cassette.backlog_exchange('get', "/b", None, None, None)